@@ -0,0 +1,426 @@
+"""Agregação colunar das linhas do Search Console e do GA4.
+
+As respostas das APIs são convertidas bloco a bloco em colunas (arrays do NumPy) e as somas
+por chave (página, mês) e a posição média ponderada por impressões saem de `np.bincount`
+sobre os códigos de cada chave, sem conversões e buscas em dicionário por métrica e linha.
+A memória fica limitada a um bloco mais as somas por chave. Sem NumPy instalado, as mesmas
+funções usam laços em Python puro (mesmos resultados).
+"""
+import heapq
+import sys
+from itertools import islice
+
+_np = False  # módulo numpy, None se indisponível; False até o primeiro uso
+
+
+def _numpy():
+    """Importa o NumPy no primeiro uso (a importação custa ~0,1 s na inicialização). Funções
+    chamam uma vez e repassam o módulo; agregadores o guardam na criação.
+    """
+    global _np
+    if _np is False:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:  # o NumPy é opcional
+            _np = None
+    return _np
+
+
+TAMANHO_BLOCO = 100000
+
+
+def _numero(valor):
+    try:
+        return float(valor or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _coluna(rows, campo, np):
+    """Coluna numérica (float64) de um campo das linhas (dicts do GSC/GA4)."""
+    if np is None:
+        return [_numero(r.get(campo, 0)) for r in rows]
+    try:
+        # Caminho rápido: números (GSC) ou texto numérico (GA4) convertidos pelo próprio NumPy
+        return np.fromiter((r.get(campo, 0) or 0 for r in rows), dtype=np.float64, count=len(rows))
+    except (TypeError, ValueError):
+        return np.fromiter((_numero(r.get(campo, 0)) for r in rows), dtype=np.float64, count=len(rows))
+
+
+def iterar_blocos(rows, tamanho=TAMANHO_BLOCO):
+    """Divide uma lista ou gerador de linhas em listas de até `tamanho` linhas."""
+    if isinstance(rows, list):
+        for inicio in range(0, len(rows), tamanho):
+            yield rows[inicio:inicio + tamanho]
+        return
+    iterador = iter(rows)
+    while True:
+        bloco = list(islice(iterador, tamanho))
+        if not bloco:
+            return
+        yield bloco
+
+
+def metricas_gsc(impressions, clicks, pos_ponderada):
+    """(impressões, cliques, CTR %, posição média ponderada) a partir das somas."""
+    impressions = int(round(impressions))
+    clicks = int(round(clicks))
+    ctr = (clicks / impressions * 100) if impressions > 0 else 0.0
+    posicao = (pos_ponderada / impressions) if impressions > 0 else 0.0
+    return impressions, clicks, ctr, posicao
+
+
+def somas_gsc(rows):
+    """Somas de impressões, cliques e posição × impressões de um bloco de linhas do GSC."""
+    np = _numpy()
+    impressions = _coluna(rows, 'impressions', np)
+    clicks = _coluna(rows, 'clicks', np)
+    position = _coluna(rows, 'position', np)
+    if np is None:
+        return sum(impressions), sum(clicks), sum(p * max(i, 0) for p, i in zip(position, impressions))
+    return float(impressions.sum()), float(clicks.sum()), float(position @ np.maximum(impressions, 0))
+
+
+def somar_campo(rows, campo):
+    """Soma de um campo numérico (ex: 'sessions' do GA4) em todas as linhas."""
+    np = _numpy()
+    total = 0.0
+    for bloco in iterar_blocos(rows):
+        coluna = _coluna(bloco, campo, np)
+        total += float(coluna.sum()) if np is not None else sum(coluna)
+    return int(round(total))
+
+
+class AgregadorTotaisGSC:
+    """Totais do Search Console (sem chave), acumulados bloco a bloco em memória constante."""
+
+    __slots__ = ('impressions', 'clicks', 'pos_ponderada', 'linhas')
+
+    def __init__(self):
+        self.impressions = 0
+        self.clicks = 0
+        self.pos_ponderada = 0.0
+        self.linhas = 0
+
+    def adicionar_linhas(self, rows):
+        """Consome um iterável (lista ou gerador) de linhas; retorna o próprio agregador."""
+        for bloco in iterar_blocos(rows):
+            impressions, clicks, pesos = somas_gsc(bloco)
+            self.impressions += int(round(impressions))
+            self.clicks += int(round(clicks))
+            self.pos_ponderada += pesos
+            self.linhas += len(bloco)
+        return self
+
+    def metricas(self):
+        """(impressões, cliques, CTR %, posição média ponderada)."""
+        return metricas_gsc(self.impressions, self.clicks, self.pos_ponderada)
+
+
+class AgregadorGSC:
+    """Somas do GSC por chave (ex: página normalizada), acumuladas bloco a bloco.
+
+    `chave(row)` extrai a chave bruta de cada linha; com `normalizar`, chaves brutas que
+    normalizam igual são somadas juntas (a normalização roda uma vez por chave distinta).
+    Cada métrica é uma coluna (array) indexada pelo código da chave.
+    """
+
+    def __init__(self, chave, normalizar=None):
+        self.chave = chave
+        self.normalizar = normalizar
+        self.chaves = []            # chave final de cada código, na ordem de primeira ocorrência
+        self.linhas = 0
+        self._codigo_bruto = {}
+        self._codigo_final = {}
+        self._colunas = {}          # nome -> soma por código
+        self._np = _numpy()
+
+    def _codificar(self, rows, chave=None):
+        chave = chave or self.chave
+        codigo_bruto = self._codigo_bruto
+        codigos = []
+        anexar = codigos.append
+        for row in rows:
+            bruta = chave(row)
+            codigo = codigo_bruto.get(bruta)
+            if codigo is None:
+                final = self.normalizar(bruta) if self.normalizar else bruta
+                if isinstance(final, str):
+                    final = sys.intern(final)
+                codigo = self._codigo_final.get(final)
+                if codigo is None:
+                    codigo = self._codigo_final[final] = len(self.chaves)
+                    self.chaves.append(final)
+                codigo_bruto[bruta] = codigo
+            anexar(codigo)
+        return codigos
+
+    def _acumular(self, nome, codigos, pesos=None):
+        """Soma `pesos` (ou 1 por linha) na coluna `nome`, por código."""
+        np = self._np
+        total = len(self.chaves)
+        atual = self._colunas.get(nome)
+        if np is None:
+            if atual is None:
+                atual = self._colunas[nome] = []
+            atual.extend([0] * (total - len(atual)))
+            if pesos is None:
+                for codigo in codigos:
+                    atual[codigo] += 1
+            else:
+                for codigo, peso in zip(codigos, pesos):
+                    atual[codigo] += peso
+            return
+        bloco = np.bincount(codigos, weights=pesos, minlength=total)
+        if atual is None:
+            self._colunas[nome] = bloco
+            return
+        if len(atual) < total:
+            atual = self._colunas[nome] = np.pad(atual, (0, total - len(atual)))
+        atual += bloco
+
+    def _indices(self, codigos):
+        np = self._np
+        return np.asarray(codigos, dtype=np.intp) if np is not None else codigos
+
+    def adicionar_bloco(self, rows):
+        """Soma um bloco de linhas; retorna os códigos das chaves de cada linha."""
+        np = self._np
+        codigos = self._indices(self._codificar(rows))
+        impressions = _coluna(rows, 'impressions', np)
+        clicks = _coluna(rows, 'clicks', np)
+        position = _coluna(rows, 'position', np)
+        if np is None:
+            pesos = [p * max(i, 0) for p, i in zip(position, impressions)]
+        else:
+            pesos = position * np.maximum(impressions, 0)
+        self._acumular('impressions', codigos, impressions)
+        self._acumular('clicks', codigos, clicks)
+        self._acumular('pos_ponderada', codigos, pesos)
+        self.linhas += len(rows)
+        return codigos
+
+    def adicionar_linhas(self, rows):
+        """Consome um iterável (lista ou gerador) de linhas; retorna o próprio agregador."""
+        for bloco in iterar_blocos(rows):
+            self.adicionar_bloco(bloco)
+        return self
+
+    def coluna(self, nome):
+        """Soma da coluna `nome` por código, como lista do tamanho de `chaves`."""
+        atual = self._colunas.get(nome)
+        if atual is None:
+            return [0] * len(self.chaves)
+        valores = atual.tolist() if self._np is not None else list(atual)
+        return valores + [0] * (len(self.chaves) - len(valores))
+
+    def somas(self):
+        """Listas (impressões, cliques, posição × impressões) indexadas pelo código da chave."""
+        return self.coluna('impressions'), self.coluna('clicks'), self.coluna('pos_ponderada')
+
+    def resultado(self):
+        """{chave: (impressões, cliques, CTR %, posição média ponderada)}."""
+        impr, clicks, pesos = self.somas()
+        return {chave: metricas_gsc(impr[k], clicks[k], pesos[k]) for k, chave in enumerate(self.chaves)}
+
+
+class MetricasPagina:
+    """Métricas de uma página (criadas sob demanda a partir das colunas do AgregadoPaginas)."""
+
+    __slots__ = ('impressions', 'clicks', 'ctr', 'position', 'sessions', 'consultas')
+
+    def __init__(self, impressions=0, clicks=0, ctr=0.0, position=0.0, sessions=0, consultas=None):
+        self.impressions = impressions
+        self.clicks = clicks
+        self.ctr = ctr
+        self.position = position
+        self.sessions = sessions
+        self.consultas = consultas
+
+    def __repr__(self):
+        campos = ', '.join(f"{nome}={getattr(self, nome)!r}" for nome in self.__slots__)
+        return f"MetricasPagina({campos})"
+
+
+def _pagina_gsc(row):
+    keys = row.get('keys')
+    return keys[0] if keys else ''
+
+
+def _pagina_ga4(row):
+    return row.get('page_path') or ''
+
+
+class AgregadoPaginas(AgregadorGSC):
+    """Métricas por página (URL normalizada e internada) do GSC e do GA4, em colunas.
+
+    Impressões, cliques, posição × impressões e sessões ficam em arrays indexados pelo código
+    da página; nada é guardado por linha. Com `contar_consultas`, cada página também guarda
+    quantas linhas (consultas) do GSC teve. `fontes` marca quais APIs retornaram a página, para
+    que o GA4 sozinho não grave zeros do GSC (e vice-versa).
+    Acesso como um dicionário somente leitura: `paginas[url]` -> MetricasPagina.
+    """
+
+    FONTE_GSC = 1
+    FONTE_GA4 = 2
+
+    def __init__(self, normalizar=None, contar_consultas=False):
+        super().__init__(_pagina_gsc, normalizar)
+        self.contar_consultas = contar_consultas
+
+    def _marcar(self, codigos, fonte):
+        np = self._np
+        total = len(self.chaves)
+        fontes = self._colunas.get('fontes')
+        if np is None:
+            if fontes is None:
+                fontes = self._colunas['fontes'] = []
+            fontes.extend([0] * (total - len(fontes)))
+            for codigo in codigos:
+                fontes[codigo] |= fonte
+            return
+        if fontes is None:
+            fontes = np.zeros(total, dtype=np.uint8)
+        elif len(fontes) < total:
+            fontes = np.pad(fontes, (0, total - len(fontes)))
+        fontes[codigos] |= fonte
+        self._colunas['fontes'] = fontes
+
+    def adicionar_bloco(self, rows):
+        codigos = super().adicionar_bloco(rows)
+        self._marcar(codigos, self.FONTE_GSC)
+        if self.contar_consultas:
+            self._acumular('consultas', codigos)
+        return codigos
+
+    def adicionar_sessoes(self, rows):
+        """Soma as sessões das linhas do GA4 ('page_path', 'sessions') por página."""
+        for bloco in iterar_blocos(rows):
+            codigos = self._indices(self._codificar(bloco, _pagina_ga4))
+            self._acumular('sessions', codigos, _coluna(bloco, 'sessions', self._np))
+            self._marcar(codigos, self.FONTE_GA4)
+        return self
+
+    def compactar(self):
+        """Descarta o índice das chaves brutas (só necessário enquanto chegam linhas)."""
+        self._codigo_bruto = {}
+        return self
+
+    def _fonte(self, url, fonte):
+        codigo = self._codigo_final.get(url)
+        if codigo is None:
+            return False
+        fontes = self._colunas.get('fontes')
+        return bool(fontes is not None and codigo < len(fontes) and int(fontes[codigo]) & fonte)
+
+    def tem_gsc(self, url):
+        return self._fonte(url, self.FONTE_GSC)
+
+    def tem_ga4(self, url):
+        return self._fonte(url, self.FONTE_GA4)
+
+    def _valor(self, nome, codigo):
+        coluna = self._colunas.get(nome)
+        if coluna is None or codigo >= len(coluna):
+            return 0
+        return coluna[codigo].item() if self._np is not None else coluna[codigo]
+
+    def __getitem__(self, url):
+        codigo = self._codigo_final[url]
+        impressions, clicks, ctr, posicao = metricas_gsc(
+            self._valor('impressions', codigo), self._valor('clicks', codigo),
+            self._valor('pos_ponderada', codigo))
+        consultas = int(self._valor('consultas', codigo)) if self.contar_consultas else None
+        return MetricasPagina(impressions, clicks, ctr, posicao,
+                              int(round(self._valor('sessions', codigo))), consultas)
+
+    def __contains__(self, url):
+        return url in self._codigo_final
+
+    def __iter__(self):
+        return iter(self.chaves)
+
+    def __len__(self):
+        return len(self.chaves)
+
+    def keys(self):
+        return list(self.chaves)
+
+    def items(self):
+        for url in self.chaves:
+            yield url, self[url]
+
+    def totais(self):
+        """Totais de todas as páginas: (linha no formato do GSC, sessões)."""
+        impressions, clicks, pesos = (sum(coluna) for coluna in self.somas())
+        impressions, clicks, _, posicao = metricas_gsc(impressions, clicks, pesos)
+        sessoes = int(round(sum(self.coluna('sessions'))))
+        return {'impressions': impressions, 'clicks': clicks, 'position': posicao}, sessoes
+
+
+class RankingGSC:
+    """Os `n` itens (consultas ou páginas) com mais cliques e com mais impressões num fluxo de
+    linhas do Search Console com uma única dimensão (cada item aparece uma vez), em memória
+    O(n): um min-heap por critério guarda os `n` melhores até agora, com o menor na raiz. De
+    cada bloco só as linhas acima da raiz e entre as `n` maiores do bloco chegam ao heap.
+    """
+
+    CRITERIOS = ('clicks', 'impressions')
+
+    def __init__(self, n):
+        if not isinstance(n, int) or n < 1:
+            raise ValueError(f"n deve ser um inteiro >= 1: {n!r}")
+        self.n = n
+        self.linhas = 0
+        self._heaps = {criterio: [] for criterio in self.CRITERIOS}
+        self._np = _numpy()
+
+    def adicionar_linhas(self, rows):
+        """Consome um iterável (lista ou gerador) de linhas; retorna o próprio ranking."""
+        np = self._np
+        for bloco in iterar_blocos(rows):
+            for criterio, heap in self._heaps.items():
+                pesos = _coluna(bloco, criterio, np)
+                cheio = len(heap) >= self.n
+                if np is None:
+                    candidatos = [i for i, peso in enumerate(pesos) if not cheio or peso > heap[0][0]]
+                else:
+                    candidatos = np.flatnonzero(pesos > heap[0][0]) if cheio else np.arange(len(bloco))
+                    if len(candidatos) > self.n:
+                        # n-ésimo maior peso do bloco: só ele e os acima dele (empates incluídos)
+                        corte = np.partition(pesos[candidatos], len(candidatos) - self.n)[len(candidatos) - self.n]
+                        candidatos = candidatos[pesos[candidatos] >= corte]
+                for i in candidatos:
+                    i = int(i)
+                    # Em caso de empate vale a linha que chegou primeiro (a ordem nunca empata)
+                    entrada = (float(pesos[i]), -(self.linhas + i), bloco[i])
+                    if len(heap) < self.n:
+                        heapq.heappush(heap, entrada)
+                    elif entrada > heap[0]:
+                        heapq.heapreplace(heap, entrada)
+            self.linhas += len(bloco)
+        return self
+
+    def resultado(self, criterio):
+        """[{'chave', 'clicks', 'impressions', 'ctr' (%), 'position'}] do maior para o menor."""
+        itens = []
+        for _, _, row in sorted(self._heaps[criterio], reverse=True):
+            impressions, clicks, ctr, posicao = metricas_gsc(_numero(row.get('impressions')), _numero(row.get('clicks')),
+                                                             _numero(row.get('position')) * _numero(row.get('impressions')))
+            itens.append({'chave': row['keys'][0], 'clicks': clicks, 'impressions': impressions,
+                          'ctr': ctr, 'position': posicao})
+        return itens
+
+
+def rotulo_por_data(rotular):
+    """Função 'AAAA-MM-DD' -> rótulo do mês, com `rotular(ano, mes)` chamado uma vez por mês."""
+    cache = {}
+
+    def rotulo(data):
+        prefixo = data[:7]
+        valor = cache.get(prefixo)
+        if valor is None:
+            valor = cache[prefixo] = rotular(int(prefixo[:4]), int(prefixo[5:7]))
+        return valor
+    return rotulo
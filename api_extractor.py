@@ -1,21 +1,21 @@
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
-from google.analytics.data_v1beta import BetaAnalyticsDataClient
-from google.analytics.data_v1beta.types import RunReportRequest, DateRange, Dimension, Metric
 import datetime
-import time
+import functools
+import hashlib
+import os
 import re
-from gspread.utils import rowcol_to_a1
-
-# Configurações
-SCOPES = [
-    "https://spreadsheets.google.com/feeds",
-    "https://www.googleapis.com/auth/drive",
-    "https://www.googleapis.com/auth/webmasters.readonly",
-    "https://www.googleapis.com/auth/analytics.readonly"
-]
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from google_clients import GoogleClientPool, obter_pool, SCOPES, SCOPE_SEARCH_CONSOLE, SCOPE_GA4
+from response_cache import ResponseCache
+from site_registry import SiteRegistry
+from sheet_session import SheetSyncSession
+from request_scheduler import RequestScheduler, obter_scheduler, status_http
+from sync_state import SyncState
+from mtd_state import MonthToDateState, mesmo_valor
+from metrics import Metricas, obter_metricas
+from columnar_store import ColumnarStore
+from aggregation import AgregadoPaginas, AgregadorTotaisGSC, RankingGSC, rotulo_por_data, somar_campo
 
 # Importar configurações do config.py
 try:
@@ -32,79 +32,771 @@ except ImportError:
     GA4_PROPERTY_ID = '456043089'
     ABA_DADOS_ORIGEM = 'SEO SITES'
 
+try:
+    import config as _config
+except ImportError:
+    _config = None
+
+
+def _config_opcional(nome, padrao):
+    """Lê uma configuração opcional do config.py, usando o padrão se não existir."""
+    return getattr(_config, nome, padrao)
+
+
+# Número de workers da sincronização paralela (1 = sequencial)
+SYNC_MAX_WORKERS = _config_opcional('SYNC_MAX_WORKERS', 4)
+
+# Dimensões do modo detalhado do Search Console (por URL); o layout vertical usa só totais
+SEARCH_CONSOLE_DIMENSIONS = _config_opcional('SEARCH_CONSOLE_DIMENSIONS', ['page', 'query'])
+
+# Linhas por página nas consultas paginadas do Search Console (máximo da API: 25000)
+SEARCH_CONSOLE_ROW_LIMIT = _config_opcional('SEARCH_CONSOLE_ROW_LIMIT', 25000)
+
+# Linhas por página nos relatórios do GA4 (limit/offset; máximo da API: 250000) e quantas
+# páginas seguintes são pedidas ao mesmo tempo depois que a primeira informa o row_count
+GA4_ROW_LIMIT = min(_config_opcional('GA4_ROW_LIMIT', 10000), 250000)
+GA4_PARALLEL_PAGES = _config_opcional('GA4_PARALLEL_PAGES', 4)
+
+# Consultas ao Search Console agrupadas por lote HTTP (BatchHttpRequest) na sincronização:
+# uma conexão por lote em vez de uma por consulta (0 desativa; máximo da API: 1000)
+SEARCH_CONSOLE_BATCH_SIZE = min(_config_opcional('SEARCH_CONSOLE_BATCH_SIZE', 50), 1000)
+
+# Máximo de células acumuladas na sessão de escrita antes de um flush parcial (0 = sem limite)
+SHEETS_MAX_BUFFERED_CELLS = _config_opcional('SHEETS_MAX_BUFFERED_CELLS', 5000)
+
+# Leitura seletiva na sincronização: coluna A, cabeçalhos e só as colunas de métricas das
+# linhas a verificar, em vez da aba inteira
+SHEETS_TARGETED_READS = _config_opcional('SHEETS_TARGETED_READS', True)
+
+# Leitura da aba inteira em blocos deste número de linhas (0 = numa única chamada)
+SHEETS_READ_CHUNK_ROWS = _config_opcional('SHEETS_READ_CHUNK_ROWS', 0)
+
+# Sincronização em lote: uma consulta por domínio cobrindo todos os meses pendentes
+SYNC_BACKFILL = _config_opcional('SYNC_BACKFILL', True)
+
+MESES_MAP = {
+    'jan': 1, 'fev': 2, 'mar': 3, 'abr': 4, 'mai': 5, 'jun': 6,
+    'jul': 7, 'ago': 8, 'set': 9, 'out': 10, 'nov': 11, 'dez': 12
+}
+_MESES_ABREV = {num: abrev for abrev, num in MESES_MAP.items()}
+
+
+def _rotulo_mes(ano, mes):
+    """Monta o rótulo usado na planilha para um mês (ex: 2025, 3 -> 'mar-25')."""
+    return f"{_MESES_ABREV[mes]}-{ano % 100:02d}"
+
+
+def _meses_do_periodo(start_date, end_date):
+    """Divide o período em meses-calendário: [(rótulo, início, fim)] com datas ISO."""
+    inicio = datetime.date.fromisoformat(start_date)
+    fim = datetime.date.fromisoformat(end_date)
+    meses = []
+    atual = inicio
+    while atual <= fim:
+        if atual.month == 12:
+            proximo = datetime.date(atual.year + 1, 1, 1)
+        else:
+            proximo = datetime.date(atual.year, atual.month + 1, 1)
+        fim_mes = min(proximo - datetime.timedelta(days=1), fim)
+        meses.append((_rotulo_mes(atual.year, atual.month), atual.isoformat(), fim_mes.isoformat()))
+        atual = proximo
+    return meses
+
+
+def _janela_mes_corrente(defasagem_dias, hoje=None):
+    """(rótulo, início, alvo) do mês corrente: `alvo` é o último dia com dados considerados
+    estáveis (hoje menos `defasagem_dias`); antes do início do mês ainda não há o que somar.
+    """
+    hoje = hoje or datetime.date.today()
+    alvo = hoje - datetime.timedelta(days=defasagem_dias)
+    return _rotulo_mes(hoje.year, hoje.month), hoje.replace(day=1).isoformat(), alvo.isoformat()
+
+
+# Campo de cada dimensão do GA4 nas linhas extraídas
+_CAMPOS_GA4 = {'pagePath': 'page_path', 'yearMonth': 'year_month', 'date': 'date'}
+
+
+def _linha_ga4(dimensao, row):
+    """Converte uma linha do relatório do GA4 em {campo da dimensão, 'sessions'}."""
+    valor = row.dimension_values[0].value
+    if dimensao == 'date':  # ex: 20250315
+        valor = f"{valor[:4]}-{valor[4:6]}-{valor[6:8]}"
+    return {_CAMPOS_GA4[dimensao]: valor, 'sessions': row.metric_values[0].value}
+
+
+_RE_DOMINIO = re.compile(r'^[a-z0-9.-]+\.[a-z]{2,}$')
+_RE_ROTULO_MES = re.compile(r'^[a-z]{3}-\d{2}$')
+
+
+def _periodo_do_rotulo(rotulo):
+    """(início, fim) ISO do mês de um rótulo da planilha (ex: 'mar-25'); ValueError se inválido."""
+    rotulo = rotulo.strip().lower()
+    if not _RE_ROTULO_MES.match(rotulo) or rotulo[:3] not in MESES_MAP:
+        raise ValueError(f"mês inválido: {rotulo!r} (use mes-ano, ex: mar-25)")
+    inicio = datetime.date(2000 + int(rotulo[4:]), MESES_MAP[rotulo[:3]], 1)
+    proximo = datetime.date(inicio.year + 1, 1, 1) if inicio.month == 12 else inicio.replace(month=inicio.month + 1)
+    return inicio.isoformat(), (proximo - datetime.timedelta(days=1)).isoformat()
+
+
+def _limpar_dominio(valor):
+    """Remove protocolo, caminho e 'www.' de um valor da coluna A."""
+    return valor.replace('https://', '').replace('http://', '').split('/')[0].replace('www.', '')
+
+
+# Cotas por minuto de cada API (o agendador mantém as chamadas nesse ritmo) e política de
+# novas tentativas para erros transitórios (429/5xx/timeouts)
+API_QUOTAS_PER_MINUTE = _config_opcional('API_QUOTAS_PER_MINUTE', {'sheets': 60, 'search_console': 1200, 'ga4': 60})
+DELAY_BETWEEN_REQUESTS = _config_opcional('DELAY_BETWEEN_REQUESTS', 1)
+MAX_RETRIES = _config_opcional('MAX_RETRIES', 3)
+REQUEST_TIMEOUT = _config_opcional('REQUEST_TIMEOUT', 30)
+
+# Registro persistente domínio -> siteUrl do Search Console
+SC_SITES_REGISTRY_PATH = _config_opcional('SC_SITES_REGISTRY_PATH', 'sc_sites.json')
+SC_SITES_USE_LIST = _config_opcional('SC_SITES_USE_LIST', True)
+SC_SITES_LIST_TTL_HOURS = _config_opcional('SC_SITES_LIST_TTL_HOURS', 24)
+
+def _numero_mes(mes_ano):
+    """Número do mês a partir de 'mar-25' ou '03-2025'."""
+    prefixo = mes_ano.split('-')[0].strip().lower()
+    return MESES_MAP[prefixo] if prefixo in MESES_MAP else int(prefixo)
+
+
+# Colunas (0-based) do início de cada métrica no layout horizontal (uma linha por URL)
+COLUNAS_SHEET113 = _config_opcional('COLUNAS_SHEET113', {
+    'landing_page': 0,
+    'ga4_property': 1,
+    'impressions_start': 2,
+    'clicks_start': 14,
+    'ctr_start': 26,
+    'position_start': 38,
+    'sessions_start': 50
+})
+
+# Cache local das respostas do GSC/GA4 (meses finalizados não expiram)
+CACHE_ENABLED = _config_opcional('CACHE_ENABLED', True)
+CACHE_PATH = _config_opcional('CACHE_PATH', 'cache_respostas.sqlite3')
+CACHE_TTL_SECONDS = _config_opcional('CACHE_TTL_SECONDS', 6 * 3600)
+CACHE_FINALIZATION_DAYS = _config_opcional('CACHE_FINALIZATION_DAYS', 3)
+CACHE_MAX_ENTRIES = _config_opcional('CACHE_MAX_ENTRIES', 20000)
+
+# Armazém colunar local (Parquet, por fonte/domínio/mês) com as linhas brutas extraídas
+COLUMNAR_STORE_ENABLED = _config_opcional('COLUMNAR_STORE_ENABLED', True)
+COLUMNAR_STORE_PATH = _config_opcional('COLUMNAR_STORE_PATH', 'armazem_metricas')
+
+# Modo mês corrente: valores provisórios do mês em andamento, somando só os dias novos a cada
+# execução (dias mais recentes que a defasagem são ignorados: os dados do GSC/GA4 ainda mudam)
+MONTH_TO_DATE_ENABLED = _config_opcional('MONTH_TO_DATE_ENABLED', False)
+MONTH_TO_DATE_LAG_DAYS = _config_opcional('MONTH_TO_DATE_LAG_DAYS', 3)
+MONTH_TO_DATE_STATE_PATH = _config_opcional('MONTH_TO_DATE_STATE_PATH', 'mtd_state.json')
+
+# Ranking de consultas e páginas: top-N por cliques e por impressões de cada domínio/mês,
+# gravado na aba complementar ABA_RANKING (uma linha por item)
+RANKING_TOP_N = _config_opcional('RANKING_TOP_N', 50)
+ABA_RANKING = _config_opcional('ABA_RANKING', 'SEO RANKING')
+CABECALHO_RANKING = ['Domínio', 'Mês', 'Tipo', 'Critério', 'Posição no ranking', 'Item',
+                     'Impressões', 'Cliques', 'CTR', 'Posição']
+_TIPOS_RANKING = {'consulta': 'query', 'página': 'page'}
+_CRITERIOS_RANKING = {'cliques': 'clicks', 'impressões': 'impressions'}
+
+# Estado da sincronização incremental (modo sem menu: --sync)
+SYNC_STATE_PATH = _config_opcional('SYNC_STATE_PATH', 'sync_state.json')
+
+# Métricas exportadas ao fim de cada sincronização (None desativa o arquivo)
+METRICS_JSON_PATH = _config_opcional('METRICS_JSON_PATH', 'metricas_sync.json')
+METRICS_PROMETHEUS_PATH = _config_opcional('METRICS_PROMETHEUS_PATH', None)
+
+
+def _linhas_ranking(domain, rotulo, rankings):
+    """Linhas da aba de ranking de um par (domínio, mês): {tipo: RankingGSC} -> [[...]]."""
+    linhas = []
+    for tipo, ranking in rankings.items():
+        for criterio, campo in _CRITERIOS_RANKING.items():
+            for posicao, item in enumerate(ranking.resultado(campo), 1):
+                linhas.append([domain, rotulo, tipo, criterio, posicao, item['chave'], item['impressions'],
+                               item['clicks'], round(item['ctr'], 2), round(item['position'], 2)])
+    return linhas
+
+
+def _linha_ranking_tipada(linha):
+    """Linha lida da aba de ranking (texto) com os números convertidos, para regravá-la em modo RAW."""
+    largura = len(CABECALHO_RANKING)
+    linha = list(linha[:largura]) + [''] * (largura - len(linha))
+    for j, conversao in ((4, int), (6, int), (7, int), (8, float), (9, float)):
+        try:
+            linha[j] = conversao(str(linha[j]).replace(',', '.'))
+        except ValueError:
+            pass
+    return linha
+
+
+def _ordem_ranking(linha):
+    """Domínio, mês (mais recente primeiro), tipo, critério e posição no ranking."""
+    try:
+        inicio, _ = _periodo_do_rotulo(str(linha[1]))
+        mes = -int(inicio[:4] + inicio[5:7])
+    except ValueError:
+        mes = 0
+    posicao = linha[4] if isinstance(linha[4], int) else 0
+    return str(linha[0]), mes, str(linha[2]), str(linha[3]), posicao
+
+
+def _medir_fase(fase):
+    """Decorador: registra a duração do método no histograma de fases das métricas."""
+    def decorador(metodo):
+        @functools.wraps(metodo)
+        def envoltorio(self, *args, **kwargs):
+            with self.metricas.medir(fase):
+                return metodo(self, *args, **kwargs)
+        return envoltorio
+    return decorador
+
+def validar_configuracao(credentials_file='credentials.json'):
+    """Confere o config.py e os arquivos de credenciais sem acessar as APIs.
+    Retorna (erros, avisos), listas de mensagens.
+    """
+    import json
+
+    erros, avisos = [], []
+    if '/spreadsheets/d/' not in (SPREADSHEET_URL or ''):
+        erros.append(f"SPREADSHEET_URL não parece uma URL de planilha do Google: {SPREADSHEET_URL!r}")
+    if not (isinstance(ABA_DADOS_ORIGEM, str) and ABA_DADOS_ORIGEM.strip()):
+        erros.append("ABA_DADOS_ORIGEM deve ser o nome da aba (texto não vazio)")
+    if not str(GA4_PROPERTY_ID).isdigit():
+        erros.append(f"GA4_PROPERTY_ID deve ser numérico: {GA4_PROPERTY_ID!r}")
+    if not str(SEARCH_CONSOLE_SITE).startswith(('sc-domain:', 'http://', 'https://')):
+        erros.append(f"SEARCH_CONSOLE_SITE deve começar com sc-domain: ou http(s)://: {SEARCH_CONSOLE_SITE!r}")
+
+    if not isinstance(DOMAIN_CONFIGS, dict):
+        erros.append("DOMAIN_CONFIGS deve ser um dicionário {domínio: {...}}")
+    else:
+        for dominio, cfg in DOMAIN_CONFIGS.items():
+            if not isinstance(cfg, dict):
+                erros.append(f"DOMAIN_CONFIGS[{dominio!r}] deve ser um dicionário")
+                continue
+            if cfg.get('ga4_property_id') and not str(cfg['ga4_property_id']).isdigit():
+                erros.append(f"DOMAIN_CONFIGS[{dominio!r}]['ga4_property_id'] deve ser numérico")
+            if cfg.get('sc_site') and not str(cfg['sc_site']).startswith(('sc-domain:', 'http://', 'https://')):
+                erros.append(f"DOMAIN_CONFIGS[{dominio!r}]['sc_site'] deve começar com sc-domain: ou http(s)://")
+
+    for nome, valor, minimo in (('SYNC_MAX_WORKERS', SYNC_MAX_WORKERS, 1), ('MAX_RETRIES', MAX_RETRIES, 0),
+                                ('SEARCH_CONSOLE_ROW_LIMIT', SEARCH_CONSOLE_ROW_LIMIT, 1),
+                                ('RANKING_TOP_N', RANKING_TOP_N, 1),
+                                ('SHEETS_READ_CHUNK_ROWS', SHEETS_READ_CHUNK_ROWS, 0)):
+        if not isinstance(valor, int) or valor < minimo:
+            erros.append(f"{nome} deve ser um inteiro >= {minimo}: {valor!r}")
+    if isinstance(SEARCH_CONSOLE_ROW_LIMIT, int) and SEARCH_CONSOLE_ROW_LIMIT > 25000:
+        erros.append("SEARCH_CONSOLE_ROW_LIMIT não pode passar de 25000 (limite da API)")
+    if not isinstance(REQUEST_TIMEOUT, (int, float)) or REQUEST_TIMEOUT <= 0:
+        erros.append(f"REQUEST_TIMEOUT deve ser positivo: {REQUEST_TIMEOUT!r}")
+    if not isinstance(API_QUOTAS_PER_MINUTE, dict):
+        erros.append("API_QUOTAS_PER_MINUTE deve ser um dicionário {api: chamadas por minuto}")
+    else:
+        for api, cota in API_QUOTAS_PER_MINUTE.items():
+            if api not in ('sheets', 'search_console', 'ga4'):
+                avisos.append(f"API_QUOTAS_PER_MINUTE: API desconhecida {api!r} (ignorada)")
+            elif cota is not None and (not isinstance(cota, (int, float)) or cota <= 0):
+                erros.append(f"API_QUOTAS_PER_MINUTE[{api!r}] deve ser positivo ou None: {cota!r}")
+
+    if not os.path.exists(credentials_file):
+        erros.append(f"{credentials_file} não encontrado (service account)")
+    else:
+        try:
+            with open(credentials_file, encoding='utf-8') as f:
+                info = json.load(f)
+            faltando = [c for c in ('type', 'client_email', 'private_key') if not info.get(c)]
+            if faltando:
+                erros.append(f"{credentials_file} sem os campos: {', '.join(faltando)}")
+            elif info['type'] != 'service_account':
+                erros.append(f"{credentials_file} deve ser de uma service account (type={info['type']!r})")
+        except Exception as e:
+            erros.append(f"{credentials_file} inválido: {e}")
+    if not os.path.exists('oauth_credentials.json'):
+        avisos.append("oauth_credentials.json ausente: o GA4 usará a service account")
+    return erros, avisos
+
+
 class SEODataExtractor:
-    def __init__(self):
-        # Configurar credenciais para Google Sheets (service account)
-        self.creds = ServiceAccountCredentials.from_json_keyfile_name('credentials.json', SCOPES)
-        self.gspread_client = gspread.authorize(self.creds)
-        
-        # Configurar credenciais para Search Console (service account)
-        self.search_console_creds = service_account.Credentials.from_service_account_file(
-            'credentials.json', scopes=['https://www.googleapis.com/auth/webmasters.readonly'])
-        
-        # Configurar credenciais para GA4 (OAuth - será configurado depois)
+    def __init__(self, clients: GoogleClientPool | None = None, scheduler: RequestScheduler | None = None,
+                 metricas: Metricas | None = None, spreadsheet_url: str | None = None, aba: str | None = None,
+                 mtd_state_path: str | None = None, somente_leitura: bool = False):
+        # Planilha e aba sincronizadas (padrão: SPREADSHEET_URL/ABA_DADOS_ORIGEM do config; o modo
+        # frota, em fleet_sync.py, cria um extrator por planilha)
+        self.spreadsheet_url = spreadsheet_url or SPREADSHEET_URL
+        self.aba = aba or ABA_DADOS_ORIGEM
+        self.mtd_state_path = mtd_state_path or MONTH_TO_DATE_STATE_PATH
+
+        # Pool de clientes do processo: credentials.json lido uma vez, clientes reaproveitados
+        self.clients = clients or obter_pool('credentials.json', timeout=REQUEST_TIMEOUT)
+
+        # Contadores/latências da execução (exportados ao fim de cada sincronização)
+        self.metricas = metricas or obter_metricas()
+        self.metricas_json_path = METRICS_JSON_PATH
+        self.metricas_prometheus_path = METRICS_PROMETHEUS_PATH
+
+        # Toda chamada às APIs passa pelo agendador (cotas por API e novas tentativas)
+        self.scheduler = scheduler or obter_scheduler(cotas_por_minuto=API_QUOTAS_PER_MINUTE,
+                                                      max_tentativas=MAX_RETRIES,
+                                                      atraso_base=DELAY_BETWEEN_REQUESTS,
+                                                      metricas=self.metricas)
+
+        # Credenciais, clientes e a planilha só são criados/abertos quando alguma operação
+        # precisa deles (ver as propriedades abaixo): o menu, o --help e o --dry-run iniciam rápido
+        self._sheet = None
+
+        # Configurar credenciais para GA4 (OAuth - será configurado na primeira extração)
         self.ga4_creds = None
-        # Tentar preparar credenciais de service account para GA4 (fallback)
+        
+        # Mapa de blocos da aba (domínio/cabeçalho/meses), reaproveitado enquanto a coluna A não mudar
+        self._layout_cache = None
+
+        # siteUrl do Search Console que funciona para cada domínio (persistido entre execuções)
+        self.sites = SiteRegistry(SC_SITES_REGISTRY_PATH, ttl_lista=SC_SITES_LIST_TTL_HOURS * 3600)
+
+        # Primeiras páginas do Search Console já recebidas em lote (ver _prebuscar_search_console)
+        self._respostas_gsc = {}
+
+        # Cache local de respostas das APIs (`somente_leitura`, no --dry-run: só um cache já existente,
+        # sem gravar nada nele)
+        self.cache = None
+        if CACHE_ENABLED and (not somente_leitura or os.path.exists(CACHE_PATH)):
+            try:
+                self.cache = ResponseCache(CACHE_PATH, ttl_segundos=CACHE_TTL_SECONDS,
+                                           dias_finalizacao=CACHE_FINALIZATION_DAYS,
+                                           max_entradas=CACHE_MAX_ENTRIES, somente_leitura=somente_leitura)
+            except Exception as e:
+                print(f"⚠️  Cache local indisponível: {e}")
+
+        # Armazém colunar com tudo o que foi extraído (histórico por URL, reagregações)
+        self.armazem = None
+        if COLUMNAR_STORE_ENABLED:
+            try:
+                self.armazem = ColumnarStore(COLUMNAR_STORE_PATH)
+            except Exception as e:
+                print(f"⚠️  Armazém colunar indisponível: {e}")
+
+    @property
+    def gspread_client(self):
+        """Cliente gspread autorizado (service account), criado no primeiro uso."""
+        return self.clients.gspread()
+
+    @property
+    def search_console_creds(self):
+        return self.clients.credenciais(SCOPE_SEARCH_CONSOLE)
+
+    @property
+    def ga4_service_creds(self):
+        """Credenciais de service account para o GA4 (fallback do OAuth), ou None."""
         try:
-            self.ga4_service_creds = service_account.Credentials.from_service_account_file(
-                'credentials.json', scopes=['https://www.googleapis.com/auth/analytics.readonly']
-            )
+            return self.clients.credenciais(SCOPE_GA4)
         except Exception:
-            self.ga4_service_creds = None
-        
-        # Abrir planilha
-        self.sheet = self.gspread_client.open_by_url(SPREADSHEET_URL)
-        
-        print("✅ Conexões estabelecidas com sucesso!")
-        print("⚠️  GA4 usará autenticação OAuth (será solicitada na primeira execução)")
-        
-        # Cache de site do Search Console detectado pela planilha
-        self._sc_site_url_cache = None
+            return None
+
+    @property
+    def sheet(self):
+        """Planilha, aberta na primeira operação que a usa."""
+        if self._sheet is None:
+            self._sheet = self._chamar_sheets(self.gspread_client.open_by_url, self.spreadsheet_url)
+            print("✅ Conexão com a planilha estabelecida")
+        return self._sheet
+
+    @sheet.setter
+    def sheet(self, planilha):
+        self._sheet = planilha
+
+    def _chamar_sheets(self, funcao, *args, **kwargs):
+        """Executa uma chamada ao Google Sheets pelo agendador (cota e novas tentativas)."""
+        return self.scheduler.executar('sheets', funcao, *args, **kwargs)
+
+    def _exportar_metricas(self, duracao: float | None = None):
+        """Grava o resumo JSON e o textfile do Prometheus (se configurados) ao fim de uma sincronização."""
+        if duracao is not None:
+            self.metricas.observar('fase_segundos', duracao, fase='sincronizacao')
+            self.metricas.definir('ultima_sincronizacao_duracao_segundos', round(duracao, 3))
+        self.metricas.definir('ultima_sincronizacao_timestamp_segundos', round(time.time(), 3))
+        try:
+            self.metricas.exportar(self.metricas_json_path, self.metricas_prometheus_path)
+        except Exception as e:
+            print(f"⚠️  Não foi possível gravar as métricas: {e}")
+
+    def invalidar_cache(self, fonte: str | None = None, alvo: str | None = None, mes: str | None = None):
+        """Remove respostas do cache local (fonte 'gsc'/'ga4', domínio/propriedade, mês 'AAAA-MM').
+        Sem filtros, esvazia o cache. Retorna o número de entradas removidas.
+        """
+        if self.cache is None:
+            return 0
+        removidas = self.cache.invalidar(fonte=fonte, alvo=alvo, mes=mes)
+        print(f"🧹 {removidas} resposta(s) removida(s) do cache local")
+        return removidas
+
+    def _abrir_gravador(self, fonte, dominio, dimensoes, inicio, fim):
+        """Gravador do armazém colunar para uma consulta, ou None se o armazém estiver desligado."""
+        if self.armazem is None:
+            return None
+        dominio = _limpar_dominio(str(dominio).replace('sc-domain:', ''))
+        return self.armazem.gravador(fonte, dominio, dimensoes, inicio, fim)
+
+    def _armazenar(self, gravador, rows):
+        """Acrescenta linhas ao gravador; uma falha do armazém nunca interrompe a extração.
+        Retorna o gravador, ou None se ele teve de ser descartado.
+        """
+        if gravador is None:
+            return None
+        try:
+            gravador.adicionar(rows)
+            return gravador
+        except Exception as e:
+            print(f"   ⚠️ Armazém colunar: linhas não gravadas ({e})")
+            gravador.descartar()
+            return None
+
+    def _finalizar_gravador(self, gravador, concluido=True):
+        """Publica os arquivos da consulta (ou os descarta, se a extração não terminou)."""
+        if gravador is None:
+            return
+        if not concluido:
+            gravador.descartar()
+            return
+        try:
+            gravador.fechar()
+            self.metricas.contar('armazem_linhas_total', gravador.linhas, fonte=gravador.fonte)
+        except Exception as e:
+            print(f"   ⚠️ Armazém colunar: linhas não gravadas ({e})")
+            gravador.descartar()
+
+    def consultar_armazem(self, sql: str, parametros: list | None = None):
+        """SQL (DuckDB) sobre a view `metricas` do armazém colunar, sem chamadas às APIs.
+        Ex: "SELECT pagina, sum(clicks) FROM metricas WHERE fonte = 'gsc' GROUP BY 1".
+        """
+        if self.armazem is None:
+            print("⚠️  Armazém colunar desativado")
+            return []
+        return self.armazem.consultar(sql, parametros)
+
+    def historico_url(self, url: str, dominio: str | None = None, fonte: str = 'gsc'):
+        """Todas as linhas armazenadas de uma página (URL do GSC ou pagePath do GA4)."""
+        if self.armazem is None:
+            print("⚠️  Armazém colunar desativado")
+            return []
+        return self.armazem.historico_url(url, dominio=_limpar_dominio(dominio) if dominio else None, fonte=fonte)
+
+    def reagregar_metricas(self, dominio: str | None = None, fonte: str = 'gsc', por: str = 'mes',
+                           dimensoes: list | None = None, mes_inicio: str | None = None, mes_fim: str | None = None):
+        """Reagrega as linhas armazenadas por 'dia', 'semana', 'mes', 'ano', 'pagina' ou 'consulta'
+        (impressões, cliques, CTR, posição média ponderada e sessões), sem chamadas às APIs.
+        """
+        if self.armazem is None:
+            print("⚠️  Armazém colunar desativado")
+            return []
+        return self.armazem.reagregar(fonte=fonte, dominio=_limpar_dominio(dominio) if dominio else None,
+                                      dimensoes=dimensoes, por=por, mes_inicio=mes_inicio, mes_fim=mes_fim)
     
-    def extrair_dados_search_console(self, start_date, end_date, domain_override: str | None = None):
-        """Extrai dados do Google Search Console"""
+    @_medir_fase('extrair_gsc')
+    def extrair_dados_search_console(self, start_date, end_date, domain_override: str | None = None,
+                                     raise_errors: bool = False, dimensions: list | None = None):
+        """Extrai dados do Google Search Console (todas as páginas de resultado, em lista).
+        `dimensions` padrão: SEARCH_CONSOLE_DIMENSIONS (linhas por página+consulta); com [] o GSC
+        devolve só os totais do período (uma linha). Com raise_errors=True a falha é propagada
+        em vez de virar uma lista vazia. Para volumes grandes prefira iterar_linhas_search_console.
+        """
         try:
             print(f"📊 Extraindo dados do Search Console ({start_date} a {end_date})...")
-            
-            service = build('searchconsole', 'v1', credentials=self.search_console_creds)
-
-            # Resolver siteUrl a partir da planilha (A1) ou do config, com fallback
-            candidate_sites = []
-            domain = domain_override or self._detect_domain_from_sheet113()
-            if domain:
-                candidate_sites.extend([f"sc-domain:{domain}", f"https://{domain}/"])
-                # Override específico do config, se existir
-                cfg = DOMAIN_CONFIGS.get(domain)
-                if cfg and cfg.get('sc_site'):
-                    candidate_sites.insert(0, cfg['sc_site'])
-            candidate_sites.append(SEARCH_CONSOLE_SITE)
 
-            last_error = None
-            for site in candidate_sites:
-                try:
-                    request = {
-                        'startDate': start_date,
-                        'endDate': end_date,
-                        'dimensions': ['page', 'query'],
-                        'rowLimit': 25000,
-                        'startRow': 0
-                    }
-                    response = service.searchanalytics().query(siteUrl=site, body=request).execute()
-                    dados = response.get('rows', [])
-                    self._sc_site_url_cache = site
-                    print(f"   ✅ {len(dados)} registros extraídos do Search Console (site: {site})")
+            dims = list(SEARCH_CONSOLE_DIMENSIONS if dimensions is None else dimensions)
+            # Sem domínio explícito o site vem da planilha, então não há chave estável para o cache
+            usar_cache = self.cache is not None and domain_override is not None
+            if usar_cache:
+                dados = self.cache.obter('gsc', domain_override, dims, start_date, end_date)
+                if dados is not None:
+                    print(f"   💾 {len(dados)} registros do Search Console servidos do cache local")
                     return dados
-                except Exception as e:
-                    last_error = e
-                    continue
 
-            if last_error:
-                raise last_error
-            return []
+            dados = list(self.iterar_linhas_search_console(start_date, end_date, domain_override=domain_override,
+                                                           dimensions=dims))
+            print(f"   ✅ {len(dados)} registros extraídos do Search Console")
+            if usar_cache:
+                self.cache.gravar('gsc', domain_override, dims, start_date, end_date, dados)
+            return dados
             
         except Exception as e:
             print(f"   ❌ Erro ao extrair dados do Search Console: {e}")
+            if raise_errors:
+                raise
             return []
+
+    def iterar_paginas_search_console(self, start_date, end_date, domain_override: str | None = None,
+                                      dimensions: list | None = None):
+        """Gera as páginas de resultado do Search Console (listas de até SEARCH_CONSOLE_ROW_LIMIT
+        linhas), seguindo startRow até o fim do resultado. Erros são propagados.
+        """
+        service = self.clients.search_console()
+        request = self._corpo_search_console(start_date, end_date,
+                                             SEARCH_CONSOLE_DIMENSIONS if dimensions is None else dimensions)
+        prebuscada = self._respostas_gsc.pop((domain_override, start_date, end_date, tuple(request['dimensions'])),
+                                             None)
+        if prebuscada is not None:
+            domain = domain_override
+            site, response = prebuscada
+        else:
+            domain, candidate_sites = self._candidatos_site_search_console(service, domain_override)
+            site, response = self._consultar_search_console(service, domain, candidate_sites, request)
+
+        # Cada página de resultado também vai para o armazém colunar, publicado só no fim
+        gravador = self._abrir_gravador('gsc', domain, request['dimensions'], start_date, end_date)
+        concluido = False
+        try:
+            while True:
+                rows = response.get('rows', [])
+                self.metricas.contar('linhas_total', len(rows), fonte='gsc')
+                gravador = self._armazenar(gravador, rows)
+                if rows:
+                    yield rows
+                if len(rows) < request['rowLimit']:
+                    break
+                request['startRow'] += len(rows)
+                response = self.scheduler.executar('search_console',
+                                                   service.searchanalytics().query(siteUrl=site, body=request).execute,
+                                                   operacao='searchanalytics.query', payload=request)
+            concluido = True
+        finally:
+            self._finalizar_gravador(gravador, concluido)
+
+    @staticmethod
+    def _corpo_search_console(start_date, end_date, dimensions):
+        return {
+            'startDate': start_date,
+            'endDate': end_date,
+            'dimensions': list(dimensions),
+            'rowLimit': SEARCH_CONSOLE_ROW_LIMIT,
+            'startRow': 0
+        }
+
+    def _prebuscar_search_console(self, consultas):
+        """Envia a primeira página de cada consulta em lotes HTTP (BatchHttpRequest, até
+        SEARCH_CONSOLE_BATCH_SIZE por lote): conexão e TLS pagos uma vez por lote, não por consulta.
+        `consultas`: [(domínio, início, fim, dimensões)]. As respostas ficam guardadas até
+        iterar_paginas_search_console pedi-las. Páginas seguintes, domínios sem siteUrl conhecido
+        (registrado ou em sites.list) e consultas que falharem no lote seguem pelo caminho normal,
+        que testa os candidatos e repete erros transitórios. Retorna o número de respostas guardadas.
+        """
+        consultas = list(dict.fromkeys((d, i, f, tuple(dims)) for d, i, f, dims in consultas))
+        if not SEARCH_CONSOLE_BATCH_SIZE or len(consultas) < 2:
+            return 0
+        service = self.clients.search_console()
+        sites = {}
+        for domain in dict.fromkeys(consulta[0] for consulta in consultas):
+            if self.sites.sem_acesso(domain):
+                continue
+            # Sem site registrado, vale o primeiro candidato se constar em sites.list
+            _, candidatos = self._candidatos_site_search_console(service, domain)
+            if candidatos and (self.sites.obter(domain) == candidatos[0] or self.sites.acessivel(candidatos[0])):
+                sites[domain] = candidatos[0]
+        pendentes = [(consulta, sites[consulta[0]]) for consulta in consultas if consulta[0] in sites]
+        if len(pendentes) < 2:
+            return 0
+
+        guardadas = 0
+        for k in range(0, len(pendentes), SEARCH_CONSOLE_BATCH_SIZE):
+            lote = pendentes[k:k + SEARCH_CONSOLE_BATCH_SIZE]
+            respostas = {}
+
+            def receber(request_id, resposta, erro, respostas=respostas):
+                if erro is None:
+                    respostas[int(request_id)] = resposta
+
+            batch = service.new_batch_http_request(callback=receber)
+            corpos = []
+            for i, ((_, inicio, fim, dimensoes), site) in enumerate(lote):
+                corpos.append(self._corpo_search_console(inicio, fim, dimensoes))
+                batch.add(service.searchanalytics().query(siteUrl=site, body=corpos[-1]), request_id=str(i))
+            try:
+                self.scheduler.executar('search_console', batch.execute, custo=len(lote),
+                                        operacao='searchanalytics.batch', payload=corpos)
+            except Exception as e:
+                print(f"   ⚠️ Lote do Search Console falhou ({e}); as consultas seguem uma a uma")
+                continue
+            self.metricas.contar('api_lote_consultas_total', len(lote), api='search_console')
+            for i, resposta in respostas.items():
+                chave, site = lote[i]
+                if self.sites.obter(chave[0]) != site and self._registravel(chave[0], site):
+                    print(f"   🔗 {chave[0]}: usando a propriedade {site} do Search Console")
+                    self.sites.registrar(chave[0], site)
+                self._respostas_gsc[chave] = (site, resposta)
+            guardadas += len(respostas)
+
+        print(f"   📦 {guardadas} de {len(pendentes)} consulta(s) ao Search Console recebidas em "
+              f"{-(-len(pendentes) // SEARCH_CONSOLE_BATCH_SIZE)} lote(s)")
+        return guardadas
+
+    def _consultas_gsc_pendentes(self, tarefas, backfill):
+        """Primeiras consultas ao Search Console que a extração das `tarefas` fará, descontados
+        os meses já no cache (as mesmas de _extrair_dominio_em_lote/_extrair_unidade).
+        """
+        consultas = []
+        for tarefa in tarefas:
+            domain = tarefa[0]['domain']
+            if backfill:
+                meses = _meses_do_periodo(min(u['inicio'] for u in tarefa), max(u['fim'] for u in tarefa))
+                em_cache = self._gsc_por_mes_em_cache(domain, meses)
+                faltando = [mes for mes in meses if mes[0] not in em_cache]
+                if faltando:
+                    consultas.append((domain, faltando[0][1], faltando[-1][2], ['date']))
+            else:
+                for unidade in tarefa:
+                    if self.cache is None or self.cache.obter('gsc', domain, [], unidade['inicio'], unidade['fim']) is None:
+                        consultas.append((domain, unidade['inicio'], unidade['fim'], []))
+        return consultas
+
+    def iterar_linhas_search_console(self, start_date, end_date, domain_override: str | None = None,
+                                     dimensions: list | None = None):
+        """Gera as linhas do Search Console uma a uma, sem materializar o resultado inteiro."""
+        for pagina in self.iterar_paginas_search_console(start_date, end_date, domain_override=domain_override,
+                                                         dimensions=dimensions):
+            yield from pagina
+
+    def extrair_totais_search_console(self, start_date, end_date, domain_override: str | None = None,
+                                      raise_errors: bool = False):
+        """Extrai apenas os totais do período (impressões, cliques, CTR e posição média ponderada),
+        sem dimensões: uma única linha em vez de milhares de linhas página+consulta.
+        """
+        return self.extrair_dados_search_console(start_date, end_date, domain_override=domain_override,
+                                                 raise_errors=raise_errors, dimensions=[])
+
+    def _gsc_por_mes_em_cache(self, domain, meses):
+        """{rótulo: linhas} dos meses (rótulo, início, fim) com a consulta 'date' no cache local."""
+        if self.cache is None or domain is None:
+            return {}
+        em_cache = self.cache.obter_varios('gsc', domain, ['date'], [(inicio, fim) for _, inicio, fim in meses])
+        return {rotulo: em_cache[(inicio, fim)] for rotulo, inicio, fim in meses if (inicio, fim) in em_cache}
+
+    @_medir_fase('extrair_gsc_por_mes')
+    def extrair_search_console_por_mes(self, start_date, end_date, domain_override: str | None = None,
+                                       raise_errors: bool = False):
+        """Extrai o período inteiro do Search Console numa única consulta (paginada) com a dimensão
+        'date' e separa as linhas por mês. Retorna {rótulo do mês (ex: mar-25): [linhas]}.
+        """
+        try:
+            print(f"📊 Extraindo Search Console em lote por dia ({start_date} a {end_date})...")
+
+            meses = _meses_do_periodo(start_date, end_date)
+            usar_cache = self.cache is not None and domain_override is not None
+            por_mes = self._gsc_por_mes_em_cache(domain_override, meses)
+            faltando = [mes for mes in meses if mes[0] not in por_mes]
+            if not faltando:
+                print(f"   💾 {len(meses)} mês(es) do Search Console servidos do cache local")
+                return por_mes
+
+            # Consulta única cobrindo só o intervalo dos meses ausentes do cache
+            total = 0
+            rotulo_do_dia = rotulo_por_data(_rotulo_mes)
+            for row in self.iterar_linhas_search_console(faltando[0][1], faltando[-1][2],
+                                                         domain_override=domain_override, dimensions=['date']):
+                por_mes.setdefault(rotulo_do_dia(row['keys'][0]), []).append(row)
+                total += 1
+
+            print(f"   ✅ {total} dias extraídos do Search Console em {len(faltando)} mês(es)")
+            if usar_cache:
+                self.cache.gravar_varios('gsc', domain_override, ['date'],
+                                         [(inicio, fim, por_mes.get(rotulo, [])) for rotulo, inicio, fim in faltando])
+            return por_mes
+
+        except Exception as e:
+            print(f"   ❌ Erro ao extrair dados do Search Console: {e}")
+            if raise_errors:
+                raise
+            return {}
+
+    @_medir_fase('extrair_ranking')
+    def extrair_ranking_search_console(self, start_date, end_date, domain_override: str | None = None,
+                                       n: int | None = None):
+        """Top-N consultas e top-N páginas do período, por cliques e por impressões: uma consulta
+        paginada por dimensão ('query' e 'page'), consumida em streaming com memória O(n) (ver
+        aggregation.RankingGSC). Retorna {'consulta': RankingGSC, 'página': RankingGSC}. Erros são propagados.
+        """
+        rankings = {}
+        for tipo, dimensao in _TIPOS_RANKING.items():
+            rankings[tipo] = RankingGSC(n if n is not None else RANKING_TOP_N).adicionar_linhas(
+                self.iterar_linhas_search_console(start_date, end_date, domain_override=domain_override,
+                                                  dimensions=[dimensao]))
+        return rankings
+
+    def _sites_do_dominio(self, domain):
+        """siteUrl próprios do domínio: o sc_site do config (se houver), sc-domain: e https://.../."""
+        sites = [f"sc-domain:{domain}", f"https://{domain}/"]
+        cfg = DOMAIN_CONFIGS.get(domain)
+        if cfg and cfg.get('sc_site'):
+            sites.insert(0, cfg['sc_site'])
+        return sites
+
+    def _registravel(self, domain, site):
+        """Só os sites próprios do domínio são registrados para ele: o SEARCH_CONSOLE_SITE global
+        (último recurso sem domínio informado) traria dados de outro site nas próximas execuções.
+        """
+        return domain == SEARCH_CONSOLE_SITE or site in self._sites_do_dominio(domain)
+
+    def _candidatos_site_search_console(self, service, domain_override: str | None = None):
+        """Retorna (domínio, siteUrl candidatos na ordem de preferência). O site já registrado
+        para o domínio vem primeiro; sem registro, a lista de propriedades (sites.list,
+        guardada no registro por SC_SITES_LIST_TTL_HOURS) decide a ordem. O SEARCH_CONSOLE_SITE global só entra como último
+        recurso quando nenhum domínio é informado.
+        """
+        # Resolver siteUrl a partir da planilha (A1) ou do config, com fallback
+        candidate_sites = []
+        domain = domain_override or self._detect_domain_from_sheet113()
+        if domain:
+            candidate_sites.extend(self._sites_do_dominio(domain))
+        if domain_override is None:
+            candidate_sites.append(SEARCH_CONSOLE_SITE)
+
+        domain = domain or SEARCH_CONSOLE_SITE
+        registrado = self.sites.obter(domain)
+        if registrado is not None and not self._registravel(domain, registrado):
+            # Registro antigo apontando para o site global (ou para um sc_site trocado no config)
+            print(f"   🔗 {domain}: descartando a propriedade registrada {registrado}")
+            self.sites.remover(domain)
+        if self.sites.obter(domain) is None and SC_SITES_USE_LIST:
+            try:
+                self.sites.carregar_lista(
+                    lambda: self.scheduler.executar('search_console', service.sites().list().execute,
+                                                    operacao='sites.list'))
+            except Exception as e:
+                print(f"   ⚠️ Não foi possível listar as propriedades do Search Console: {e}")
+        return domain, self.sites.ordenar_candidatos(domain, candidate_sites)
+
+    def _consultar_search_console(self, service, domain, candidate_sites, request):
+        """Executa a consulta no primeiro siteUrl candidato que responder e registra o site
+        que funcionou para o domínio. Retorna (site, resposta).
+        """
+        if self.sites.sem_acesso(domain):
+            raise RuntimeError(f"nenhuma propriedade do Search Console acessível para {domain} (falha anterior nesta execução)")
+
+        last_error = None
+        sem_permissao = True
+        for site in candidate_sites:
+            try:
+                response = self.scheduler.executar('search_console',
+                                                   service.searchanalytics().query(siteUrl=site, body=request).execute,
+                                                   operacao='searchanalytics.query', payload=request)
+                if self.sites.obter(domain) != site and self._registravel(domain, site):
+                    print(f"   🔗 {domain}: usando a propriedade {site} do Search Console")
+                    self.sites.registrar(domain, site)
+                return site, response
+            except Exception as e:
+                last_error = e
+                status = status_http(e)
+                if status in (403, 404):
+                    if self.sites.obter(domain) == site:
+                        # Site registrado deixou de funcionar (permissão removida, propriedade apagada)
+                        self.sites.remover(domain)
+                else:
+                    sem_permissao = False
+                continue
+
+        if last_error:
+            # Sem acesso a nenhum candidato: não repetir as tentativas nos próximos meses
+            if sem_permissao:
+                self.sites.marcar_sem_acesso(domain)
+            raise last_error
+        return None, {}
     
     def configurar_oauth_ga4(self):
         """Configura autenticação OAuth para GA4"""
@@ -152,100 +844,212 @@ class SEODataExtractor:
             print(f"❌ Erro ao configurar OAuth GA4: {e}")
             return None
     
-    def extrair_dados_ga4(self, start_date, end_date, property_id: str | None = None):
-        """Extrai dados do Google Analytics 4"""
+    def _obter_credenciais_ga4(self):
+        """Seleciona as credenciais do GA4: OAuth (se disponível) ou Service Account (fallback)."""
+        if not self.ga4_creds:
+            import os
+            use_oauth = os.path.exists('oauth_credentials.json')
+            creds = None
+            if use_oauth:
+                creds = self.configurar_oauth_ga4()
+            if not creds and self.ga4_service_creds is not None:
+                print("⚠️  Usando Service Account para GA4 (sem tela de consentimento)")
+                creds = self.ga4_service_creds
+            if not creds:
+                print("❌ Não foi possível obter credenciais para GA4 (OAuth ou Service Account)")
+                return None
+            self.ga4_creds = creds
+        return self.ga4_creds
+
+    def _consultar_ga4(self, client, property_id, dimensao, start_date, end_date, offset=0, limite=None):
+        """Uma página (`limite` ou GA4_ROW_LIMIT linhas a partir de `offset`) do relatório de sessões do GA4."""
+        request = self.clients.requisicao_ga4(property_id, dimensao, start_date, end_date,
+                                              limite or GA4_ROW_LIMIT, offset)
+        return self.scheduler.executar('ga4', client.run_report, request=request, timeout=REQUEST_TIMEOUT,
+                                       payload=request)
+
+    def testar_conexoes(self, start_date, end_date):
+        """Teste rápido de acesso às APIs: uma consulta de totais ao Search Console e uma página
+        de uma linha do GA4, sem paginação, cache local nem armazém colunar. Retorna
+        {'gsc': linhas, 'ga4': linhas}. Erros são propagados.
+        """
+        service = self.clients.search_console()
+        request = self._corpo_search_console(start_date, end_date, [])
+        request['rowLimit'] = 1
+        domain, candidate_sites = self._candidatos_site_search_console(service)
+        _, resposta_gsc = self._consultar_search_console(service, domain, candidate_sites, request)
+        if not self._obter_credenciais_ga4():
+            raise RuntimeError("credenciais do GA4 indisponíveis")
+        resposta_ga4 = self._consultar_ga4(self.clients.ga4(self.ga4_creds), GA4_PROPERTY_ID, 'pagePath',
+                                           start_date, end_date, limite=1)
+        return {'gsc': len(resposta_gsc.get('rows', [])), 'ga4': len(resposta_ga4.rows)}
+
+    def iterar_paginas_ga4(self, start_date, end_date, property_id: str | None = None,
+                           dimensao: str = 'pagePath', dominio: str | None = None):
+        """Gera as páginas de resultado do GA4 (listas de até GA4_ROW_LIMIT linhas já convertidas).
+        A primeira resposta informa o row_count; as páginas seguintes (offset) são pedidas em
+        paralelo, até GA4_PARALLEL_PAGES ao mesmo tempo, e entregues na ordem. Erros são propagados.
+        """
+        property_id = property_id or GA4_PROPERTY_ID
+        if not self._obter_credenciais_ga4():
+            raise RuntimeError("credenciais do GA4 indisponíveis")
+        client = self.clients.ga4(self.ga4_creds)
+        consultar = functools.partial(self._consultar_ga4, client, property_id, dimensao, start_date, end_date)
+
+        primeira = consultar()
+        total = primeira.row_count
+        offsets = list(range(GA4_ROW_LIMIT, total, GA4_ROW_LIMIT)) if len(primeira.rows) >= GA4_ROW_LIMIT else []
+        workers = min(GA4_PARALLEL_PAGES, len(offsets))
+        pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+
+        def respostas():
+            yield primeira
+            if pool is None:
+                for offset in offsets:
+                    yield consultar(offset)
+                return
+            # Janela de `workers` páginas em andamento: paralelismo sem acumular o relatório inteiro
+            futuros = deque(pool.submit(consultar, offset) for offset in offsets[:workers])
+            proximos = iter(offsets[workers:])
+            while futuros:
+                resposta = futuros.popleft().result()
+                offset = next(proximos, None)
+                if offset is not None:
+                    futuros.append(pool.submit(consultar, offset))
+                yield resposta
+
+        # Cada página também vai para o armazém colunar, publicado só no fim
+        gravador = self._abrir_gravador('ga4', dominio or property_id, [dimensao], start_date, end_date)
+        concluido = False
+        recebidas = 0
+        try:
+            for resposta in respostas():
+                rows = [_linha_ga4(dimensao, row) for row in resposta.rows]
+                recebidas += len(rows)
+                self.metricas.contar('linhas_total', len(rows), fonte='ga4')
+                gravador = self._armazenar(gravador, rows)
+                if rows:
+                    yield rows
+            if recebidas < total:
+                print(f"   ⚠️ GA4 devolveu {recebidas} de {total} linhas ({dimensao}, {start_date} a {end_date})")
+            concluido = True
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+            self._finalizar_gravador(gravador, concluido)
+
+    def iterar_linhas_ga4(self, start_date, end_date, property_id: str | None = None,
+                          dimensao: str = 'pagePath', dominio: str | None = None):
+        """Gera as linhas do GA4 uma a uma, sem materializar o relatório inteiro."""
+        for pagina in self.iterar_paginas_ga4(start_date, end_date, property_id=property_id, dimensao=dimensao,
+                                              dominio=dominio):
+            yield from pagina
+
+    @_medir_fase('extrair_ga4')
+    def extrair_dados_ga4(self, start_date, end_date, property_id: str | None = None,
+                          raise_errors: bool = False, dominio: str | None = None):
+        """Extrai dados do Google Analytics 4 (todas as páginas do relatório, em lista).
+        Com raise_errors=True a falha é propagada em vez de virar uma lista vazia. `dominio`
+        identifica a partição no armazém colunar (padrão: a própria propriedade).
+        """
         try:
             print(f"📈 Extraindo dados do GA4 ({start_date} a {end_date})...")
-            
-            # Selecionar método de autenticação: OAuth (se disponível) ou Service Account (fallback)
-            if not self.ga4_creds:
-                import os
-                use_oauth = os.path.exists('oauth_credentials.json')
-                creds = None
-                if use_oauth:
-                    creds = self.configurar_oauth_ga4()
-                if not creds and self.ga4_service_creds is not None:
-                    print("⚠️  Usando Service Account para GA4 (sem tela de consentimento)")
-                    creds = self.ga4_service_creds
-                if not creds:
-                    print("❌ Não foi possível obter credenciais para GA4 (OAuth ou Service Account)")
-                    return []
-                self.ga4_creds = creds
-            
-            client = BetaAnalyticsDataClient(credentials=self.ga4_creds)
-            
-            request = RunReportRequest(
-                property=f"properties/{(property_id or GA4_PROPERTY_ID)}",
-                date_ranges=[DateRange(start_date=start_date, end_date=end_date)],
-                dimensions=[Dimension(name="pagePath")],
-                metrics=[
-                    Metric(name="sessions")
-                ]
-            )
-            
-            response = client.run_report(request=request)
-            
-            dados = []
-            for row in response.rows:
-                dados.append({
-                    'page_path': row.dimension_values[0].value,
-                    'sessions': row.metric_values[0].value
-                })
-            
+
+            property_id = property_id or GA4_PROPERTY_ID
+            if self.cache is not None:
+                dados = self.cache.obter('ga4', property_id, ['pagePath'], start_date, end_date)
+                if dados is not None:
+                    print(f"   💾 {len(dados)} registros do GA4 servidos do cache local")
+                    return dados
+
+            dados = list(self.iterar_linhas_ga4(start_date, end_date, property_id=property_id, dominio=dominio))
+
             print(f"   ✅ {len(dados)} registros extraídos do GA4")
+            if self.cache is not None:
+                self.cache.gravar('ga4', property_id, ['pagePath'], start_date, end_date, dados)
             return dados
             
         except Exception as e:
             print(f"   ❌ Erro ao extrair dados do GA4: {e}")
+            if raise_errors:
+                raise
             return []
+
+    @_medir_fase('extrair_ga4_por_mes')
+    def extrair_ga4_por_mes(self, start_date, end_date, property_id: str | None = None,
+                            raise_errors: bool = False, dominio: str | None = None):
+        """Extrai as sessões de todo o período do GA4 numa única consulta (paginada) com a dimensão
+        'yearMonth'. Retorna {rótulo do mês (ex: mar-25): [linhas]}.
+        """
+        try:
+            print(f"📈 Extraindo GA4 em lote por mês ({start_date} a {end_date})...")
+
+            property_id = property_id or GA4_PROPERTY_ID
+            meses = _meses_do_periodo(start_date, end_date)
+            por_mes = {}
+            if self.cache is not None:
+                em_cache = self.cache.obter_varios('ga4', property_id, ['yearMonth'],
+                                                   [(inicio, fim) for _, inicio, fim in meses])
+                for rotulo, inicio, fim in meses:
+                    if (inicio, fim) in em_cache:
+                        por_mes[rotulo] = em_cache[(inicio, fim)]
+            faltando = [mes for mes in meses if mes[0] not in por_mes]
+            if not faltando:
+                print(f"   💾 {len(meses)} mês(es) do GA4 servidos do cache local")
+                return por_mes
+
+            # Consulta única cobrindo só o intervalo dos meses ausentes do cache
+            for row in self.iterar_linhas_ga4(faltando[0][1], faltando[-1][2], property_id=property_id,
+                                              dimensao='yearMonth', dominio=dominio):
+                year_month = row['year_month']  # ex: 202503
+                por_mes.setdefault(_rotulo_mes(int(year_month[:4]), int(year_month[4:6])), []).append(row)
+
+            print(f"   ✅ {len(faltando)} mês(es) extraídos do GA4")
+            if self.cache is not None:
+                self.cache.gravar_varios('ga4', property_id, ['yearMonth'],
+                                         [(inicio, fim, por_mes.get(rotulo, [])) for rotulo, inicio, fim in faltando])
+            return por_mes
+
+        except Exception as e:
+            print(f"   ❌ Erro ao extrair dados do GA4: {e}")
+            if raise_errors:
+                raise
+            return {}
     
-    def processar_dados_search_console(self, dados_gsc, mes_ano):
-        """Processa dados do Search Console para formato da planilha"""
-        dados_processados = {}
-        
-        for row in dados_gsc:
-            page = row['keys'][0] if len(row['keys']) > 0 else ''
-            query = row['keys'][1] if len(row['keys']) > 1 else ''
-            
-            # Normalizar URL da página
-            page_clean = self.normalize_url(page)
-            
-            if page_clean not in dados_processados:
-                dados_processados[page_clean] = {
-                    'impressions': 0,
-                    'clicks': 0,
-                    'ctr': 0,
-                    'position': 0,
-                    'queries': []
-                }
-            
-            # Agregar métricas por página
-            dados_processados[page_clean]['impressions'] += int(row.get('impressions', 0))
-            dados_processados[page_clean]['clicks'] += int(row.get('clicks', 0))
-            dados_processados[page_clean]['queries'].append(query)
-        
-        # Calcular CTR e posição média
-        for page, metrics in dados_processados.items():
-            if metrics['impressions'] > 0:
-                metrics['ctr'] = (metrics['clicks'] / metrics['impressions']) * 100
-            
-        return dados_processados
+    @_medir_fase('extrair_ga4_por_dia')
+    def extrair_ga4_por_dia(self, start_date, end_date, property_id: str | None = None,
+                            raise_errors: bool = False, dominio: str | None = None):
+        """Extrai as sessões de cada dia do período (dimensão 'date'), sem cache: usado para
+        somar só os dias novos no modo mês corrente. Retorna [{'date': 'AAAA-MM-DD', 'sessions'}].
+        """
+        try:
+            return list(self.iterar_linhas_ga4(start_date, end_date, property_id=property_id, dimensao='date',
+                                               dominio=dominio))
+
+        except Exception as e:
+            print(f"   ❌ Erro ao extrair dados do GA4: {e}")
+            if raise_errors:
+                raise
+            return []
+
+    def processar_dados_search_console(self, dados_gsc, mes_ano, paginas: AgregadoPaginas | None = None,
+                                       contar_consultas: bool = False):
+        """Processa dados do Search Console para formato da planilha.
+        Agrega por página normalizada (ver aggregation.AgregadoPaginas): impressões, cliques,
+        CTR e posição média ponderada por impressões. Com contar_consultas=True guarda também
+        o número de consultas de cada página (só a contagem, não os textos).
+        """
+        if paginas is None:
+            paginas = AgregadoPaginas(self.normalize_url, contar_consultas=contar_consultas)
+        return paginas.adicionar_linhas(dados_gsc).compactar()
     
-    def processar_dados_ga4(self, dados_ga4):
-        """Processa dados do GA4 para formato da planilha"""
-        dados_processados = {}
-        
-        for row in dados_ga4:
-            page_path = row['page_path']
-            page_clean = self.normalize_url(page_path)
-            
-            dados_processados[page_clean] = {
-                'sessions': int(row['sessions']),
-                'users': int(row['users']),
-                'pageviews': int(row['pageviews'])
-            }
-        
-        return dados_processados
+    def processar_dados_ga4(self, dados_ga4, paginas: AgregadoPaginas | None = None):
+        """Processa dados do GA4 para formato da planilha: sessões por página normalizada,
+        somadas no mesmo agregado das páginas do Search Console quando `paginas` é informado.
+        """
+        if paginas is None:
+            paginas = AgregadoPaginas(self.normalize_url)
+        return paginas.adicionar_sessoes(dados_ga4).compactar()
     
     def normalize_url(self, url):
         """Normaliza URLs para comparação"""
@@ -257,21 +1061,31 @@ class SEODataExtractor:
             url = url[:-1]
         return url
     
-    def atualizar_sheet113(self, dados_gsc, dados_ga4, mes_ano):
-        """Atualiza a aba Sheet113 com os dados extraídos"""
+    @_medir_fase('atualizar_sheet113')
+    def atualizar_sheet113(self, paginas: AgregadoPaginas, mes_ano):
+        """Atualiza a aba Sheet113 com os dados extraídos (layout horizontal: uma linha por URL).
+        `paginas` traz as métricas do GSC e do GA4 por URL normalizada. Localiza as linhas por
+        um índice URL normalizada -> linha montado uma vez, adiciona as URLs novas e grava todas
+        as células numa única chamada (endereços A1 válidos além de Z).
+        """
         try:
             print("📝 Atualizando Sheet113...")
             
-            sheet_113 = self.sheet.worksheet(ABA_DADOS_ORIGEM)
+            session = SheetSyncSession.abrir(self.sheet, self.aba, executar=self._chamar_sheets,
+                                             linhas_por_bloco=SHEETS_READ_CHUNK_ROWS)
             
             # Obter dados atuais
-            data_atual = sheet_113.get_all_values()
+            data_atual = session.data
 
             # Detecção de layout vertical (meses nas linhas, métricas nas colunas)
             if data_atual and len(data_atual) >= 2:
                 structure = self._locate_table_structure(data_atual)
                 if structure is not None:
-                    return self.atualizar_sheet113_vertical(dados_gsc, dados_ga4, mes_ano, structure)
+                    totais_gsc, sessoes = paginas.totais()
+                    resultado = self.atualizar_sheet113_vertical([totais_gsc], [{'sessions': sessoes}], mes_ano,
+                                                                 structure, session=session)
+                    session.commit()
+                    return resultado
             
             if not data_atual:
                 print("   ⚠️ Sheet113 está vazia. Criando cabeçalhos...")
@@ -283,91 +1097,80 @@ class SEODataExtractor:
                          [f'2025|{i:02d} (Average position)' for i in range(1, 13)] + \
                          [str(i) for i in range(1, 13)]  # Meses para GA4
                 
-                sheet_113.append_row(headers)
-                data_atual = [headers]
-            
-            # Processar atualizações
-            updates = []
-            
-            # Combinar dados por URL
-            todas_urls = set(dados_gsc.keys()) | set(dados_ga4.keys())
+                session.adicionar_linha(headers)
+
+            # Colunas (0-based) do mês, conforme COLUNAS_SHEET113
+            mes_num = _numero_mes(mes_ano)
+            col_impressions = COLUNAS_SHEET113['impressions_start'] + mes_num - 1
+            col_clicks = COLUNAS_SHEET113['clicks_start'] + mes_num - 1
+            col_ctr = COLUNAS_SHEET113['ctr_start'] + mes_num - 1
+            col_position = COLUNAS_SHEET113['position_start'] + mes_num - 1
+            col_sessions = COLUNAS_SHEET113['sessions_start'] + mes_num - 1
+            col_url = COLUNAS_SHEET113['landing_page']
+
+            # Índice URL normalizada -> linha (1-based), montado uma única vez
+            linhas_por_url = {}
+            for i, row in enumerate(data_atual[1:], 2):  # Começar da linha 2
+                if len(row) > col_url:
+                    linhas_por_url.setdefault(self.normalize_url(row[col_url]), i)
+
+            novas = 0
             
-            for url in todas_urls:
-                # Procurar linha existente ou criar nova
-                linha_encontrada = None
-                for i, row in enumerate(data_atual[1:], 2):  # Começar da linha 2
-                    if len(row) > 0 and self.normalize_url(row[0]) == url:
-                        linha_encontrada = i
-                        break
-                
+            for url, metricas in paginas.items():
+                linha_encontrada = linhas_por_url.get(url)
                 if linha_encontrada is None:
-                    # Adicionar nova linha
-                    nova_linha = [url, url] + [''] * (len(data_atual[0]) - 2)
-                    sheet_113.append_row(nova_linha)
-                    linha_encontrada = len(data_atual) + 1
-                    data_atual.append(nova_linha)
+                    # Nova linha, gravada junto com as demais células no commit
+                    linha_encontrada = session.adicionar_linha([url, url])
+                    linhas_por_url[url] = linha_encontrada
+                    novas += 1
                 
                 # Atualizar dados do Search Console
-                if url in dados_gsc:
-                    gsc_data = dados_gsc[url]
-                    mes_num = int(mes_ano.split('-')[0])  # Extrair número do mês
-                    
-                    # Colunas para impressões, clicks, CTR, posição (baseado no mês)
-                    col_impressions = 2 + mes_num  # Ajustar conforme layout real
-                    col_clicks = col_impressions + 12
-                    col_ctr = col_clicks + 12
-                    col_position = col_ctr + 12
-                    
-                    updates.extend([
-                        {'range': f'{chr(65 + col_impressions)}{linha_encontrada}', 
-                         'values': [[gsc_data['impressions']]]},
-                        {'range': f'{chr(65 + col_clicks)}{linha_encontrada}', 
-                         'values': [[gsc_data['clicks']]]},
-                        {'range': f'{chr(65 + col_ctr)}{linha_encontrada}', 
-                         'values': [[f"{gsc_data['ctr']:.2f}"]]}
-                    ])
+                if paginas.tem_gsc(url):
+                    session.definir(linha_encontrada, col_impressions + 1, metricas.impressions)
+                    session.definir(linha_encontrada, col_clicks + 1, metricas.clicks)
+                    session.definir(linha_encontrada, col_ctr + 1, round(metricas.ctr, 2))
+                    session.definir(linha_encontrada, col_position + 1, round(metricas.position, 2))
                 
                 # Atualizar dados do GA4
-                if url in dados_ga4:
-                    ga4_data = dados_ga4[url]
-                    mes_num = int(mes_ano.split('-')[0])
-                    
-                    # Coluna para sessões (baseado no mês)
-                    col_sessions = 50 + mes_num  # Ajustar conforme layout real
-                    
-                    updates.append({
-                        'range': f'{chr(65 + col_sessions)}{linha_encontrada}',
-                        'values': [[ga4_data['sessions']]]
-                    })
+                if paginas.tem_ga4(url):
+                    session.definir(linha_encontrada, col_sessions + 1, metricas.sessions)
             
             # Executar atualizações em lote
-            if updates:
-                sheet_113.batch_update([{'range': u['range'], 'values': u['values']} for u in updates])
-                print(f"   ✅ {len(updates)} células atualizadas na Sheet113")
+            if session.pendentes:
+                celulas = session.pendentes
+                session.commit()
+                print(f"   ✅ {celulas} células atualizadas na Sheet113 ({novas} URLs novas)")
             else:
                 print("   ⚠️ Nenhuma atualização necessária")
                 
         except Exception as e:
             print(f"   ❌ Erro ao atualizar Sheet113: {e}")
 
-    def atualizar_sheet113_vertical(self, dados_gsc_raw, dados_ga4_raw, mes_ano, structure=None):
+    def atualizar_sheet113_vertical(self, dados_gsc_raw, dados_ga4_raw, mes_ano, structure=None,
+                                    session: SheetSyncSession | None = None):
         """Atualiza a aba Sheet113 quando o layout é vertical (meses nas linhas).
         Permite receber uma estrutura pré-localizada para maior robustez.
+        Com `session`, usa os dados já lidos e apenas acumula as escritas (gravadas no commit
+        da sessão); sem ela, lê a aba e grava a linha imediatamente.
+        Retorna True se a linha foi gravada/agendada (ou já estava completa) e False em caso de erro.
         """
         try:
             print("📝 Atualizando Sheet113 (layout vertical)...")
-            sheet_113 = self.sheet.worksheet(ABA_DADOS_ORIGEM)
-            data = sheet_113.get_all_values()
+            sessao_propria = session is None
+            if sessao_propria:
+                session = SheetSyncSession.abrir(self.sheet, self.aba, executar=self._chamar_sheets,
+                                                 linhas_por_bloco=SHEETS_READ_CHUNK_ROWS)
+            data = session.data
 
             if not data:
                 print("   ❌ A aba Sheet113 está vazia. Adicione cabeçalhos primeiro.")
-                return
+                return False
 
             if structure is None:
                 structure = self._locate_table_structure(data)
             if structure is None:
                 print("   ❌ Não foi possível localizar cabeçalhos da tabela.")
-                return
+                return False
 
             header_row = structure['header_row']
             first_data_row = structure['first_data_row']
@@ -390,43 +1193,16 @@ class SEODataExtractor:
 
             if row_idx is None:
                 # Criar nova linha ao final
-                row_idx = len(data) + 1
                 num_cols = max(len(data[header_row]), 7)
                 nova = [''] * num_cols
                 nova[col_mes] = mes_ano
-                sheet_113.append_row(nova)
-
-            # Agregar GSC
-            total_impr = 0
-            total_clicks = 0
-            pos_weighted_sum = 0.0
-            for r in dados_gsc_raw:
-                try:
-                    impr = int(r.get('impressions', 0))
-                except Exception:
-                    impr = 0
-                try:
-                    clk = int(r.get('clicks', 0))
-                except Exception:
-                    clk = 0
-                try:
-                    pos = float(r.get('position', 0) or 0)
-                except Exception:
-                    pos = 0.0
-                total_impr += impr
-                total_clicks += clk
-                pos_weighted_sum += pos * max(impr, 0)
+                row_idx = session.adicionar_linha(nova)
 
-            ctr_total = (total_clicks / total_impr * 100) if total_impr > 0 else 0.0
-            pos_media = (pos_weighted_sum / total_impr) if total_impr > 0 else 0.0
+            # Agregar GSC (aceita lista ou gerador de linhas)
+            total_impr, total_clicks, ctr_total, pos_media = AgregadorTotaisGSC().adicionar_linhas(dados_gsc_raw).metricas()
 
             # Agregar GA4
-            total_sessoes = 0
-            for r in dados_ga4_raw:
-                try:
-                    total_sessoes += int(r.get('sessions', 0))
-                except Exception:
-                    pass
+            total_sessoes = somar_campo(dados_ga4_raw, 'sessions')
 
             # Atualiza APENAS células vazias
             updates = []
@@ -439,40 +1215,53 @@ class SEODataExtractor:
                 return (len(current_line) <= col_index_zero_based) or (current_line[col_index_zero_based].strip() == '')
 
             if col_impr is not None and cell_empty(col_impr):
-                updates.append({'range': rowcol_to_a1(row_idx, col_impr + 1), 'values': [[int(total_impr)]]})
+                updates.append((col_impr, int(total_impr)))
             if col_clicks is not None and cell_empty(col_clicks):
-                updates.append({'range': rowcol_to_a1(row_idx, col_clicks + 1), 'values': [[int(total_clicks)]]})
+                updates.append((col_clicks, int(total_clicks)))
             if col_ctr is not None and cell_empty(col_ctr):
-                updates.append({'range': rowcol_to_a1(row_idx, col_ctr + 1), 'values': [[round(ctr_total, 2)]]})
+                updates.append((col_ctr, round(ctr_total, 2)))
             if col_pos is not None and cell_empty(col_pos):
-                updates.append({'range': rowcol_to_a1(row_idx, col_pos + 1), 'values': [[round(pos_media, 2)]]})
+                updates.append((col_pos, round(pos_media, 2)))
             if col_sessions is not None and cell_empty(col_sessions):
-                updates.append({'range': rowcol_to_a1(row_idx, col_sessions + 1), 'values': [[int(total_sessoes)]]})
+                updates.append((col_sessions, int(total_sessoes)))
+
+            for col, valor in updates:
+                session.definir(row_idx, col + 1, valor)
+            if sessao_propria:
+                session.commit()
 
             if updates:
-                sheet_113.batch_update(updates, value_input_option='USER_ENTERED')
                 print(f"   ✅ Linha '{mes_ano}' atualizada na Sheet113")
             else:
                 print("   ⚠️ Nada para atualizar (layout vertical)")
+            return True
 
         except Exception as e:
             print(f"   ❌ Erro ao atualizar Sheet113 (vertical): {e}")
+            return False
+
+    def _classificar_linha(self, linha):
+        """Classifica uma linha pela coluna A: 'dominio', 'mes', 'cabecalho' ou None."""
+        val = (linha[0] or '').strip() if linha else ''
+        if not val:
+            return None
+        if _RE_DOMINIO.match(_limpar_dominio(val)):
+            return 'dominio'
+        if _RE_ROTULO_MES.match(val.lower()):
+            return 'mes'
+        if val.lower() in ('sessões', 'sessoes'):
+            return 'cabecalho'
+        return None
 
     def _find_domain_row_index(self, data):
         """Localiza a linha (0-based) onde está o domínio na coluna A (primeiras 10 linhas)."""
         max_scan = min(10, len(data))
         for i in range(max_scan):
-            try:
-                val = (data[i][0] or '').strip()
-            except Exception:
-                val = ''
-            if not val:
-                continue
-            v = val.replace('https://', '').replace('http://', '').split('/')[0].replace('www.', '')
-            if re.match(r'^[a-z0-9.-]+\.[a-z]{2,}$', v):
+            if self._classificar_linha(data[i]) == 'dominio':
                 return i
         return None
 
+    @_medir_fase('localizar_estrutura')
     def _locate_table_structure(self, data, domain_row: int | None = None):
         """Encontra cabeçalho e índices de colunas conforme layout informado:
         A1: domínio; duas linhas abaixo: cabeçalho com colunas
@@ -535,25 +1324,35 @@ class SEODataExtractor:
             'col_ctr': col_ctr,
             'col_pos': col_pos,
             'col_sessions': col_sessions,
-            'domain': (data[domain_row][0].replace('https://','').replace('http://','').split('/')[0].replace('www.','').strip()) if len(data[domain_row])>0 else None
+            'domain': _limpar_dominio(data[domain_row][0]).strip() if len(data[domain_row]) > 0 else None
         }
 
+    @_medir_fase('localizar_estruturas')
     def _locate_all_table_structures(self, data):
         """Varre a planilha para múltiplos blocos domínio+tabela, retornando uma lista de estruturas.
         Cada estrutura contém um intervalo de linhas [first_data_row, last_data_row] exclusivo por domínio.
+        Cada linha é classificada uma única vez (tempo linear); o mapa resultante fica em cache
+        enquanto a coluna A e as linhas de cabeçalho não mudarem.
         """
-        structures = []
-        i = 0
+        hash_coluna_a = hashlib.blake2b(
+            '\x1f'.join((linha[0] if linha else '') for linha in data).encode('utf-8'), digest_size=16
+        ).hexdigest()
+        cache = self._layout_cache
+        if cache is not None and cache[0] == hash_coluna_a and cache[1] == self._assinatura_cabecalhos(data, cache[2]):
+            self.metricas.contar('cache_layout_total', resultado='hit')
+            return [dict(st) for st in cache[2]]
+        self.metricas.contar('cache_layout_total', resultado='miss')
+
         n = len(data)
-        while i < n:
-            # Tenta localizar um domínio na janela a partir da linha i
-            sub = data[i:min(i+10, n)]
-            local_domain_row = self._find_domain_row_index(sub)
-            if local_domain_row is None:
-                i += 1
-                continue
+        # Próxima linha de domínio a partir de cada índice (varredura única, de trás para frente)
+        proximo_dominio = [n] * (n + 1)
+        for i in range(n - 1, -1, -1):
+            proximo_dominio[i] = i if self._classificar_linha(data[i]) == 'dominio' else proximo_dominio[i + 1]
 
-            domain_row = i + local_domain_row
+        structures = []
+        i = proximo_dominio[0]
+        while i < n:
+            domain_row = i
             header_row = domain_row + 2
             if header_row >= n:
                 break
@@ -561,32 +1360,28 @@ class SEODataExtractor:
             # Estrutura a partir deste domínio
             st = self._locate_table_structure(data, domain_row=domain_row)
             if not st:
-                i = header_row + 1
+                i = proximo_dominio[header_row + 1]
                 continue
 
-            # Determinar o fim deste bloco (até próxima linha que contenha domínio)
-            scan_start = header_row + 1
-            next_domain_global = n
-            idx = scan_start
-            while idx < n:
-                maybe_sub = data[idx:min(idx+10, n)]
-                local_next = self._find_domain_row_index(maybe_sub)
-                if local_next is not None:
-                    next_domain_global = idx + local_next
-                    break
-                idx += 1
-
+            # O bloco vai até a linha anterior ao próximo domínio
+            next_domain_global = proximo_dominio[header_row + 1]
             st['last_data_row'] = next_domain_global - 1
             structures.append(st)
             i = next_domain_global
 
-        return structures
+        self._layout_cache = (hash_coluna_a, self._assinatura_cabecalhos(data, structures), structures)
+        return [dict(st) for st in structures]
+
+    def _assinatura_cabecalhos(self, data, structures):
+        """Conteúdo das linhas de cabeçalho das estruturas (invalida o cache se mudarem)."""
+        return tuple(tuple(data[st['header_row']]) if st['header_row'] < len(data) else ()
+                     for st in structures)
 
     def _detect_domain_from_sheet113(self):
         """Tenta obter o domínio a partir da célula A1 da aba Sheet113 (texto ou link)."""
         try:
-            sheet_113 = self.sheet.worksheet(ABA_DADOS_ORIGEM)
-            val = sheet_113.acell('A1').value or ''
+            sheet_113 = self._chamar_sheets(self.sheet.worksheet, self.aba)
+            val = self._chamar_sheets(sheet_113.acell, 'A1').value or ''
             val = val.strip()
             if not val:
                 return None
@@ -596,112 +1391,674 @@ class SEODataExtractor:
             # Remover possíveis rótulos
             val = val.replace('www.', '')
             # Validar domínio simples
-            if re.match(r'^[a-z0-9.-]+\.[a-z]{2,}$', val):
+            if _RE_DOMINIO.match(val):
                 return val
             return None
         except Exception:
             return None
 
-    def preencher_meses_pendentes_vertical(self):
+    def _localizar_blocos(self):
+        """Lê só a coluna A (domínios e meses) e as linhas de cabeçalho da aba e localiza os
+        blocos. Retorna (sessão, estruturas); a sessão guarda apenas o que foi lido.
+        """
+        session = SheetSyncSession.abrir(self.sheet, self.aba, executar=self._chamar_sheets,
+                                         limite_celulas=SHEETS_MAX_BUFFERED_CELLS, leitura='coluna_a')
+        data = session.data
+        # O cabeçalho fica duas linhas abaixo de cada domínio
+        session.ler_intervalos([(i + 3, i + 3, 1, None) for i, linha in enumerate(data)
+                                if self._classificar_linha(linha) == 'dominio'])
+        return session, (self._locate_all_table_structures(data) if data else [])
+
+    def _abrir_sessao_sincronizacao(self, completos: dict | None = None):
+        """Abre a sessão da sincronização e localiza os blocos. Retorna (sessão, estruturas).
+        Com SHEETS_TARGETED_READS lê a coluna A (domínios e meses), depois as linhas de
+        cabeçalho e, numa única batch_get, só as colunas de métricas das linhas de meses já
+        iniciados, exceto os pares de `completos` ({domínio: [rótulos]} sabidamente preenchidos).
+        Sem ela, lê a aba inteira (em blocos de SHEETS_READ_CHUNK_ROWS linhas, se configurado).
+        """
+        if not SHEETS_TARGETED_READS:
+            session = SheetSyncSession.abrir(self.sheet, self.aba, executar=self._chamar_sheets,
+                                             limite_celulas=SHEETS_MAX_BUFFERED_CELLS,
+                                             linhas_por_bloco=SHEETS_READ_CHUNK_ROWS)
+            return session, (self._locate_all_table_structures(session.data) if session.data else [])
+
+        session, structures = self._localizar_blocos()
+        data = session.data
+
+        hoje = datetime.date.today().isoformat()
+        intervalos = []
+        for structure in structures:
+            colunas = [structure[c] for c in ('col_impr', 'col_clicks', 'col_ctr', 'col_pos', 'col_sessions')]
+            primeira, ultima = min(colunas) + 1, max(colunas) + 1
+            ignorar = (completos or {}).get(structure['domain'], ())
+            for i in range(structure['first_data_row'], structure['last_data_row'] + 1):
+                rotulo = data[i][0].strip().lower() if data[i] else ''
+                try:
+                    inicio, _ = _periodo_do_rotulo(rotulo)
+                except ValueError:
+                    continue
+                if inicio > hoje or rotulo in ignorar:
+                    continue
+                # Linhas consecutivas do bloco viram um único intervalo
+                if intervalos and intervalos[-1][1] == i and intervalos[-1][2:] == (primeira, ultima):
+                    intervalos[-1] = (intervalos[-1][0], i + 1, primeira, ultima)
+                else:
+                    intervalos.append((i + 1, i + 1, primeira, ultima))
+        session.ler_intervalos(intervalos)
+        print(f"📖 Leitura seletiva: {session.celulas_lidas} célula(s) "
+              f"({sum(l2 - l1 + 1 for l1, l2, _, _ in intervalos)} linha(s) de meses a verificar)")
+        return session, structures
+
+    def _meses_completos(self, data, structures, completos, por_dominio):
+        """{domínio: [rótulos]} dos meses encerrados com todas as métricas preenchidas ao fim da
+        sincronização (os de `completos`, não lidos, continuam completos).
+        """
+        hoje = datetime.date.today().isoformat()
+        resultado = {}
+        for structure in structures:
+            domain = structure['domain']
+            col_mes = structure['col_mes']
+            colunas = [structure[c] for c in ('col_impr', 'col_clicks', 'col_ctr', 'col_pos', 'col_sessions')]
+            anteriores = (completos or {}).get(domain, ())
+            falhas = por_dominio.get(domain, {}).get('failed', {})
+            meses = resultado.setdefault(domain, [])
+            for i in range(structure['first_data_row'], structure['last_data_row'] + 1):
+                linha = data[i]
+                rotulo = linha[col_mes].strip().lower() if len(linha) > col_mes else ''
+                try:
+                    _, fim = _periodo_do_rotulo(rotulo)
+                except ValueError:
+                    continue
+                if fim >= hoje or rotulo in meses:
+                    continue
+                if rotulo in anteriores or (rotulo not in falhas and
+                                            all(len(linha) > c and linha[c].strip() for c in colunas)):
+                    meses.append(rotulo)
+        return {domain: meses for domain, meses in resultado.items() if meses}
+
+    def preencher_meses_pendentes_vertical(self, max_workers: int | None = None, backfill: bool | None = None,
+                                           mes_corrente: bool | None = None, completos: dict | None = None):
         """Percorre a aba Sheet113 (layout vertical) e preenche meses pendentes.
         - Considera pendente quando pelo menos uma métrica (Impressões, Cliques, CTR, Posição, Sessões)
           está vazia na linha do mês.
         - Só processa meses cujo período já terminou (mês completamente encerrado).
         - Sempre extrai GSC e GA4 para o mês e atualiza apenas as células vazias.
+        - As extrações de cada par (domínio, mês) rodam em paralelo em até `max_workers` threads
+          (padrão: SYNC_MAX_WORKERS); a gravação na planilha continua na thread principal.
+        - Com `backfill` (padrão: SYNC_BACKFILL) o Search Console é consultado uma única vez por
+          domínio para todo o intervalo pendente, e as linhas são separadas por mês localmente.
+        - Com `mes_corrente` (padrão: MONTH_TO_DATE_ENABLED) também grava valores provisórios no
+          mês em andamento, somando só os dias novos desde a execução anterior; quando o mês
+          encerra, as células provisórias recebem os valores finais.
+        - `completos` ({domínio: [rótulos]}, da execução anterior com a planilha inalterada) lista
+          meses já preenchidos: com a leitura seletiva suas células nem são lidas. O retorno traz
+          em 'completos' os meses encerrados completos ao fim desta execução.
         """
+        workers = max_workers if max_workers is not None else SYNC_MAX_WORKERS
+        backfill = backfill if backfill is not None else SYNC_BACKFILL
+        mes_corrente = mes_corrente if mes_corrente is not None else MONTH_TO_DATE_ENABLED
+        inicio_sync = time.perf_counter()
         try:
-            sheet_113 = self.sheet.worksheet(ABA_DADOS_ORIGEM)
-            data = sheet_113.get_all_values()
+            estado_mtd = None
+            if mes_corrente:
+                estado_mtd = MonthToDateState(self.mtd_state_path)
+                # Meses com valores provisórios sempre são lidos (e revistos)
+                completos = {domain: [r for r in meses if r not in estado_mtd.meses.get(domain, {})]
+                             for domain, meses in (completos or {}).items()}
+
+            # Uma leitura da aba para toda a sincronização; as escritas são acumuladas na sessão
+            session, structures = self._abrir_sessao_sincronizacao(completos)
+            data = session.data
+            self.metricas.contar('linhas_total', len(data), fonte='planilha')
+            self.metricas.contar('planilha_celulas_lidas_total', session.celulas_lidas)
             if not data or len(data) < 2:
                 print("❌ A aba Sheet113 não possui dados/cabeçalho suficiente.")
                 return { 'processed_months': 0 }
 
-            # Encontrar múltiplos blocos (um por domínio)
-            structures = self._locate_all_table_structures(data)
+            # Múltiplos blocos (um por domínio)
             if not structures:
                 print("❌ Não foi possível identificar as colunas de métricas (Impressões, Cliques, CTR, Posição, Sessões).")
                 return { 'processed_months': 0 }
 
-            total_processados = 0
-            meses_map = {
-                'jan': 1, 'fev': 2, 'mar': 3, 'abr': 4, 'mai': 5, 'jun': 6,
-                'jul': 7, 'ago': 8, 'set': 9, 'out': 10, 'nov': 11, 'dez': 12
-            }
+            # Meses encerrados com valores provisórios: as células ainda nossas ficam vazias em
+            # memória, para que a sincronização normal grave os valores finais
+            liberados = []
+            if mes_corrente:
+                rotulo_corrente, inicio_mes, alvo = _janela_mes_corrente(MONTH_TO_DATE_LAG_DAYS)
+                liberados = self._liberar_provisorios(data, structures, estado_mtd, rotulo_corrente)
 
+            unidades = self._listar_meses_pendentes(data, structures, completos)
+            por_dominio = {}
             for structure in structures:
-                domain = structure['domain']
-                header_row = structure['header_row']
-                first_data_row = structure['first_data_row']
-                col_mes = structure['col_mes']
-                col_impr = structure['col_impr']
-                col_clicks = structure['col_clicks']
-                col_ctr = structure['col_ctr']
-                col_pos = structure['col_pos']
-                col_sessions = structure['col_sessions']
-
-                hoje = datetime.date.today()
-                processados = 0
-
-                for i in range(first_data_row, structure.get('last_data_row', len(data) - 1) + 1):
-                    linha = data[i]
-                    if len(linha) == 0:
-                        continue
-                    rotulo = linha[col_mes].strip().lower() if len(linha) > col_mes else ''
-                    if not re.match(r'^[a-z]{3}-\d{2}$', rotulo):
-                        continue
-
-                    mes_str, ano_curto = rotulo.split('-')
-                    if mes_str not in meses_map:
-                        continue
-                    ano = int('20' + ano_curto)
-                    mes_num = meses_map[mes_str]
-
-                    # Fim do mês
-                    if mes_num == 12:
-                        next_month = datetime.date(ano + 1, 1, 1)
-                    else:
-                        next_month = datetime.date(ano, mes_num + 1, 1)
-                    fim_mes = next_month - datetime.timedelta(days=1)
+                por_dominio.setdefault(structure['domain'], {'processed': [], 'failed': {}})
 
-                    # Só processa se mês já terminou
-                    if fim_mes >= hoje:
-                        continue
+            if not unidades:
+                print("\n✅ Nenhum mês pendente.")
+                if not mes_corrente:
+                    return { 'processed_months': 0, 'failed_months': 0, 'domains': por_dominio,
+                             'completos': self._meses_completos(data, structures, completos, por_dominio) }
 
-                    # Verificar se há campos vazios
-                    def vazio(idx):
-                        return (len(linha) <= idx) or (linha[idx].strip() == '')
+            # Resolver credenciais do GA4 antes de abrir as threads (o OAuth pode ser interativo)
+            self._obter_credenciais_ga4()
+
+            if backfill:
+                tarefas = list(self._agrupar_por_dominio(unidades).values())
+                extrair = self._extrair_dominio_em_lote
+            else:
+                tarefas = [[unidade] for unidade in unidades]
+                extrair = self._extrair_unidade
+            self._prebuscar_search_console(self._consultas_gsc_pendentes(tarefas, backfill))
 
-                    precisa = vazio(col_impr) or vazio(col_clicks) or vazio(col_ctr) or vazio(col_pos) or vazio(col_sessions)
-                    if not precisa:
-                        continue
+            total_processados = 0
+            total_falhas = 0
+            aguardando = []  # meses agendados na sessão e ainda não gravados
 
-                    # Extrair para este domínio
-                    inicio = datetime.date(ano, mes_num, 1)
-                    periodo_inicio = inicio.strftime('%Y-%m-%d')
-                    periodo_fim = fim_mes.strftime('%Y-%m-%d')
-                    print(f"\n🚀 Processando {rotulo} ({periodo_inicio} a {periodo_fim}) para {domain}...")
+            def gravar_sessao():
+                nonlocal total_processados, total_falhas
+                try:
+                    session.commit()
+                    gravado = True
+                except Exception as e:
+                    gravado = False
+                    print(f"   ❌ Erro ao gravar na planilha: {e}")
+                    for unidade in aguardando:
+                        relatorio = por_dominio[unidade['domain']]
+                        relatorio['processed'].remove(unidade['rotulo'])
+                        relatorio['failed'][unidade['rotulo']] = f"falha ao gravar na planilha: {e}"
+                    total_processados -= len(aguardando)
+                    total_falhas += len(aguardando)
+                aguardando.clear()
+                return gravado
 
-                    # Resolver GA4 property por domínio (se configurado)
-                    ga4_property_override = None
-                    cfg = DOMAIN_CONFIGS.get(domain)
-                    if cfg and cfg.get('ga4_property_id'):
-                        ga4_property_override = cfg['ga4_property_id']
+            for tarefa, resultados, erro in self._executar_unidades(tarefas, workers, extrair):
+                if erro is not None:
+                    resultados = [(unidade, None, None) for unidade in tarefa]
+                for unidade, dados_gsc, dados_ga4 in resultados:
+                    relatorio = por_dominio[unidade['domain']]
+                    rotulo = unidade['rotulo']
+                    if erro is None:
+                        # Atualiza só a linha do mês (com estrutura previamente localizada)
+                        if self.atualizar_sheet113_vertical(dados_gsc, dados_ga4, rotulo, unidade['structure'],
+                                                            session=session):
+                            relatorio['processed'].append(rotulo)
+                            total_processados += 1
+                            aguardando.append(unidade)
+                            if session.cheia:
+                                gravar_sessao()
+                            continue
+                        falha = "falha ao gravar na planilha"
+                    else:
+                        falha = str(erro)
+                    relatorio['failed'][rotulo] = falha
+                    total_falhas += 1
+                    print(f"   ❌ {unidade['domain']} {rotulo}: {falha}")
 
-                    dados_gsc = self.extrair_dados_search_console(periodo_inicio, periodo_fim, domain_override=domain)
-                    dados_ga4 = self.extrair_dados_ga4(periodo_inicio, periodo_fim, property_id=ga4_property_override)
+            relatorio_mtd = None
+            if mes_corrente:
+                relatorio_mtd = self._atualizar_mes_corrente(session, structures, estado_mtd, rotulo_corrente,
+                                                             inicio_mes, alvo, workers)
 
-                    # Atualiza só a linha do mês (com estrutura previamente localizada)
-                    self.atualizar_sheet113_vertical(dados_gsc, dados_ga4, rotulo, structure)
-                    processados += 1
+            # Todas as escritas da sincronização numa única chamada
+            gravado = gravar_sessao()
 
-                total_processados += processados
+            # O estado do mês corrente só é salvo se as células provisórias chegaram à planilha
+            if mes_corrente and gravado:
+                for domain, rotulo in liberados:
+                    if rotulo not in por_dominio.get(domain, {}).get('failed', {}):
+                        estado_mtd.remover(domain, rotulo)
+                if not relatorio_mtd['falhas']:
+                    estado_mtd.alvo = alvo
+                estado_mtd.salvar()
 
             print(f"\n✅ Meses processados: {total_processados}")
-            return { 'processed_months': total_processados }
+            if total_falhas:
+                print(f"⚠️  Meses com falha: {total_falhas}")
+            self.metricas.contar('meses_total', total_processados, resultado='ok')
+            self.metricas.contar('meses_total', total_falhas, resultado='falha')
+            resultado = { 'processed_months': total_processados, 'failed_months': total_falhas, 'domains': por_dominio,
+                          'completos': self._meses_completos(data, structures, completos, por_dominio) }
+            if relatorio_mtd is not None:
+                if not gravado:
+                    relatorio_mtd['celulas'] = 0
+                resultado['month_to_date'] = relatorio_mtd
+            return resultado
 
         except Exception as e:
             print(f"❌ Erro ao preencher meses pendentes: {e}")
-            return { 'processed_months': 0 }
+            return { 'processed_months': 0, 'error': str(e) }
+        finally:
+            self._respostas_gsc.clear()  # respostas em lote não consumidas (ex: extração com falha)
+            self._exportar_metricas(time.perf_counter() - inicio_sync)
+
+    def motivo_sincronizacao(self, estado: SyncState, forcar: bool = False, mes_corrente: bool | None = None):
+        """Decide se uma execução agendada tem trabalho, lendo só a revisão da planilha.
+        Retorna (motivo ou None, revisão, último mês encerrado).
+        """
+        hoje = datetime.date.today()
+        anterior = hoje.replace(day=1) - datetime.timedelta(days=1)
+        ultimo_mes_fechado = _rotulo_mes(anterior.year, anterior.month)
+
+        revisao = self._chamar_sheets(self.sheet.get_lastUpdateTime)
+        motivo = "execução forçada" if forcar else estado.motivo_para_sincronizar(revisao, ultimo_mes_fechado)
+        if motivo is None and (mes_corrente if mes_corrente is not None else MONTH_TO_DATE_ENABLED):
+            # Planilha sem alterações, mas pode haver dias novos a somar no mês corrente
+            motivo = MonthToDateState(self.mtd_state_path).motivo_para_sincronizar(
+                *_janela_mes_corrente(MONTH_TO_DATE_LAG_DAYS))
+        return motivo, revisao, ultimo_mes_fechado
+
+    def sincronizar_incremental(self, estado: SyncState, forcar: bool = False, **kwargs):
+        """Sincronização para execuções agendadas: antes de qualquer leitura da aba ou consulta
+        às APIs de dados, compara a revisão da planilha e o último mês encerrado com o `estado`.
+        Sem mudanças, retorna sem trabalho ('skipped': True). Caso contrário, executa
+        `preencher_meses_pendentes_vertical(**kwargs)` e atualiza o estado.
+        """
+        motivo, revisao, ultimo_mes_fechado = self.motivo_sincronizacao(estado, forcar, kwargs.get('mes_corrente'))
+        if motivo is None:
+            print(f"✅ Nada a fazer: planilha sem alterações desde {revisao} e nenhum mês novo encerrado.")
+            self._exportar_metricas()
+            return { 'processed_months': 0, 'failed_months': 0, 'skipped': True }
+
+        print(f"🔄 Sincronizando ({motivo})...")
+        # Planilha inalterada desde a última execução: os meses que já estavam completos não são relidos
+        completos = estado.completos if not forcar and revisao == estado.revisao else None
+        resultado = self.preencher_meses_pendentes_vertical(completos=completos, **kwargs)
+        if 'error' in resultado:
+            return resultado
+
+        for domain, rel in (resultado.get('domains') or {}).items():
+            for rotulo in rel['processed']:
+                if estado.concluido(domain, rotulo):
+                    print(f"   🔁 {domain} {rotulo}: preenchido novamente (células apagadas na planilha)")
+
+        estado.registrar_resultado(resultado)
+        estado.ultimo_mes_fechado = ultimo_mes_fechado
+        # A revisão é lida depois das nossas escritas, para que elas não disparem a próxima execução
+        escreveu = resultado.get('processed_months') or (resultado.get('month_to_date') or {}).get('celulas')
+        estado.revisao = self._chamar_sheets(self.sheet.get_lastUpdateTime) if escreveu else revisao
+        estado.salvar()
+        resultado['skipped'] = False
+        return resultado
+
+    def _listar_meses_pendentes(self, data, structures, completos: dict | None = None):
+        """Lista as unidades de trabalho (domínio, mês) com células vazias em meses já encerrados,
+        exceto os meses de `completos` ({domínio: [rótulos]} sabidamente preenchidos).
+        """
+        unidades = []
+        hoje = datetime.date.today()
+
+        for structure in structures:
+            domain = structure['domain']
+            col_mes = structure['col_mes']
+            metric_cols = [structure['col_impr'], structure['col_clicks'], structure['col_ctr'],
+                           structure['col_pos'], structure['col_sessions']]
+
+            ga4_property_override = self._propriedade_ga4(domain)
+            ignorar = (completos or {}).get(domain, ())
+
+            for i in range(structure['first_data_row'], structure.get('last_data_row', len(data) - 1) + 1):
+                linha = data[i]
+                if len(linha) == 0:
+                    continue
+                rotulo = linha[col_mes].strip().lower() if len(linha) > col_mes else ''
+                if not _RE_ROTULO_MES.match(rotulo) or rotulo in ignorar:
+                    continue
+
+                mes_str, ano_curto = rotulo.split('-')
+                if mes_str not in MESES_MAP:
+                    continue
+                ano = int('20' + ano_curto)
+                mes_num = MESES_MAP[mes_str]
+
+                # Fim do mês
+                if mes_num == 12:
+                    next_month = datetime.date(ano + 1, 1, 1)
+                else:
+                    next_month = datetime.date(ano, mes_num + 1, 1)
+                fim_mes = next_month - datetime.timedelta(days=1)
+
+                # Só processa se mês já terminou
+                if fim_mes >= hoje:
+                    continue
+
+                # Verificar se há campos vazios
+                if not any((len(linha) <= idx) or (linha[idx].strip() == '') for idx in metric_cols):
+                    continue
+
+                unidades.append({
+                    'structure': structure,
+                    'domain': domain,
+                    'rotulo': rotulo,
+                    'inicio': datetime.date(ano, mes_num, 1).strftime('%Y-%m-%d'),
+                    'fim': fim_mes.strftime('%Y-%m-%d'),
+                    'ga4_property': ga4_property_override,
+                })
+        return unidades
+
+    def _propriedade_ga4(self, domain):
+        """GA4 property configurada para o domínio em DOMAIN_CONFIGS (None = GA4_PROPERTY_ID)."""
+        cfg = DOMAIN_CONFIGS.get(domain)
+        if cfg and cfg.get('ga4_property_id'):
+            return cfg['ga4_property_id']
+        return None
+
+    def _linha_do_mes(self, data, structure, rotulo):
+        """Índice (0-based) da linha do mês `rotulo` no bloco do domínio, ou None."""
+        col_mes = structure['col_mes']
+        for i in range(structure['first_data_row'], structure.get('last_data_row', len(data) - 1) + 1):
+            linha = data[i]
+            if len(linha) > col_mes and linha[col_mes].strip().lower() == rotulo:
+                return i
+        return None
+
+    def _liberar_provisorios(self, data, structures, estado: MonthToDateState, rotulo_corrente):
+        """Esvazia (só em memória) as células com valores provisórios de meses já encerrados, para
+        que a sincronização normal as trate como pendentes. Células editadas por alguém depois
+        da nossa gravação são preservadas. Retorna os pares (domínio, rótulo) liberados.
+        """
+        blocos = {}
+        for structure in structures:
+            blocos.setdefault(structure['domain'], structure)
+        liberados = []
+        for domain, rotulo in estado.meses_encerrados(rotulo_corrente):
+            structure = blocos.get(domain)
+            row = self._linha_do_mes(data, structure, rotulo) if structure else None
+            if row is not None:
+                linha = data[row]
+                for coluna in estado.celulas(domain, rotulo):
+                    if coluna < len(linha) and estado.provisorio(domain, rotulo, coluna, linha[coluna]):
+                        linha[coluna] = ''
+            liberados.append((domain, rotulo))
+        if liberados:
+            print(f"🗓️  {len(liberados)} mês(es) encerrado(s) com valores provisórios: gravando os valores finais")
+        return liberados
+
+    def _periodos_mes_corrente(self, data, structures, estado: MonthToDateState, rotulo, inicio_mes, alvo):
+        """Linhas do mês corrente por domínio e os dias ainda não somados de cada fonte.
+        Retorna ({domínio: (estrutura, linha)}, [tarefas {'domain', 'ga4_property', 'periodos'}]).
+        """
+        linhas = {}
+        tarefas = []
+        for structure in structures:
+            domain = structure['domain']
+            if domain in linhas:
+                continue
+            row = self._linha_do_mes(data, structure, rotulo)
+            if row is None:
+                continue
+            linhas[domain] = (structure, row)
+            periodos = {}
+            for fonte in ('gsc', 'ga4'):
+                inicio = estado.proximo_dia(domain, rotulo, fonte, inicio_mes)
+                if inicio <= alvo:
+                    periodos[fonte] = (inicio, alvo)
+            if periodos:
+                tarefas.append({'domain': domain, 'ga4_property': self._propriedade_ga4(domain), 'periodos': periodos})
+        return linhas, tarefas
+
+    def _extrair_mes_corrente(self, tarefa):
+        """Extrai só os dias novos do mês corrente de um domínio, fonte a fonte (a falha de uma
+        fonte não descarta a outra). Retorna {fonte: AgregadorTotaisGSC | sessões | exceção}.
+        """
+        domain = tarefa['domain']
+        resultado = {}
+        for fonte, (inicio, fim) in tarefa['periodos'].items():
+            print(f"\n🗓️  Mês corrente de {domain}: {fonte.upper()} de {inicio} a {fim}...")
+            try:
+                if fonte == 'gsc':
+                    linhas = self.iterar_linhas_search_console(inicio, fim, domain_override=domain, dimensions=['date'])
+                    resultado[fonte] = AgregadorTotaisGSC().adicionar_linhas(linhas)
+                else:
+                    dados = self.extrair_ga4_por_dia(inicio, fim, property_id=tarefa['ga4_property'],
+                                                     raise_errors=True, dominio=domain)
+                    resultado[fonte] = somar_campo(dados, 'sessions')
+            except Exception as e:
+                resultado[fonte] = e
+        return resultado
+
+    @_medir_fase('mes_corrente')
+    def _atualizar_mes_corrente(self, session: SheetSyncSession, structures, estado: MonthToDateState,
+                                rotulo, inicio_mes, alvo, workers):
+        """Soma os dias novos aos totais do mês corrente e agenda na sessão os valores provisórios:
+        só em células vazias ou que ainda têm o valor que gravamos antes.
+        Retorna {'rotulo', 'ate', 'dominios': {domínio: {'celulas', 'falhas'}}, 'celulas', 'falhas'}.
+        """
+        relatorio = {'rotulo': rotulo, 'ate': alvo, 'dominios': {}, 'celulas': 0, 'falhas': 0}
+        if alvo < inicio_mes:
+            print(f"\n🗓️  Mês corrente ({rotulo}): ainda sem dias com dados estáveis")
+            return relatorio
+
+        data = session.data
+        linhas, tarefas = self._periodos_mes_corrente(data, structures, estado, rotulo, inicio_mes, alvo)
+        for domain in linhas:
+            relatorio['dominios'][domain] = {'celulas': 0, 'falhas': {}}
+        self._prebuscar_search_console([(tarefa['domain'], *tarefa['periodos']['gsc'], ['date'])
+                                        for tarefa in tarefas if 'gsc' in tarefa['periodos']])
+
+        for tarefa, resultado, erro in self._executar_unidades(tarefas, workers, self._extrair_mes_corrente):
+            domain = tarefa['domain']
+            if erro is not None:
+                resultado = dict.fromkeys(tarefa['periodos'], erro)
+            for fonte, valor in resultado.items():
+                fim = tarefa['periodos'][fonte][1]
+                if isinstance(valor, Exception):
+                    relatorio['dominios'][domain]['falhas'][fonte] = str(valor)
+                    relatorio['falhas'] += 1
+                    print(f"   ❌ {domain} {rotulo} ({fonte.upper()}): {valor}")
+                elif fonte == 'gsc':
+                    estado.acumular(domain, rotulo, 'gsc', fim, impressions=valor.impressions, clicks=valor.clicks,
+                                    pos_ponderada=valor.pos_ponderada)
+                else:
+                    estado.acumular(domain, rotulo, 'ga4', fim, sessions=valor)
+
+        for domain, (structure, row) in linhas.items():
+            totais = estado.totais(domain, rotulo)
+            valores = {}
+            if totais['gsc'] is not None:
+                impressions, clicks, ctr, posicao = totais['gsc']
+                valores.update({structure['col_impr']: impressions, structure['col_clicks']: clicks,
+                                structure['col_ctr']: round(ctr, 2), structure['col_pos']: round(posicao, 2)})
+            if totais['ga4'] is not None:
+                valores[structure['col_sessions']] = totais['ga4']
+
+            linha = data[row]
+            gravar = {}
+            for coluna, valor in valores.items():
+                if coluna is None:
+                    continue
+                atual = linha[coluna].strip() if len(linha) > coluna else ''
+                if atual and (not estado.provisorio(domain, rotulo, coluna, atual) or mesmo_valor(atual, valor)):
+                    continue  # valor manual (preservado) ou provisório sem mudança
+                gravar[coluna] = valor
+            for coluna, valor in gravar.items():
+                session.definir(row + 1, coluna + 1, valor)
+            estado.registrar_celulas(domain, rotulo, gravar)
+            relatorio['dominios'][domain]['celulas'] = len(gravar)
+            relatorio['celulas'] += len(gravar)
+
+        print(f"\n🗓️  Mês corrente ({rotulo}, dados até {alvo}): {relatorio['celulas']} célula(s) provisória(s) "
+              f"em {len(linhas)} domínio(s)")
+        return relatorio
+
+    def planejar_sincronizacao(self, backfill: bool | None = None, mes_corrente: bool | None = None):
+        """Plano da sincronização sem consultar o GSC/GA4 nem gravar na planilha (--dry-run):
+        lê a aba como a sincronização, lista os meses pendentes por domínio e estima as consultas às APIs
+        descontando os meses já presentes no cache local. Com `mes_corrente`, inclui os dias
+        novos a somar no mês em andamento ('month_to_date': {domínio: {fonte: (início, fim)}}).
+        Retorna {'domains': {domínio: [rótulos]}, 'units', 'gsc_calls', 'ga4_calls'}.
+        """
+        backfill = backfill if backfill is not None else SYNC_BACKFILL
+        mes_corrente = mes_corrente if mes_corrente is not None else MONTH_TO_DATE_ENABLED
+        session, structures = self._abrir_sessao_sincronizacao()
+        data = session.data
+        estado_mtd = None
+        if mes_corrente:
+            estado_mtd = MonthToDateState(self.mtd_state_path)
+            rotulo_corrente, inicio_mes, alvo = _janela_mes_corrente(MONTH_TO_DATE_LAG_DAYS)
+            self._liberar_provisorios(data, structures, estado_mtd, rotulo_corrente)
+        unidades = self._listar_meses_pendentes(data, structures)
+
+        def em_cache(fonte, alvo, dimensoes, grupo):
+            if self.cache is None:
+                return 0
+            return len(self.cache.obter_varios(fonte, alvo, dimensoes, [(u['inicio'], u['fim']) for u in grupo]))
+
+        gsc_calls = ga4_calls = 0
+        for domain, grupo in self._agrupar_por_dominio(unidades).items():
+            property_id = grupo[0]['ga4_property'] or GA4_PROPERTY_ID
+            if backfill:
+                # Uma consulta por API e domínio, se algum mês não estiver no cache
+                gsc_calls += em_cache('gsc', domain, ['date'], grupo) < len(grupo)
+                ga4_calls += em_cache('ga4', property_id, ['yearMonth'], grupo) < len(grupo)
+            else:
+                gsc_calls += len(grupo) - em_cache('gsc', domain, [], grupo)
+                ga4_calls += len(grupo) - em_cache('ga4', property_id, ['pagePath'], grupo)
+
+        dominios = {}
+        for unidade in unidades:
+            dominios.setdefault(unidade['domain'], []).append(unidade['rotulo'])
+        plano = {'domains': dominios, 'units': len(unidades), 'gsc_calls': gsc_calls, 'ga4_calls': ga4_calls}
+        if mes_corrente:
+            _, tarefas = (self._periodos_mes_corrente(data, structures, estado_mtd, rotulo_corrente, inicio_mes, alvo)
+                          if alvo >= inicio_mes else ({}, []))
+            plano['month_to_date'] = {tarefa['domain']: tarefa['periodos'] for tarefa in tarefas}
+            for tarefa in tarefas:
+                plano['gsc_calls'] += 'gsc' in tarefa['periodos']
+                plano['ga4_calls'] += 'ga4' in tarefa['periodos']
+        return plano
+
+    @_medir_fase('ranking')
+    def gerar_ranking(self, meses: list | None = None, n: int | None = None, max_workers: int | None = None):
+        """Top-N consultas e páginas de cada domínio da aba, por cliques e por impressões, nos
+        meses de `meses` (rótulos como 'mar-25'; padrão: o último mês encerrado). Os pares
+        (domínio, mês) são extraídos em paralelo em até `max_workers` threads e a aba
+        ABA_RANKING é regravada numa única escrita (ver _gravar_ranking).
+        Retorna {'pares', 'linhas', 'failed': {'domínio mês': erro}}.
+        """
+        workers = max_workers if max_workers is not None else SYNC_MAX_WORKERS
+        n = n if n is not None else RANKING_TOP_N
+        if not meses:
+            anterior = datetime.date.today().replace(day=1) - datetime.timedelta(days=1)
+            meses = [_rotulo_mes(anterior.year, anterior.month)]
+        try:
+            periodos = {rotulo.strip().lower(): _periodo_do_rotulo(rotulo) for rotulo in meses}
+            _, structures = self._localizar_blocos()
+            dominios = list(dict.fromkeys(structure['domain'] for structure in structures))
+            if not dominios:
+                print("❌ Nenhum domínio encontrado na aba.")
+                return { 'pares': 0, 'linhas': 0, 'failed': {} }
+
+            print(f"🏆 Ranking top {n} de {len(dominios)} domínio(s) em {len(periodos)} mês(es)...")
+            tarefas = [(domain, rotulo) for domain in dominios for rotulo in periodos]
+
+            def extrair(tarefa):
+                domain, rotulo = tarefa
+                return self.extrair_ranking_search_console(*periodos[rotulo], domain_override=domain, n=n)
+
+            linhas = []
+            gerados = set()
+            falhas = {}
+            for (domain, rotulo), rankings, erro in self._executar_unidades(tarefas, workers, extrair):
+                if erro is not None:
+                    print(f"   ❌ {domain} {rotulo}: {erro}")
+                    falhas[f"{domain} {rotulo}"] = str(erro)
+                    continue
+                gerados.add((domain, rotulo))
+                linhas.extend(_linhas_ranking(domain, rotulo, rankings))
+                print(f"   ✅ {domain} {rotulo}: {rankings['consulta'].linhas} consultas e "
+                      f"{rankings['página'].linhas} páginas lidas")
+
+            if gerados:
+                self._gravar_ranking(linhas, gerados)
+                print(f"✅ {len(linhas)} linha(s) de ranking gravadas na aba {ABA_RANKING}")
+            return { 'pares': len(gerados), 'linhas': len(linhas), 'failed': falhas }
+
+        except Exception as e:
+            print(f"❌ Erro ao gerar o ranking: {e}")
+            return { 'pares': 0, 'linhas': 0, 'failed': {}, 'error': str(e) }
+
+    def _gravar_ranking(self, novas, gerados):
+        """Regrava a aba ABA_RANKING (criada se não existir) numa única chamada: as linhas dos
+        pares (domínio, mês) em `gerados` são substituídas, as dos demais são mantidas, e tudo é
+        ordenado por domínio, mês (mais recente primeiro), tipo, critério e posição. Só as células
+        que mudaram são enviadas, em modo RAW (consultas como '=...' ou '+...' não viram fórmulas).
+        """
+        from gspread.exceptions import WorksheetNotFound
+        try:
+            session = SheetSyncSession.abrir(self.sheet, ABA_RANKING, executar=self._chamar_sheets,
+                                             value_input_option='RAW')
+        except WorksheetNotFound:
+            worksheet = self._chamar_sheets(self.sheet.add_worksheet, title=ABA_RANKING, rows=len(novas) + 1,
+                                            cols=len(CABECALHO_RANKING))
+            session = SheetSyncSession(self.sheet, worksheet, executar=self._chamar_sheets, value_input_option='RAW')
+
+        antigas = [_linha_ranking_tipada(linha) for linha in session.data[1:]
+                   if any(linha) and (linha[0], linha[1] if len(linha) > 1 else '') not in gerados]
+        grade = [CABECALHO_RANKING] + sorted(antigas + novas, key=_ordem_ranking)
+        largura = len(CABECALHO_RANKING)
+        for i in range(max(len(grade), len(session.data))):
+            nova = grade[i] if i < len(grade) else []
+            atual = session.data[i] if i < len(session.data) else []
+            for j in range(largura):
+                valor = nova[j] if j < len(nova) else ''
+                if not mesmo_valor(atual[j] if j < len(atual) else '', valor):
+                    session.definir(i + 1, j + 1, valor)
+        session.commit()
+
+    def _agrupar_por_dominio(self, unidades):
+        """Agrupa as unidades pendentes por domínio, preservando a ordem da planilha."""
+        grupos = {}
+        for unidade in unidades:
+            grupos.setdefault(unidade['domain'], []).append(unidade)
+        return grupos
+
+    def _extrair_unidade(self, tarefa):
+        """Extrai GSC e GA4 de um par (domínio, mês). Propaga erros para que o mês seja marcado como falha.
+        Retorna [(unidade, dados_gsc, dados_ga4)].
+        """
+        unidade = tarefa[0]
+        print(f"\n🚀 Processando {unidade['rotulo']} ({unidade['inicio']} a {unidade['fim']}) para {unidade['domain']}...")
+        dados_gsc = self.extrair_totais_search_console(unidade['inicio'], unidade['fim'],
+                                                       domain_override=unidade['domain'], raise_errors=True)
+        dados_ga4 = self.extrair_dados_ga4(unidade['inicio'], unidade['fim'], property_id=unidade['ga4_property'],
+                                           raise_errors=True, dominio=unidade['domain'])
+        return [(unidade, dados_gsc, dados_ga4)]
+
+    def _extrair_dominio_em_lote(self, tarefa):
+        """Extrai todos os meses pendentes de um domínio com uma consulta por API: o Search Console
+        com a dimensão 'date' e o GA4 com 'yearMonth', separados por mês localmente.
+        Retorna [(unidade, dados_gsc, dados_ga4)].
+        """
+        domain = tarefa[0]['domain']
+        inicio = min(unidade['inicio'] for unidade in tarefa)
+        fim = max(unidade['fim'] for unidade in tarefa)
+        print(f"\n🚀 Processando {len(tarefa)} mês(es) de {domain} ({inicio} a {fim})...")
+
+        gsc_por_mes = self.extrair_search_console_por_mes(inicio, fim, domain_override=domain, raise_errors=True)
+        ga4_por_mes = self.extrair_ga4_por_mes(inicio, fim, property_id=tarefa[0]['ga4_property'], raise_errors=True,
+                                               dominio=domain)
+        return [(unidade, gsc_por_mes.get(unidade['rotulo'], []), ga4_por_mes.get(unidade['rotulo'], []))
+                for unidade in tarefa]
+
+    def _executar_unidades(self, tarefas, workers, extrair):
+        """Executa `extrair` para cada tarefa, gerando (tarefa, resultado, erro) conforme concluem.
+        Com workers > 1 usa um pool de threads limitado (as chamadas são de I/O).
+        """
+        if workers <= 1 or len(tarefas) <= 1:
+            for tarefa in tarefas:
+                try:
+                    yield tarefa, extrair(tarefa), None
+                except Exception as e:
+                    yield tarefa, None, e
+            return
+
+        with ThreadPoolExecutor(max_workers=min(workers, len(tarefas))) as pool:
+            futuros = {pool.submit(extrair, tarefa): tarefa for tarefa in tarefas}
+            for futuro in as_completed(futuros):
+                tarefa = futuros[futuro]
+                try:
+                    yield tarefa, futuro.result(), None
+                except Exception as e:
+                    yield tarefa, None, e
     
     def executar_extracao_completa(self, mes_ano='mar-25'):
         """Executa extração completa de dados"""
@@ -725,18 +2082,36 @@ class SEODataExtractor:
         
         print(f"📅 Período: {start_date} a {end_date}")
         
-        # Extrair dados
-        dados_gsc = self.extrair_dados_search_console(start_date, end_date)
+        # Extrair e processar o Search Console em streaming (blocos de páginas de resultado),
+        # agregando por URL; os totais do mês saem da soma dos agregados por URL
+        print(f"📊 Extraindo dados do Search Console ({start_date} a {end_date})...")
+        linhas_gsc = 0
+
+        def paginas_gsc():
+            nonlocal linhas_gsc
+            for pagina in self.iterar_paginas_search_console(start_date, end_date):
+                linhas_gsc += len(pagina)
+                yield from pagina
+
+        paginas = AgregadoPaginas(self.normalize_url)
+        try:
+            self.processar_dados_search_console(paginas_gsc(), mes_ano, paginas=paginas)
+            print(f"   ✅ {linhas_gsc} registros processados do Search Console")
+        except Exception as e:
+            print(f"   ❌ Erro ao extrair dados do Search Console: {e}")
+            paginas = AgregadoPaginas(self.normalize_url)
+
         dados_ga4 = self.extrair_dados_ga4(start_date, end_date)
-        
-        # Processar dados
-        dados_gsc_processados = self.processar_dados_search_console(dados_gsc, mes_ano)
-        dados_ga4_processados = self.processar_dados_ga4(dados_ga4)
+        self.processar_dados_ga4(dados_ga4, paginas=paginas)
+
+        # Linha única com os totais, no formato de linha do GSC, para o layout vertical
+        totais_gsc, _ = paginas.totais()
+        dados_gsc = [totais_gsc]
         
         # Atualizar planilha conforme layout detectado
         try:
-            sheet_113 = self.sheet.worksheet(ABA_DADOS_ORIGEM)
-            dados_existentes = sheet_113.get_all_values()
+            sheet_113 = self._chamar_sheets(self.sheet.worksheet, self.aba)
+            dados_existentes = self._chamar_sheets(sheet_113.get_all_values)
             vertical = False
             if dados_existentes and len(dados_existentes) >= 2:
                 header_lower = [h.strip().lower() for h in dados_existentes[0]]
@@ -745,17 +2120,17 @@ class SEODataExtractor:
             if vertical:
                 self.atualizar_sheet113_vertical(dados_gsc, dados_ga4, mes_ano)
             else:
-                self.atualizar_sheet113(dados_gsc_processados, dados_ga4_processados, mes_ano)
+                self.atualizar_sheet113(paginas, mes_ano)
         except Exception:
             # Se detecção falhar, usar o método antigo
-            self.atualizar_sheet113(dados_gsc_processados, dados_ga4_processados, mes_ano)
+            self.atualizar_sheet113(paginas, mes_ano)
         
         print("🎉 Extração completa finalizada!")
         
         return {
-            'gsc_records': len(dados_gsc),
+            'gsc_records': linhas_gsc,
             'ga4_records': len(dados_ga4),
-            'processed_urls': len(set(dados_gsc_processados.keys()) | set(dados_ga4_processados.keys()))
+            'processed_urls': len(paginas)
         }
 
 def main():
@@ -785,14 +2160,12 @@ def main():
                 print(f"\n🔄 Processando {mes}...")
                 resultado = extractor.executar_extracao_completa(mes)
                 print(f"   📊 {resultado['processed_urls']} URLs processadas")
-                time.sleep(2)  # Pausa entre requisições
                 
         elif opcao == '3':
             print("\n🧪 Testando conexões...")
-            # Teste básico
-            dados_teste_gsc = extractor.extrair_dados_search_console('2025-03-01', '2025-03-07')
-            dados_teste_ga4 = extractor.extrair_dados_ga4('2025-03-01', '2025-03-07')
-            print(f"   ✅ Teste concluído: {len(dados_teste_gsc)} registros GSC, {len(dados_teste_ga4)} registros GA4")
+            # Teste básico: uma consulta de uma linha por API
+            teste = extractor.testar_conexoes('2025-03-01', '2025-03-07')
+            print(f"   ✅ Teste concluído: {teste['gsc']} registros GSC, {teste['ga4']} registros GA4")
         
         else:
             print("❌ Opção inválida!")
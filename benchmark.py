@@ -0,0 +1,564 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark offline do SEODataExtractor, sem credenciais nem acesso às APIs Google.
+
+Substitui a planilha (gspread), o Search Console (searchanalytics().query / sites().list) e o
+GA4 (BetaAnalyticsDataClient.run_report e os tipos da requisição) por simulações em memória,
+com latência, volume de linhas e taxa de erro configuráveis, e mede cada cenário sobre
+planilhas sintéticas:
+
+- locators:    _locate_all_table_structures (varredura completa e com o mapa em cache)
+- sync:        preencher_meses_pendentes_vertical (todos os blocos domínio × meses)
+- horizontal:  processar_dados_* + atualizar_sheet113 (layout uma linha por URL)
+
+Para cada cenário são reportados o tempo total, as chamadas por API/método e o pico de
+memória (tracemalloc, medido numa segunda execução para não distorcer o tempo).
+Uma sincronização que falha por outro motivo que não os erros injetados interrompe o
+benchmark (os tempos mediriam só o caminho de erro).
+
+Exemplo:
+    python benchmark.py --dominios 500 --meses 60 --latencia-ms 20 --taxa-erro 0.01
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+from collections import Counter
+
+import api_extractor
+from api_extractor import SEODataExtractor, _rotulo_mes
+from metrics import Metricas
+from request_scheduler import RequestScheduler
+
+CABECALHO_VERTICAL = ['Sessões', 'Impressões', 'Cliques', 'CTR', 'Posição', 'Sessões', 'FTD']
+
+
+def a1_to_rowcol(a1):
+    """'AB12' -> (12, 28), sem depender do gspread."""
+    letras = a1.rstrip('0123456789')
+    coluna = 0
+    for letra in letras.upper():
+        coluna = coluna * 26 + ord(letra) - ord('A') + 1
+    return int(a1[len(letras):]), coluna
+
+
+class ErroHttpSimulado(Exception):
+    """Erro transitório no formato do googleapiclient (status em `resp.status`)."""
+
+    def __init__(self, status=503):
+        super().__init__(f"HTTP {status} (simulado)")
+        self.resp = types.SimpleNamespace(status=status)
+
+
+class Simulador:
+    """Latência, injeção de erros e contagem de chamadas compartilhadas pelas APIs simuladas."""
+
+    def __init__(self, latencias=None, taxas_erro=None, semente=42):
+        self.latencias = latencias or {}
+        self.taxas_erro = taxas_erro or {}
+        self.chamadas = Counter()
+        self.erros = Counter()
+        self._rng = random.Random(semente)
+        self._lock = threading.Lock()
+
+    def chamada(self, api, metodo):
+        with self._lock:
+            self.chamadas[f"{api}.{metodo}"] += 1
+            falhar = self._rng.random() < self.taxas_erro.get(api, 0)
+            if falhar:
+                self.erros[api] += 1
+        latencia = self.latencias.get(api, 0)
+        if latencia:
+            time.sleep(latencia)
+        if falhar:
+            raise ErroHttpSimulado(self._rng.choice((429, 503)))
+
+
+# ---------------------------------------------------------------------------
+# Google Sheets (gspread)
+# ---------------------------------------------------------------------------
+
+class WorksheetSimulada:
+    def __init__(self, simulador, titulo, dados):
+        self.simulador = simulador
+        self.title = titulo
+        self.dados = dados
+        self.row_count = max(1000, len(dados))
+        self.celulas_lidas = 0
+
+    def _ler(self, linha1, linha2, coluna1=1, coluna2=None):
+        """Valores de um intervalo 1-based como a API devolve: sem linhas e colunas vazias no fim."""
+        valores = []
+        for linha in self.dados[linha1 - 1:linha2]:
+            trecho = list(linha[coluna1 - 1:coluna2])
+            while trecho and trecho[-1] == '':
+                trecho.pop()
+            valores.append(trecho)
+        while valores and not valores[-1]:
+            valores.pop()
+        self.celulas_lidas += sum(len(linha) for linha in valores)
+        return valores
+
+    def get_all_values(self):
+        self.simulador.chamada('sheets', 'get_all_values')
+        self.celulas_lidas += sum(len(linha) for linha in self.dados)
+        return [list(linha) for linha in self.dados]
+
+    def get_values(self, faixa):
+        self.simulador.chamada('sheets', 'get_values')
+        linha1, linha2 = (int(x) for x in faixa.split(':'))
+        return self._ler(linha1, linha2)
+
+    def col_values(self, coluna):
+        self.simulador.chamada('sheets', 'col_values')
+        return [linha[0] if linha else '' for linha in self._ler(1, len(self.dados), coluna, coluna)]
+
+    def batch_get(self, faixas):
+        self.simulador.chamada('sheets', 'batch_get')
+        blocos = []
+        for faixa in faixas:
+            inicio, fim = faixa.split(':')
+            if inicio.isdigit():
+                blocos.append(self._ler(int(inicio), int(fim)))
+            else:
+                (linha1, coluna1), (linha2, coluna2) = a1_to_rowcol(inicio), a1_to_rowcol(fim)
+                blocos.append(self._ler(linha1, linha2, coluna1, coluna2))
+        return blocos
+
+    def add_rows(self, n):
+        self.simulador.chamada('sheets', 'add_rows')
+        self.row_count += n
+
+    def acell(self, a1):
+        self.simulador.chamada('sheets', 'acell')
+        linha, coluna = a1_to_rowcol(a1)
+        try:
+            return types.SimpleNamespace(value=self.dados[linha - 1][coluna - 1])
+        except IndexError:
+            return types.SimpleNamespace(value='')
+
+    def gravar(self, linha, coluna, valores):
+        while len(self.dados) < linha:
+            self.dados.append([])
+        atual = self.dados[linha - 1]
+        while len(atual) < coluna + len(valores) - 1:
+            atual.append('')
+        for j, valor in enumerate(valores):
+            atual[coluna - 1 + j] = str(valor)
+
+
+class PlanilhaSimulada:
+    def __init__(self, simulador, abas):
+        self.simulador = simulador
+        self.id = 'planilha-simulada'
+        self.abas = {titulo: WorksheetSimulada(simulador, titulo, dados) for titulo, dados in abas.items()}
+        self.revisao = 0
+        self.celulas_gravadas = 0
+
+    def worksheet(self, titulo):
+        self.simulador.chamada('sheets', 'worksheet')
+        return self.abas[titulo]
+
+    def values_batch_update(self, body):
+        self.simulador.chamada('sheets', 'values_batch_update')
+        for intervalo in body['data']:
+            titulo, a1 = intervalo['range'].rsplit('!', 1)
+            linha, coluna = a1_to_rowcol(a1.split(':')[0])
+            valores = intervalo['values'][0]
+            self.abas[titulo.strip("'")].gravar(linha, coluna, valores)
+            self.celulas_gravadas += len(valores)
+        self.revisao += 1
+
+    def get_lastUpdateTime(self):
+        self.simulador.chamada('sheets', 'get_lastUpdateTime')
+        return f"revisao-{self.revisao}"
+
+
+class ClienteGspreadSimulado:
+    def __init__(self, planilha):
+        self.planilha = planilha
+
+    def open_by_url(self, url):
+        self.planilha.simulador.chamada('sheets', 'open_by_url')
+        return self.planilha
+
+
+# ---------------------------------------------------------------------------
+# Search Console (googleapiclient)
+# ---------------------------------------------------------------------------
+
+class _Requisicao:
+    def __init__(self, funcao, resposta=None):
+        self._funcao = funcao
+        self.resposta = resposta  # resultado sem latência, para os lotes
+
+    def execute(self, **kwargs):
+        return self._funcao()
+
+
+class LoteSimulado:
+    """BatchHttpRequest: uma chamada (uma latência) para todas as requisições do lote."""
+
+    def __init__(self, simulador, api, callback):
+        self.simulador = simulador
+        self.api = api
+        self.callback = callback
+        self.requisicoes = []
+
+    def add(self, requisicao, request_id):
+        self.requisicoes.append((request_id, requisicao))
+
+    def execute(self, **kwargs):
+        self.simulador.chamada(self.api, 'batch')
+        for request_id, requisicao in self.requisicoes:
+            self.callback(request_id, requisicao.resposta(), None)
+
+
+class SearchConsoleSimulado:
+    """searchanalytics().query e sites().list; `linhas_por_consulta` controla o volume das
+    consultas por página/consulta (as consultas por 'date' devolvem uma linha por dia).
+    """
+
+    def __init__(self, simulador, dominios, linhas_por_consulta=1000):
+        self.simulador = simulador
+        self.dominios = dominios
+        self.linhas_por_consulta = linhas_por_consulta
+
+    def searchanalytics(self):
+        return self
+
+    def sites(self):
+        return types.SimpleNamespace(list=lambda: _Requisicao(self._listar))
+
+    def query(self, siteUrl, body):
+        return _Requisicao(lambda: self._consultar(siteUrl, body), lambda: self._responder(siteUrl, body))
+
+    def new_batch_http_request(self, callback=None):
+        return LoteSimulado(self.simulador, 'search_console', callback)
+
+    def _listar(self):
+        self.simulador.chamada('search_console', 'sites.list')
+        return {'siteEntry': [{'siteUrl': f"sc-domain:{d}", 'permissionLevel': 'siteOwner'} for d in self.dominios]}
+
+    def _consultar(self, site, body):
+        self.simulador.chamada('search_console', 'query')
+        return self._responder(site, body)
+
+    def _responder(self, site, body):
+        dimensoes = body.get('dimensions', [])
+        inicio = body.get('startRow', 0)
+        limite = body.get('rowLimit', 25000)
+        if not dimensoes:
+            return {'rows': [{'clicks': 500, 'impressions': 10000, 'ctr': 0.05, 'position': 7.5}]}
+        if dimensoes == ['date']:
+            dia = datetime.date.fromisoformat(body['startDate'])
+            fim = datetime.date.fromisoformat(body['endDate'])
+            total = (fim - dia).days + 1
+            linhas = [{'keys': [(dia + datetime.timedelta(days=k)).isoformat()],
+                       'clicks': 17, 'impressions': 333, 'ctr': 17 / 333, 'position': 7.5}
+                      for k in range(inicio, min(total, inicio + limite))]
+            return {'rows': linhas}
+        linhas = [{'keys': [f"https://{site.split(':')[-1].strip('/')}/pagina-{k % 200}", f"consulta {k}"][:len(dimensoes)],
+                   'clicks': k % 7, 'impressions': 50 + k % 13, 'ctr': 0.1, 'position': 1 + k % 30}
+                  for k in range(inicio, min(self.linhas_por_consulta, inicio + limite))]
+        return {'rows': linhas}
+
+
+# ---------------------------------------------------------------------------
+# GA4 (BetaAnalyticsDataClient)
+# ---------------------------------------------------------------------------
+
+def _linha_ga4(dimensao, *metricas):
+    return types.SimpleNamespace(dimension_values=[types.SimpleNamespace(value=dimensao)],
+                                 metric_values=[types.SimpleNamespace(value=str(m)) for m in metricas])
+
+
+class GA4Simulado:
+    def __init__(self, simulador, linhas_por_consulta=1000):
+        self.simulador = simulador
+        self.linhas_por_consulta = linhas_por_consulta
+
+    def run_report(self, request=None, timeout=None, **kwargs):
+        self.simulador.chamada('ga4', 'run_report')
+        dimensao = request.dimensions[0].name
+        if dimensao == 'yearMonth':
+            inicio = datetime.date.fromisoformat(request.date_ranges[0].start_date)
+            fim = datetime.date.fromisoformat(request.date_ranges[0].end_date)
+            linhas = []
+            ano, mes = inicio.year, inicio.month
+            while (ano, mes) <= (fim.year, fim.month):
+                linhas.append(_linha_ga4(f"{ano}{mes:02d}", 420))
+                ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+        elif dimensao == 'date':
+            dia = datetime.date.fromisoformat(request.date_ranges[0].start_date)
+            fim = datetime.date.fromisoformat(request.date_ranges[0].end_date)
+            linhas = [_linha_ga4((dia + datetime.timedelta(days=k)).strftime('%Y%m%d'), 14)
+                      for k in range((fim - dia).days + 1)]
+        else:
+            offset = getattr(request, 'offset', 0) or 0
+            limite = getattr(request, 'limit', 0) or self.linhas_por_consulta
+            linhas = [_linha_ga4(f"/pagina-{k}", k % 50 + 1, k % 40 + 1, k % 90 + 1)
+                      for k in range(offset, min(self.linhas_por_consulta, offset + limite))]
+        return types.SimpleNamespace(rows=linhas, row_count=len(linhas) if dimensao in ('yearMonth', 'date')
+                                     else self.linhas_por_consulta)
+
+
+class PoolSimulado:
+    """Mesma interface do GoogleClientPool, entregando os clientes simulados."""
+
+    def __init__(self, planilha, search_console, ga4):
+        self._gspread = ClienteGspreadSimulado(planilha)
+        self._search_console = search_console
+        self._ga4 = ga4
+
+    def credenciais(self, *scopes):
+        return object()
+
+    def gspread(self):
+        return self._gspread
+
+    def search_console(self):
+        return self._search_console
+
+    def ga4(self, credentials=None):
+        return self._ga4
+
+    def requisicao_ga4(self, property_id, dimensao, start_date, end_date, limite, offset=0):
+        # Objetos simples no lugar dos tipos da biblioteca do GA4 (não precisa estar instalada)
+        return types.SimpleNamespace(
+            property=f"properties/{property_id}",
+            date_ranges=[types.SimpleNamespace(start_date=start_date, end_date=end_date)],
+            dimensions=[types.SimpleNamespace(name=dimensao)],
+            metrics=[types.SimpleNamespace(name='sessions')],
+            limit=limite, offset=offset)
+
+
+# ---------------------------------------------------------------------------
+# Planilhas sintéticas
+# ---------------------------------------------------------------------------
+
+def rotulos_meses(quantidade):
+    """Os `quantidade` últimos meses encerrados, do mais antigo ao mais recente."""
+    dia = datetime.date.today().replace(day=1)
+    rotulos = []
+    for _ in range(quantidade):
+        dia = (dia - datetime.timedelta(days=1)).replace(day=1)
+        rotulos.append(_rotulo_mes(dia.year, dia.month))
+    return rotulos[::-1]
+
+
+def planilha_vertical(dominios, meses, fracao_preenchida=0.0, semente=42):
+    """Blocos domínio/cabeçalho/meses como na aba SEO SITES; `fracao_preenchida` dos meses
+    já vem com as métricas preenchidas (não são pendentes).
+    """
+    rng = random.Random(semente)
+    rotulos = rotulos_meses(meses)
+    dados = []
+    for d in dominios:
+        dados.append([d] + [''] * 6)
+        dados.append([''] * 7)
+        dados.append(list(CABECALHO_VERTICAL))
+        for rotulo in rotulos:
+            if rng.random() < fracao_preenchida:
+                dados.append([rotulo, '10000', '500', '5.00', '7.50', '420', ''])
+            else:
+                dados.append([rotulo] + [''] * 6)
+    return dados
+
+
+def planilha_horizontal(urls):
+    """Layout horizontal: cabeçalho + uma linha por URL (metade das URLs do cenário)."""
+    colunas = api_extractor.COLUNAS_SHEET113
+    largura = colunas['sessions_start'] + 12
+    dados = [['Landing page', 'GA4 property'] + [''] * (largura - 2)]
+    for k in range(0, urls, 2):
+        dados.append([f"site.com/pagina-{k}", f"site.com/pagina-{k}"] + [''] * (largura - 2))
+    return dados
+
+
+# ---------------------------------------------------------------------------
+# Cenários
+# ---------------------------------------------------------------------------
+
+def _montar_extrator(args, abas, dominios):
+    simulador = Simulador(
+        latencias={'sheets': args.latencia_sheets_ms / 1000, 'search_console': args.latencia_ms / 1000,
+                   'ga4': args.latencia_ms / 1000},
+        taxas_erro={'search_console': args.taxa_erro, 'ga4': args.taxa_erro},
+        semente=args.semente,
+    )
+    planilha = PlanilhaSimulada(simulador, abas)
+    pool = PoolSimulado(planilha, SearchConsoleSimulado(simulador, dominios, args.linhas),
+                        GA4Simulado(simulador, args.linhas))
+    # Sem cotas (mede o código, não o limite das APIs); novas tentativas rápidas. Métricas
+    # próprias por cenário, para que uma execução não acumule as da anterior
+    metricas = Metricas()
+    scheduler = RequestScheduler(max_tentativas=5, atraso_base=0.001, atraso_maximo=0.01, metricas=metricas)
+    extrator = SEODataExtractor(clients=pool, scheduler=scheduler, metricas=metricas)
+    return extrator, simulador, planilha
+
+
+def cenario_locators(args):
+    dominios = [f"dominio{k}.com" for k in range(args.dominios)]
+    dados = planilha_vertical(dominios, args.meses)
+    extrator, simulador, planilha = _montar_extrator(args, {api_extractor.ABA_DADOS_ORIGEM: dados}, dominios)
+
+    def executar():
+        extrator._layout_cache = None
+        inicio = time.perf_counter()
+        estruturas = extrator._locate_all_table_structures(dados)
+        frio = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        extrator._locate_all_table_structures(dados)
+        quente = time.perf_counter() - inicio
+        return {'estruturas': len(estruturas), 'linhas': len(dados),
+                'varredura_s': round(frio, 4), 'em_cache_s': round(quente, 4)}
+    return executar, simulador, planilha
+
+
+def _exigir_sucesso(resultado, args):
+    """Interrompe o benchmark quando a sincronização falhou por outro motivo que não os erros
+    injetados (ex: dependência ausente): os tempos mediriam só o caminho de erro.
+    """
+    if 'error' in resultado:
+        raise SystemExit(f"❌ Sincronização falhou: {resultado['error']}")
+    falhas = [erro for rel in (resultado.get('domains') or {}).values() for erro in rel['failed'].values()]
+    if falhas and (not args.taxa_erro or not resultado.get('processed_months')):
+        raise SystemExit(f"❌ {len(falhas)} mês(es) com falha sem erros injetados suficientes para isso; "
+                         f"primeira: {falhas[0]}")
+
+
+def cenario_sync(args):
+    dominios = [f"dominio{k}.com" for k in range(args.dominios)]
+    dados = planilha_vertical(dominios, args.meses, args.preenchidos, args.semente)
+    extrator, simulador, planilha = _montar_extrator(args, {api_extractor.ABA_DADOS_ORIGEM: dados}, dominios)
+
+    def executar():
+        resultado = extrator.preencher_meses_pendentes_vertical(max_workers=args.workers,
+                                                                backfill=not args.sem_backfill)
+        _exigir_sucesso(resultado, args)
+        return {'meses_processados': resultado.get('processed_months', 0),
+                'meses_com_falha': resultado.get('failed_months', 0)}
+    return executar, simulador, planilha
+
+
+def cenario_horizontal(args):
+    dados = planilha_horizontal(args.urls)
+    extrator, simulador, planilha = _montar_extrator(args, {api_extractor.ABA_DADOS_ORIGEM: dados}, [])
+    linhas_gsc = [{'keys': [f"https://site.com/pagina-{k}", f"consulta {k}"], 'impressions': 100 + k,
+                   'clicks': k % 10, 'position': 4.2} for k in range(args.urls)]
+    linhas_ga4 = [{'page_path': f"site.com/pagina-{k}", 'sessions': str(k % 70)} for k in range(0, args.urls, 3)]
+
+    def executar():
+        paginas = extrator.processar_dados_search_console(linhas_gsc, 'mar-25')
+        extrator.processar_dados_ga4(linhas_ga4, paginas=paginas)
+        extrator.atualizar_sheet113(paginas, 'mar-25')
+        return {'urls': args.urls}
+    return executar, simulador, planilha
+
+
+CENARIOS = {
+    'locators': cenario_locators,
+    'sync': cenario_sync,
+    'horizontal': cenario_horizontal,
+}
+
+
+def medir(nome, args):
+    """Executa o cenário (com estado novo) para medir o tempo e, de novo, para o pico de memória."""
+    saida = None if args.verbose else io.StringIO()
+    with tempfile.TemporaryDirectory() as pasta:
+        diretorio = os.getcwd()
+        os.chdir(pasta)  # cache/registro de sites do extrator vão para a pasta temporária
+        try:
+            with contextlib.redirect_stdout(saida) if saida else contextlib.nullcontext():
+                executar, simulador, planilha = CENARIOS[nome](args)
+                inicio = time.perf_counter()
+                detalhes = executar()
+                tempo = time.perf_counter() - inicio
+
+                pico = None
+                if not args.sem_memoria:
+                    executar_mem, _, _ = CENARIOS[nome](args)
+                    tracemalloc.start()
+                    executar_mem()
+                    pico = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+        finally:
+            os.chdir(diretorio)
+
+    return {
+        'cenario': nome,
+        'tempo_s': round(tempo, 4),
+        'pico_memoria_mb': round(pico / 2 ** 20, 2) if pico is not None else None,
+        'chamadas': dict(sorted(simulador.chamadas.items())),
+        'erros_injetados': dict(simulador.erros),
+        'celulas_gravadas': planilha.celulas_gravadas,
+        'celulas_lidas': sum(aba.celulas_lidas for aba in planilha.abas.values()),
+        **detalhes,
+    }
+
+
+def imprimir_resultado(resultado):
+    print(f"\n📊 {resultado['cenario']}: {resultado['tempo_s']:.3f}s", end='')
+    if resultado['pico_memoria_mb'] is not None:
+        print(f" | pico de memória {resultado['pico_memoria_mb']:.2f} MB", end='')
+    print()
+    for chave, valor in resultado.items():
+        if chave in ('cenario', 'tempo_s', 'pico_memoria_mb', 'chamadas'):
+            continue
+        print(f"   {chave}: {valor}")
+    for chamada, total in resultado['chamadas'].items():
+        print(f"   📞 {chamada}: {total}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline do SEODataExtractor (APIs simuladas).")
+    parser.add_argument('--cenarios', default=','.join(CENARIOS),
+                        help=f"cenários separados por vírgula ({', '.join(CENARIOS)})")
+    parser.add_argument('--dominios', type=int, default=500, help="blocos de domínio na planilha vertical")
+    parser.add_argument('--meses', type=int, default=60, help="meses (linhas) por bloco")
+    parser.add_argument('--preenchidos', type=float, default=0.5,
+                        help="fração dos meses já preenchidos no cenário sync (0 a 1)")
+    parser.add_argument('--urls', type=int, default=5000, help="URLs do cenário horizontal")
+    parser.add_argument('--linhas', type=int, default=1000,
+                        help="linhas devolvidas por consulta de página/consulta no GSC e no GA4")
+    parser.add_argument('--latencia-ms', type=float, default=0.0, help="latência por chamada ao GSC e ao GA4")
+    parser.add_argument('--latencia-sheets-ms', type=float, default=0.0, help="latência por chamada ao Sheets")
+    parser.add_argument('--taxa-erro', type=float, default=0.0,
+                        help="probabilidade de erro transitório (429/503) por chamada ao GSC/GA4")
+    parser.add_argument('--workers', type=int, default=None, help="workers da sincronização (padrão do config)")
+    parser.add_argument('--sem-backfill', action='store_true', help="sync com uma consulta por (domínio, mês)")
+    parser.add_argument('--sem-memoria', action='store_true', help="não medir o pico de memória")
+    parser.add_argument('--semente', type=int, default=42, help="semente dos dados e dos erros simulados")
+    parser.add_argument('--json', help="grava os resultados neste arquivo JSON")
+    parser.add_argument('--verbose', action='store_true', help="mostra os logs do extrator")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    resultados = []
+    for nome in [c.strip() for c in args.cenarios.split(',') if c.strip()]:
+        if nome not in CENARIOS:
+            raise SystemExit(f"❌ Cenário desconhecido: {nome}")
+        resultado = medir(nome, args)
+        imprimir_resultado(resultado)
+        resultados.append(resultado)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados gravados em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
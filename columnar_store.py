@@ -0,0 +1,347 @@
+"""Armazém colunar local (Parquet) das linhas brutas extraídas do Search Console e do GA4.
+
+Toda resposta obtida das APIs é gravada em arquivos Parquet particionados no estilo Hive:
+
+    <raiz>/fonte=gsc/dominio=exemplo.com/mes=2025-03/page+query__2025-03-01.parquet
+
+Cada arquivo corresponde a uma consulta (fonte, domínio, dimensões, início do período) dentro
+de um mês; extrair de novo um período com o mesmo início (ex: o mês corrente, dia após dia)
+substitui o arquivo (gravação atômica), então não há linhas duplicadas. Linhas com a dimensão
+'date' ou 'yearMonth' vão para o mês da própria linha. Com isso o histórico
+por URL, a reagregação em outros períodos (dia, semana, mês, ano, página) e análises ad hoc
+rodam localmente sobre arquivos lidos por memory map, sem novas chamadas às APIs.
+
+Requer o pyarrow; o DuckDB é opcional e só é usado por `consultar` (SQL livre sobre a view
+`metricas`). Os dois são importados só quando o armazém é usado.
+"""
+import datetime
+import importlib.util
+import os
+import uuid
+
+from aggregation import iterar_blocos, metricas_gsc
+
+COLUNAS_DIMENSAO = {'date': 'data', 'page': 'pagina', 'query': 'consulta', 'country': 'pais',
+                    'device': 'dispositivo', 'pagePath': 'pagina'}
+PARTICOES = ('fonte', 'dominio', 'mes')
+PERIODOS = ('dia', 'semana', 'mes', 'ano', 'pagina', 'consulta')
+TIPOS_SQL = {'int64': 'BIGINT', 'double': 'DOUBLE', 'string': 'VARCHAR'}
+
+
+def _esquema():
+    import pyarrow as pa
+    return pa.schema([
+        ('dimensoes', pa.string()),
+        ('inicio', pa.string()),
+        ('fim', pa.string()),
+        ('data', pa.string()),
+        ('pagina', pa.string()),
+        ('consulta', pa.string()),
+        ('pais', pa.string()),
+        ('dispositivo', pa.string()),
+        ('impressions', pa.int64()),
+        ('clicks', pa.int64()),
+        ('ctr', pa.float64()),
+        ('position', pa.float64()),
+        ('sessions', pa.int64()),
+    ])
+
+
+def _inteiro(valor):
+    try:
+        return int(float(valor or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _real(valor):
+    try:
+        return float(valor or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _fim_do_mes(mes):
+    ano, numero = int(mes[:4]), int(mes[5:7])
+    proximo = datetime.date(ano + 1, 1, 1) if numero == 12 else datetime.date(ano, numero + 1, 1)
+    return (proximo - datetime.timedelta(days=1)).isoformat()
+
+
+class GravadorParticoes:
+    """Grava linhas de uma consulta (em blocos, à medida que chegam) nos arquivos dos meses.
+
+    Os arquivos são escritos em `.tmp` e só substituem os definitivos em `fechar()`; se a
+    extração falhar no meio (`descartar()`), os dados anteriores continuam intactos.
+    """
+
+    def __init__(self, armazem, fonte, dominio, dimensoes, inicio, fim):
+        self.armazem = armazem
+        self.fonte = fonte
+        self.dominio = str(dominio)
+        self.dimensoes = list(dimensoes)
+        self.inicio = inicio
+        self.fim = fim
+        self.linhas = 0
+        self._escritores = {}  # mês -> (ParquetWriter, caminho tmp, caminho final)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.fechar()
+        else:
+            self.descartar()
+        return False
+
+    def _periodo_do_mes(self, mes):
+        """Período coberto pelo arquivo do mês: o da consulta, recortado ao mês quando as
+        linhas têm a dimensão 'date'/'yearMonth' (consultas de vários meses viram um arquivo por mês).
+        """
+        if not {'date', 'yearMonth'} & set(self.dimensoes):
+            return self.inicio, self.fim
+        return max(self.inicio, f"{mes}-01"), min(self.fim, _fim_do_mes(mes))
+
+    def _escritor(self, mes):
+        escritor = self._escritores.get(mes)
+        if escritor is None:
+            import pyarrow.parquet as pq
+            inicio, fim = self._periodo_do_mes(mes)
+            pasta = self.armazem.pasta_particao(self.fonte, self.dominio, mes)
+            os.makedirs(pasta, exist_ok=True)
+            nome = f"{'+'.join(self.dimensoes) or 'totais'}__{inicio}.parquet"
+            final = os.path.join(pasta, nome)
+            # Prefixo '.': arquivos em escrita ficam fora das leituras (pyarrow e DuckDB)
+            tmp = os.path.join(pasta, f".{nome}.{uuid.uuid4().hex}.tmp")
+            escritor = self._escritores[mes] = (pq.ParquetWriter(tmp, self.armazem.esquema, compression='zstd'),
+                                                tmp, final)
+        return escritor[0]
+
+    def _linha(self, row):
+        """Converte uma linha do GSC (keys + métricas) ou do GA4 para (mês, colunas)."""
+        colunas = dict.fromkeys(('data', 'pagina', 'consulta', 'pais', 'dispositivo'))
+        for dimensao, valor in zip(self.dimensoes, row.get('keys') or ()):
+            coluna = COLUNAS_DIMENSAO.get(dimensao)
+            if coluna:
+                colunas[coluna] = valor
+        if 'page_path' in row:
+            colunas['pagina'] = row['page_path']
+        if row.get('date'):
+            colunas['data'] = row['date']
+        if colunas['data']:
+            mes = colunas['data'][:7]
+        elif row.get('year_month'):
+            mes = f"{row['year_month'][:4]}-{row['year_month'][4:6]}"
+        else:
+            mes = self.inicio[:7]
+        colunas.update(
+            impressions=_inteiro(row.get('impressions')),
+            clicks=_inteiro(row.get('clicks')),
+            ctr=_real(row.get('ctr')),
+            position=_real(row.get('position')),
+            sessions=_inteiro(row.get('sessions')),
+        )
+        return mes, colunas
+
+    def adicionar(self, rows):
+        """Acrescenta um bloco de linhas (lista ou gerador) aos arquivos dos meses."""
+        import pyarrow as pa
+        for bloco in iterar_blocos(rows):
+            por_mes = {}
+            for row in bloco:
+                mes, colunas = self._linha(row)
+                por_mes.setdefault(mes, []).append(colunas)
+            for mes, linhas in por_mes.items():
+                inicio, fim = self._periodo_do_mes(mes)
+                comuns = {'dimensoes': ','.join(self.dimensoes), 'inicio': inicio, 'fim': fim}
+                tabela = pa.Table.from_pylist([{**comuns, **linha} for linha in linhas], schema=self.armazem.esquema)
+                self._escritor(mes).write_table(tabela)
+            self.linhas += len(bloco)
+        return self
+
+    def fechar(self):
+        """Fecha os arquivos e substitui os anteriores do mesmo período. Uma consulta sem linhas
+        grava um arquivo vazio no mês do início (o período fica registrado como extraído).
+        """
+        if not self._escritores:
+            self._escritor(self.inicio[:7])
+        for escritor, tmp, final in self._escritores.values():
+            escritor.close()
+            os.replace(tmp, final)
+        self._escritores.clear()
+
+    def descartar(self):
+        for escritor, tmp, _ in self._escritores.values():
+            try:
+                escritor.close()
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        self._escritores.clear()
+
+
+class ColumnarStore:
+    def __init__(self, raiz='armazem_metricas'):
+        if importlib.util.find_spec('pyarrow') is None:
+            raise RuntimeError("pyarrow não instalado (pip install pyarrow)")
+        self.raiz = raiz
+        self._esquema = None
+
+    @property
+    def esquema(self):
+        if self._esquema is None:
+            self._esquema = _esquema()
+        return self._esquema
+
+    def pasta_particao(self, fonte, dominio, mes):
+        return os.path.join(self.raiz, f"fonte={fonte}", f"dominio={dominio}", f"mes={mes}")
+
+    def gravador(self, fonte, dominio, dimensoes, inicio, fim):
+        """Gravador incremental de uma consulta (use com `with`, chamando `adicionar` por bloco)."""
+        return GravadorParticoes(self, fonte, dominio, dimensoes, inicio, fim)
+
+    def gravar(self, fonte, dominio, dimensoes, inicio, fim, linhas):
+        """Grava todas as linhas de uma consulta; retorna o número de linhas gravadas."""
+        with self.gravador(fonte, dominio, dimensoes, inicio, fim) as gravador:
+            gravador.adicionar(linhas)
+        return gravador.linhas
+
+    def _arquivos(self):
+        if not os.path.isdir(self.raiz):
+            return []
+        arquivos = []
+        for pasta, _, nomes in os.walk(self.raiz):
+            arquivos.extend(os.path.join(pasta, nome) for nome in nomes if nome.endswith('.parquet'))
+        return sorted(arquivos)
+
+    def tabela(self, fonte=None, dominio=None, mes_inicio=None, mes_fim=None, dimensoes=None, colunas=None):
+        """Linhas armazenadas como `pyarrow.Table` (leitura por memory map), filtradas pelas
+        partições (fonte, domínio, intervalo de meses 'AAAA-MM') e pelas dimensões da consulta.
+        """
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+
+        arquivos = self._arquivos()
+        if not arquivos:
+            return pa.Table.from_pylist([], schema=self.esquema)
+        filtro = None
+
+        def e(condicao):
+            nonlocal filtro
+            filtro = condicao if filtro is None else filtro & condicao
+
+        if fonte:
+            e(ds.field('fonte') == fonte)
+        if dominio:
+            e(ds.field('dominio') == str(dominio))
+        if mes_inicio:
+            e(ds.field('mes') >= mes_inicio)
+        if mes_fim:
+            e(ds.field('mes') <= mes_fim)
+        if dimensoes is not None:
+            e(ds.field('dimensoes') == ','.join(dimensoes))
+        campos_particao = [pa.field(nome, pa.string()) for nome in PARTICOES]
+        esquema = pa.schema(list(self.esquema) + campos_particao)
+        return pq.read_table(self.raiz, columns=colunas, filters=filtro, schema=esquema, memory_map=True,
+                             partitioning=ds.partitioning(pa.schema(campos_particao), flavor='hive'))
+
+    def historico_url(self, url, dominio=None, fonte='gsc'):
+        """Linhas de uma página (URL exata do GSC ou pagePath do GA4), ordenadas por período."""
+        import pyarrow.compute as pc
+        tabela = self.tabela(fonte=fonte, dominio=dominio)
+        tabela = tabela.filter(pc.equal(tabela['pagina'], url))
+        return tabela.sort_by([('mes', 'ascending'), ('inicio', 'ascending'), ('data', 'ascending')]).to_pylist()
+
+    def reagregar(self, fonte='gsc', dominio=None, dimensoes=None, por='mes', mes_inicio=None, mes_fim=None):
+        """Soma as linhas armazenadas por período ('dia', 'semana', 'mes', 'ano') ou por
+        'pagina'/'consulta'. `dimensoes` escolhe de quais consultas vêm as linhas (padrão:
+        ['date'] no GSC e ['yearMonth'] no GA4 por período; ['page', 'query'] ou ['pagePath']
+        por página), para que consultas diferentes do mesmo mês não sejam somadas juntas.
+        Retorna [{'periodo', 'impressions', 'clicks', 'ctr', 'position', 'sessions', 'linhas'}].
+        """
+        import pyarrow.compute as pc
+
+        if por not in PERIODOS:
+            raise ValueError(f"período inválido: {por} (use {', '.join(PERIODOS)})")
+        if dimensoes is None:
+            if por in ('pagina', 'consulta'):
+                dimensoes = ['page', 'query'] if fonte == 'gsc' else ['pagePath']
+            else:
+                dimensoes = ['date'] if fonte == 'gsc' else ['yearMonth']
+        tabela = self.tabela(fonte=fonte, dominio=dominio, mes_inicio=mes_inicio, mes_fim=mes_fim,
+                             dimensoes=dimensoes)
+        if tabela.num_rows == 0:
+            return []
+
+        data = pc.coalesce(tabela['data'], tabela['inicio'])
+        if por == 'dia':
+            chave = data
+        elif por == 'mes':
+            chave = tabela['mes']
+        elif por == 'ano':
+            chave = pc.utf8_slice_codeunits(data, 0, 4)
+        elif por == 'semana':
+            chave = pc.strftime(pc.strptime(data, format='%Y-%m-%d', unit='s'), format='%G-W%V')
+        else:
+            chave = pc.coalesce(tabela[por], '')
+        pesos = pc.multiply(tabela['position'], pc.cast(pc.max_element_wise(tabela['impressions'], 0), 'float64'))
+        agrupado = (tabela.select(['impressions', 'clicks', 'sessions'])
+                    .append_column('periodo', chave)
+                    .append_column('pos_ponderada', pesos)
+                    .group_by('periodo')
+                    .aggregate([('impressions', 'sum'), ('clicks', 'sum'), ('pos_ponderada', 'sum'),
+                                ('sessions', 'sum'), ('periodo', 'count')])
+                    .sort_by('periodo'))
+
+        resultado = []
+        for linha in agrupado.to_pylist():
+            impressions, clicks, ctr, posicao = metricas_gsc(linha['impressions_sum'], linha['clicks_sum'],
+                                                             linha['pos_ponderada_sum'])
+            resultado.append({'periodo': linha['periodo'], 'impressions': impressions, 'clicks': clicks,
+                              'ctr': ctr, 'position': posicao, 'sessions': linha['sessions_sum'],
+                              'linhas': linha['periodo_count']})
+        return resultado
+
+    def consultar(self, sql, parametros=None):
+        """SQL livre (DuckDB) sobre a view `metricas` com todas as linhas armazenadas e as
+        colunas de partição (fonte, dominio, mes). Retorna uma lista de dicts.
+        """
+        if importlib.util.find_spec('duckdb') is None:
+            raise RuntimeError("duckdb não instalado (pip install duckdb)")
+        import duckdb
+
+        conexao = duckdb.connect()
+        try:
+            if self._arquivos():
+                padrao = os.path.join(self.raiz, '**', '*.parquet').replace("'", "''")
+                conexao.execute(f"CREATE VIEW metricas AS SELECT * FROM read_parquet('{padrao}', "
+                                "hive_partitioning = true, hive_types_autocast = false)")
+            else:
+                # Armazém vazio: view sem linhas, com as mesmas colunas
+                colunas = [f"NULL::{TIPOS_SQL[str(campo.type)]} AS {campo.name}" for campo in self.esquema]
+                colunas += [f"NULL::VARCHAR AS {nome}" for nome in PARTICOES]
+                conexao.execute(f"CREATE VIEW metricas AS SELECT {', '.join(colunas)} WHERE false")
+            cursor = conexao.execute(sql, parametros or [])
+            nomes = [coluna[0] for coluna in cursor.description]
+            return [dict(zip(nomes, linha)) for linha in cursor.fetchall()]
+        finally:
+            conexao.close()
+
+    def remover(self, fonte=None, dominio=None, mes=None):
+        """Remove os arquivos das partições indicadas (sem filtros, esvazia o armazém).
+        Retorna o número de arquivos removidos.
+        """
+        removidos = 0
+        for caminho in self._arquivos():
+            partes = dict(parte.split('=', 1) for parte in os.path.relpath(caminho, self.raiz).split(os.sep)[:-1]
+                          if '=' in parte)
+            if fonte and partes.get('fonte') != fonte:
+                continue
+            if dominio and partes.get('dominio') != str(dominio):
+                continue
+            if mes and partes.get('mes') != mes:
+                continue
+            os.remove(caminho)
+            removidos += 1
+        return removidos
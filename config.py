@@ -56,8 +56,17 @@ SCOPES = [
 CREDENTIALS_FILE = 'credentials.json'
 
 # Limites de requisições
+# Linhas por página nas consultas do Search Console; as páginas seguintes são lidas
+# via startRow até o fim do resultado (máximo da API: 25000)
 SEARCH_CONSOLE_ROW_LIMIT = 25000
+# Consultas do Search Console agrupadas numa requisição HTTP em lote (batch), quando há
+# vários domínios/meses a consultar (máximo da API: 1000; 0 desativa o lote)
+SEARCH_CONSOLE_BATCH_SIZE = 50
+# Linhas por página nos relatórios do GA4 (limit/offset; máximo da API: 250000). A primeira
+# resposta informa o total (row_count) e as páginas restantes são pedidas em paralelo,
+# até GA4_PARALLEL_PAGES ao mesmo tempo (sempre respeitando a cota do GA4)
 GA4_ROW_LIMIT = 10000
+GA4_PARALLEL_PAGES = 4
 
 # =============================================================================
 # CONFIGURAÇÕES DA PLANILHA
@@ -83,12 +92,13 @@ COLUNAS_SHEET113 = {
 # CONFIGURAÇÕES DE PROCESSAMENTO
 # =============================================================================
 
-# Dimensões para extração do Search Console
+# Dimensões para extração detalhada (por URL) do Search Console.
+# O layout vertical (SEO SITES) não usa dimensões: pede só os totais de cada mês.
 SEARCH_CONSOLE_DIMENSIONS = ['page', 'query']
 
 # Métricas para extração do GA4
 GA4_DIMENSIONS = ['pagePath']
-GA4_METRICS = ['sessions', 'users', 'pageviews']
+GA4_METRICS = ['sessions']  # única métrica gravada na planilha
 
 # Configurações de normalização de URL
 URL_NORMALIZATION = {
@@ -111,15 +121,141 @@ SHOW_PROGRESS = True
 # CONFIGURAÇÕES AVANÇADAS
 # =============================================================================
 
-# Tempo de espera entre requisições (segundos)
+# Cota de chamadas por minuto de cada API. As chamadas seguem no ritmo máximo permitido
+# (balde de tokens por API, compartilhado pelas threads) em vez de pausas fixas.
+API_QUOTAS_PER_MINUTE = {
+    'sheets': 60,            # leituras/escritas por minuto por usuário
+    'search_console': 1200,  # consultas por minuto por site
+    'ga4': 60,
+}
+
+# Atraso base (segundos) do backoff exponencial com jitter entre novas tentativas
 DELAY_BETWEEN_REQUESTS = 1
 
-# Número máximo de tentativas em caso de erro
+# Número máximo de novas tentativas para erros transitórios (429, 5xx, timeouts)
 MAX_RETRIES = 3
 
 # Timeout para requisições (segundos)
 REQUEST_TIMEOUT = 30
 
+# Número de workers da sincronização de meses pendentes.
+# Cada par (domínio, mês) pendente é extraído em paralelo; use 1 para modo sequencial.
+SYNC_MAX_WORKERS = 4
+
+# Escritas na planilha: a sincronização lê a aba uma vez e grava todas as células
+# numa única chamada ao final; só faz gravações parciais se acumular este número
+# de células pendentes (0 = sem limite)
+SHEETS_MAX_BUFFERED_CELLS = 5000
+
+# Leituras da planilha: a sincronização lê primeiro a coluna A (domínios e meses), depois as
+# linhas de cabeçalho e, numa única chamada (batch_get), só as colunas de métricas das linhas
+# de meses a verificar; FTD, anotações e meses já completos (planilha inalterada desde a
+# última --sync) não são transferidos. False lê a aba inteira.
+SHEETS_TARGETED_READS = True
+# Abas muito grandes lidas por inteiro: leitura em blocos deste número de linhas (0 = uma chamada)
+SHEETS_READ_CHUNK_ROWS = 0
+
+# Sincronização em lote (backfill): o Search Console (dimensão 'date') e o GA4 (dimensão
+# 'yearMonth') são consultados uma única vez por domínio para todo o intervalo pendente,
+# e as linhas são agrupadas por mês localmente.
+SYNC_BACKFILL = True
+
+# =============================================================================
+# PROPRIEDADES DO SEARCH CONSOLE
+# =============================================================================
+
+# Arquivo onde fica registrado, por domínio, o siteUrl do Search Console que funcionou
+# (as próximas extrações vão direto a ele, sem testar os candidatos)
+SC_SITES_REGISTRY_PATH = 'sc_sites.json'
+
+# Consultar a lista de propriedades acessíveis (sites.list, uma vez) para escolher o
+# siteUrl de domínios ainda não registrados
+SC_SITES_USE_LIST = True
+
+# Validade (horas) da lista de propriedades gravada em SC_SITES_REGISTRY_PATH: dentro dela,
+# novas execuções e os processos da frota não repetem o sites.list
+SC_SITES_LIST_TTL_HOURS = 24
+
+# =============================================================================
+# CACHE LOCAL DE RESPOSTAS
+# =============================================================================
+
+# Cache em disco (SQLite) das respostas do Search Console e do GA4, por
+# (site/propriedade, dimensões, início, fim). Meses encerrados há mais de
+# CACHE_FINALIZATION_DAYS dias são imutáveis; períodos recentes expiram após
+# CACHE_TTL_SECONDS. Acima de CACHE_MAX_ENTRIES, as entradas menos usadas saem.
+CACHE_ENABLED = True
+CACHE_PATH = 'cache_respostas.sqlite3'
+CACHE_TTL_SECONDS = 6 * 3600
+CACHE_FINALIZATION_DAYS = 3
+CACHE_MAX_ENTRIES = 20000
+
+# =============================================================================
+# ARMAZÉM COLUNAR LOCAL
+# =============================================================================
+
+# Linhas brutas de todas as extrações do GSC e do GA4, em Parquet particionado por
+# fonte/domínio/mês (requer pyarrow; consultas SQL com duckdb). Permite histórico por URL,
+# reagregação em outros períodos e análises locais sem novas chamadas às APIs.
+COLUMNAR_STORE_ENABLED = True
+COLUMNAR_STORE_PATH = 'armazem_metricas'
+
+# =============================================================================
+# SINCRONIZAÇÃO AGENDADA (cron/systemd)
+# =============================================================================
+
+# Estado do modo sem menu (`python ler_seo-sites.py --sync`): revisão da planilha vista
+# por último e pares (domínio, mês) concluídos/com falha. Sem alteração na planilha e sem
+# mês novo encerrado, a execução termina sem consultar as APIs de dados.
+SYNC_STATE_PATH = 'sync_state.json'
+
+# Mês corrente (month-to-date): grava valores provisórios na linha do mês em andamento,
+# consultando a cada execução só os dias novos (totais acumulados em MONTH_TO_DATE_STATE_PATH).
+# Os últimos MONTH_TO_DATE_LAG_DAYS dias ficam de fora (dados do GSC/GA4 ainda instáveis).
+# Só células vazias ou ainda com o nosso valor provisório são sobrescritas; quando o mês
+# encerra, elas recebem os valores finais. Também ativável por execução: --month-to-date.
+MONTH_TO_DATE_ENABLED = False
+MONTH_TO_DATE_LAG_DAYS = 3
+MONTH_TO_DATE_STATE_PATH = 'mtd_state.json'
+
+# =============================================================================
+# RANKING DE CONSULTAS E PÁGINAS (python ler_seo-sites.py --ranking [mar-25 ...])
+# =============================================================================
+
+# Top-N consultas e top-N páginas de cada domínio/mês, por cliques e por impressões, lidos do
+# Search Console em streaming (memória proporcional a N, não ao tamanho do site) e gravados
+# numa única escrita na aba ABA_RANKING (criada se não existir; uma linha por item). Gerar de
+# novo um domínio/mês substitui só as linhas dele.
+RANKING_TOP_N = 50
+ABA_RANKING = 'SEO RANKING'
+
+# =============================================================================
+# FROTA DE PLANILHAS (python ler_seo-sites.py --fleet)
+# =============================================================================
+
+# Planilhas de clientes com o mesmo layout da aba SEO SITES, sincronizadas em paralelo
+# (um processo por planilha). Cada alvo é a URL da planilha ou um dict com
+# 'spreadsheet_url', 'aba' (padrão: ABA_DADOS_ORIGEM) e 'nome' (identifica o estado do alvo
+# em FLEET_STATE_DIR; padrão: ID da planilha + aba). As cotas de API_QUOTAS_PER_MINUTE são
+# divididas entre os processos. O relatório consolidado vai para FLEET_REPORT_PATH.
+FLEET_TARGETS = [
+    # {'nome': 'cliente-a', 'spreadsheet_url': 'https://docs.google.com/spreadsheets/d/.../edit', 'aba': 'SEO SITES'},
+]
+FLEET_MAX_WORKERS = 4
+FLEET_STATE_DIR = 'fleet_state'
+FLEET_REPORT_PATH = 'fleet_report.json'
+
+# =============================================================================
+# MÉTRICAS
+# =============================================================================
+
+# Ao fim de cada sincronização são gravados um resumo JSON e, se configurado, um textfile
+# do Prometheus (chamadas/latências/novas tentativas por API, linhas, bytes, duração das
+# fases). Para o node_exporter, aponte METRICS_PROMETHEUS_PATH para o diretório do
+# textfile collector, ex: '/var/lib/node_exporter/textfile_collector/seo_sites.prom'.
+METRICS_JSON_PATH = 'metricas_sync.json'
+METRICS_PROMETHEUS_PATH = None
+
 # =============================================================================
 # MAPEAMENTO POR DOMÍNIO (OPCIONAL)
 # =============================================================================
@@ -0,0 +1,231 @@
+"""Sincronização de uma frota de planilhas com o mesmo layout da aba SEO SITES.
+
+Cada alvo (planilha + aba) é sincronizado por um processo do pool, com o mesmo fluxo do
+`--sync` (sincronização incremental) e estado próprio em FLEET_STATE_DIR. Credenciais e
+clientes das APIs ficam no pool do processo (obter_pool) e são reaproveitados por todos os
+alvos que ele atender. Cache de respostas, registro de sites e armazém colunar também são
+compartilhados. As cotas por minuto valem para o projeto inteiro, então são divididas entre
+os processos. Ao fim, um relatório consolidado é impresso e gravado em FLEET_REPORT_PATH.
+"""
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from api_extractor import (SEODataExtractor, ABA_DADOS_ORIGEM, API_QUOTAS_PER_MINUTE, DELAY_BETWEEN_REQUESTS,
+                           MAX_RETRIES, _config_opcional)
+from metrics import Metricas
+from request_scheduler import RequestScheduler
+from sync_state import SyncState
+
+# Alvos da frota: URLs de planilha ou {'spreadsheet_url': ..., 'aba': ..., 'nome': ...}
+# ('aba' padrão: ABA_DADOS_ORIGEM; 'nome' padrão: ID da planilha + aba)
+FLEET_TARGETS = _config_opcional('FLEET_TARGETS', [])
+
+# Processos em paralelo (cada um sincroniza um alvo por vez)
+FLEET_MAX_WORKERS = _config_opcional('FLEET_MAX_WORKERS', 4)
+
+# Estado de sincronização e do mês corrente de cada alvo, e o relatório consolidado
+FLEET_STATE_DIR = _config_opcional('FLEET_STATE_DIR', 'fleet_state')
+FLEET_REPORT_PATH = _config_opcional('FLEET_REPORT_PATH', 'fleet_report.json')
+
+_ICONES = {'ok': '✅', 'pulado': '⏭️ ', 'falhas': '⚠️ ', 'erro': '❌'}
+
+_RE_ID_PLANILHA = re.compile(r'/spreadsheets/d/([a-zA-Z0-9_-]+)')
+
+# Cotas do processo atual (definidas pelo inicializador do pool)
+_cotas_processo = None
+
+
+def _slug(texto):
+    return re.sub(r'[^a-z0-9]+', '-', texto.lower()).strip('-')
+
+
+def validar_alvos(alvos):
+    """Normaliza a lista de alvos para [{'nome', 'spreadsheet_url', 'aba'}].
+    Retorna (alvos, erros); nomes repetidos são erro, pois cada alvo tem seu próprio estado.
+    """
+    normalizados = []
+    erros = []
+    for k, alvo in enumerate(alvos or [], 1):
+        if isinstance(alvo, str):
+            alvo = {'spreadsheet_url': alvo}
+        if not isinstance(alvo, dict):
+            erros.append(f"alvo {k}: use a URL da planilha ou um dict com 'spreadsheet_url'")
+            continue
+        url = alvo.get('spreadsheet_url') or ''
+        planilha = _RE_ID_PLANILHA.search(url)
+        if not planilha:
+            erros.append(f"alvo {k}: spreadsheet_url não parece uma URL de planilha do Google: {url!r}")
+            continue
+        aba = alvo.get('aba') or ABA_DADOS_ORIGEM
+        nome = _slug(alvo.get('nome') or f"{planilha.group(1)}-{aba}")
+        normalizados.append({'nome': nome, 'spreadsheet_url': url, 'aba': aba})
+
+    vistos = set()
+    for alvo in normalizados:
+        if alvo['nome'] in vistos:
+            erros.append(f"alvo repetido: {alvo['nome']} (use 'nome' para diferenciar)")
+        vistos.add(alvo['nome'])
+    if not normalizados and not erros:
+        erros.append("nenhum alvo configurado em FLEET_TARGETS")
+    return normalizados, erros
+
+
+def _caminhos_estado(nome):
+    return (os.path.join(FLEET_STATE_DIR, f"{nome}.sync.json"),
+            os.path.join(FLEET_STATE_DIR, f"{nome}.mtd.json"))
+
+
+def _iniciar_processo(cotas):
+    global _cotas_processo
+    _cotas_processo = cotas
+
+
+def _chamadas_por_api(metricas):
+    chamadas = {}
+    for contador in metricas.resumo()['contadores']:
+        if contador['nome'] == 'api_chamadas_total':
+            api = contador['rotulos']['api']
+            chamadas[api] = chamadas.get(api, 0) + contador['valor']
+    return chamadas
+
+
+def _relatorio_vazio(alvo):
+    return {**alvo, 'status': 'erro', 'processed_months': 0, 'failed_months': 0, 'mtd_celulas': 0,
+            'falhas': {}, 'erro': None, 'chamadas': {}, 'duracao': 0.0}
+
+
+def sincronizar_alvo(alvo, forcar=False, mes_corrente=None, max_workers=None):
+    """Sincroniza um alvo (executado num processo do pool). Nunca levanta exceção: erros
+    viram o status 'erro' no relatório do alvo.
+    """
+    inicio = time.perf_counter()
+    relatorio = _relatorio_vazio(alvo)
+    # Métricas e agendador por alvo; o processo atende um alvo por vez, então as cotas
+    # divididas continuam valendo para o processo
+    metricas = Metricas()
+    scheduler = RequestScheduler(cotas_por_minuto=_cotas_processo or API_QUOTAS_PER_MINUTE,
+                                 max_tentativas=MAX_RETRIES, atraso_base=DELAY_BETWEEN_REQUESTS, metricas=metricas)
+    try:
+        caminho_sync, caminho_mtd = _caminhos_estado(alvo['nome'])
+        extractor = SEODataExtractor(scheduler=scheduler, metricas=metricas, spreadsheet_url=alvo['spreadsheet_url'],
+                                     aba=alvo['aba'], mtd_state_path=caminho_mtd)
+        # As métricas de cada alvo vão para o relatório consolidado, não para METRICS_JSON_PATH
+        extractor.metricas_json_path = extractor.metricas_prometheus_path = None
+        resultado = extractor.sincronizar_incremental(SyncState(caminho_sync), forcar=forcar, max_workers=max_workers,
+                                                      mes_corrente=mes_corrente)
+        if 'error' in resultado:
+            relatorio['erro'] = resultado['error']
+        else:
+            mtd = resultado.get('month_to_date') or {}
+            relatorio['processed_months'] = resultado.get('processed_months', 0)
+            relatorio['failed_months'] = resultado.get('failed_months', 0)
+            relatorio['mtd_celulas'] = mtd.get('celulas', 0)
+            relatorio['falhas'] = {domain: rel['failed'] for domain, rel in (resultado.get('domains') or {}).items()
+                                   if rel['failed']}
+            for domain, rel in (mtd.get('dominios') or {}).items():
+                for fonte, erro in rel['falhas'].items():
+                    relatorio['falhas'].setdefault(domain, {})[f"{mtd['rotulo']} ({fonte.upper()}, provisório)"] = erro
+            if resultado.get('skipped'):
+                relatorio['status'] = 'pulado'
+            elif relatorio['failed_months'] or mtd.get('falhas'):
+                relatorio['status'] = 'falhas'
+            else:
+                relatorio['status'] = 'ok'
+    except Exception as e:
+        relatorio['erro'] = str(e)
+    relatorio['chamadas'] = _chamadas_por_api(metricas)
+    relatorio['duracao'] = round(time.perf_counter() - inicio, 2)
+    return relatorio
+
+
+def _preparar_credenciais_ga4():
+    """Com OAuth no GA4, autentica/renova o token uma vez antes de iniciar os processos: eles
+    leem o token_ga4.json já válido, sem abrir o navegador nem renovar ao mesmo tempo.
+    """
+    if not os.path.exists('oauth_credentials.json'):
+        return
+    try:
+        SEODataExtractor().configurar_oauth_ga4()
+    except Exception as e:
+        print(f"⚠️  Não foi possível preparar o OAuth do GA4: {e}")
+
+
+def sincronizar_frota(alvos, max_processos=None, forcar=False, mes_corrente=None, max_workers=None,
+                      caminho_relatorio=FLEET_REPORT_PATH):
+    """Sincroniza todos os alvos (já validados por validar_alvos) em paralelo, um processo por
+    alvo até `max_processos`. Retorna o relatório consolidado.
+    """
+    inicio = time.perf_counter()
+    os.makedirs(FLEET_STATE_DIR, exist_ok=True)
+    processos = max(1, min(max_processos or FLEET_MAX_WORKERS, len(alvos)))
+    cotas = {api: max(1, cota // processos) for api, cota in API_QUOTAS_PER_MINUTE.items() if cota}
+    print(f"🚚 Frota: {len(alvos)} planilha(s) em {processos} processo(s)")
+    _preparar_credenciais_ga4()
+
+    relatorios = {}
+    if processos <= 1:
+        _iniciar_processo(cotas)
+        for alvo in alvos:
+            relatorios[alvo['nome']] = sincronizar_alvo(alvo, forcar, mes_corrente, max_workers)
+    else:
+        # spawn: os processos não herdam o estado das bibliotecas gRPC/HTTP do processo pai
+        with ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_iniciar_processo, initargs=(cotas,)) as pool:
+            futuros = {pool.submit(sincronizar_alvo, alvo, forcar, mes_corrente, max_workers): alvo
+                       for alvo in alvos}
+            for futuro in as_completed(futuros):
+                alvo = futuros[futuro]
+                try:
+                    relatorios[alvo['nome']] = futuro.result()
+                except Exception as e:  # processo encerrado de forma anormal
+                    relatorios[alvo['nome']] = {**_relatorio_vazio(alvo), 'erro': str(e)}
+                print(f"   {_ICONES[relatorios[alvo['nome']]['status']]} {alvo['nome']} concluído")
+
+    consolidado = {
+        'gerado_em': time.time(),
+        'duracao': round(time.perf_counter() - inicio, 2),
+        'processos': processos,
+        'alvos': [relatorios[alvo['nome']] for alvo in alvos],
+    }
+    consolidado['totais'] = {
+        'alvos': len(alvos),
+        'por_status': {status: sum(1 for r in consolidado['alvos'] if r['status'] == status) for status in _ICONES},
+        'processed_months': sum(r['processed_months'] for r in consolidado['alvos']),
+        'failed_months': sum(r['failed_months'] for r in consolidado['alvos']),
+        'mtd_celulas': sum(r['mtd_celulas'] for r in consolidado['alvos']),
+        'chamadas': {},
+    }
+    for r in consolidado['alvos']:
+        for api, n in r['chamadas'].items():
+            consolidado['totais']['chamadas'][api] = consolidado['totais']['chamadas'].get(api, 0) + n
+
+    if caminho_relatorio:
+        try:
+            tmp = f"{caminho_relatorio}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(consolidado, f, indent=2, ensure_ascii=False)
+            os.replace(tmp, caminho_relatorio)
+        except Exception as e:
+            print(f"⚠️  Não foi possível gravar o relatório da frota: {e}")
+    return consolidado
+
+
+def imprimir_relatorio_frota(consolidado):
+    print(f"\n📋 Frota: {consolidado['totais']['alvos']} planilha(s) em {consolidado['duracao']}s "
+          f"({consolidado['processos']} processo(s))")
+    for r in consolidado['alvos']:
+        detalhe = r['erro'] if r['status'] == 'erro' else (
+            f"{r['processed_months']} mês(es) preenchido(s), {r['failed_months']} falha(s)"
+            + (f", {r['mtd_celulas']} célula(s) provisória(s)" if r['mtd_celulas'] else ''))
+        print(f"   {_ICONES[r['status']]} {r['nome']} [{r['aba']}]: {detalhe} ({r['duracao']}s)")
+        for domain, meses in r['falhas'].items():
+            for rotulo, erro in meses.items():
+                print(f"      - {domain} {rotulo}: {erro}")
+    totais = consolidado['totais']
+    chamadas = ', '.join(f"{api}: {n}" for api, n in sorted(totais['chamadas'].items())) or 'nenhuma'
+    print(f"📊 Total: {totais['processed_months']} mês(es) preenchido(s), {totais['failed_months']} falha(s); "
+          f"chamadas às APIs: {chamadas}")
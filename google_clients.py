@@ -0,0 +1,117 @@
+"""Pool de clientes das APIs Google (Sheets, Search Console e GA4), reutilizado pelo processo.
+
+O credentials.json é lido uma única vez; cada cliente é criado na primeira vez em que é
+pedido e reaproveitado depois. O serviço do Search Console usa o documento de discovery
+embutido na biblioteca (sem download em tempo de execução) e, como o httplib2 não é
+thread-safe, é mantido um por thread. O cliente gRPC do GA4 é thread-safe e compartilhado.
+Com `timeout`, as conexões HTTP do Sheets e do Search Console desistem após esse tempo (s).
+As bibliotecas de cada API (gspread, googleapiclient, gRPC do GA4) só são importadas quando o
+respectivo cliente é pedido pela primeira vez, para que o programa inicie rápido.
+"""
+import json
+import threading
+
+SCOPES = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/drive",
+    "https://www.googleapis.com/auth/webmasters.readonly",
+    "https://www.googleapis.com/auth/analytics.readonly"
+]
+SCOPE_SEARCH_CONSOLE = 'https://www.googleapis.com/auth/webmasters.readonly'
+SCOPE_GA4 = 'https://www.googleapis.com/auth/analytics.readonly'
+
+
+class GoogleClientPool:
+    def __init__(self, credentials_file='credentials.json', timeout=None):
+        self.credentials_file = credentials_file
+        self.timeout = timeout
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._info = None
+        self._credenciais = {}
+        self._gspread = None
+        self._ga4 = {}
+
+    def info_credenciais(self):
+        """Conteúdo do credentials.json, lido uma única vez."""
+        with self._lock:
+            if self._info is None:
+                with open(self.credentials_file, encoding='utf-8') as f:
+                    self._info = json.load(f)
+            return self._info
+
+    def credenciais(self, *scopes):
+        """Credenciais da service account (google-auth) para os escopos pedidos."""
+        chave = tuple(scopes)
+        with self._lock:
+            if chave not in self._credenciais:
+                from google.oauth2 import service_account
+                self._credenciais[chave] = service_account.Credentials.from_service_account_info(
+                    self.info_credenciais(), scopes=list(scopes))
+            return self._credenciais[chave]
+
+    def gspread(self):
+        """Cliente gspread autorizado (sessão HTTP reaproveitada entre chamadas)."""
+        with self._lock:
+            if self._gspread is None:
+                import gspread
+                from oauth2client.service_account import ServiceAccountCredentials
+                creds = ServiceAccountCredentials.from_json_keyfile_dict(self.info_credenciais(), SCOPES)
+                self._gspread = gspread.authorize(creds)
+                if self.timeout:
+                    self._gspread.set_timeout(self.timeout)
+            return self._gspread
+
+    def search_console(self):
+        """Serviço do Search Console da thread atual, criado com o discovery embutido."""
+        service = getattr(self._local, 'search_console', None)
+        if service is None:
+            import httplib2
+            import google_auth_httplib2
+            from googleapiclient.discovery import build
+            http = google_auth_httplib2.AuthorizedHttp(self.credenciais(SCOPE_SEARCH_CONSOLE),
+                                                       http=httplib2.Http(timeout=self.timeout))
+            service = build('searchconsole', 'v1', http=http, static_discovery=True, cache_discovery=False)
+            self._local.search_console = service
+        return service
+
+    def ga4(self, credentials=None):
+        """Cliente do GA4 (um canal gRPC por conjunto de credenciais)."""
+        if credentials is None:
+            credentials = self.credenciais(SCOPE_GA4)
+        with self._lock:
+            entrada = self._ga4.get(id(credentials))
+            if entrada is None:
+                from google.analytics.data_v1beta import BetaAnalyticsDataClient
+                # Guarda as credenciais junto para que o id() não seja reaproveitado
+                entrada = (BetaAnalyticsDataClient(credentials=credentials), credentials)
+                self._ga4[id(credentials)] = entrada
+            return entrada[0]
+
+    def requisicao_ga4(self, property_id, dimensao, start_date, end_date, limite, offset=0):
+        """RunReportRequest das sessões por `dimensao` no período (tipos da biblioteca do GA4,
+        importados só aqui para que quem substitui o pool não precise dela).
+        """
+        from google.analytics.data_v1beta.types import RunReportRequest, DateRange, Dimension, Metric
+        return RunReportRequest(
+            property=f"properties/{property_id}",
+            date_ranges=[DateRange(start_date=start_date, end_date=end_date)],
+            dimensions=[Dimension(name=dimensao)],
+            metrics=[
+                Metric(name="sessions")
+            ],
+            limit=limite,
+            offset=offset
+        )
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def obter_pool(credentials_file='credentials.json', timeout=None):
+    """Retorna o pool de clientes do processo para o arquivo de credenciais."""
+    with _pools_lock:
+        if credentials_file not in _pools:
+            _pools[credentials_file] = GoogleClientPool(credentials_file, timeout=timeout)
+        return _pools[credentials_file]
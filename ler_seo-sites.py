@@ -1,7 +1,21 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from api_extractor import SEODataExtractor
+import argparse
+import os
+import sys
+
+# Só módulos leves aqui: as bibliotecas das APIs Google são importadas na primeira chamada
+from api_extractor import SEODataExtractor, SYNC_STATE_PATH, validar_configuracao
+from sync_state import SyncState
+
+# Módulos que não devem ser carregados na inicialização (--profile-imports acusa se forem)
+MODULOS_PESADOS = ('gspread', 'googleapiclient', 'google.analytics', 'grpc', 'oauth2client', 'pandas', 'numpy')
+
+# Códigos de saída do modo sem menu
+EXIT_OK = 0        # sincronizado ou nada a fazer
+EXIT_FALHAS = 1    # algum mês falhou (será repetido na próxima execução)
+EXIT_ERRO = 2      # erro geral (credenciais, planilha inacessível, ...)
 
 
 def print_header():
@@ -14,6 +28,32 @@ def opcao_1_sync_pendentes(extractor: SEODataExtractor):
     print("\n🚀 Sincronizando meses pendentes na aba SEO SITES...")
     resultado = extractor.preencher_meses_pendentes_vertical()
     print(f"\n✅ Concluído. Meses processados: {resultado.get('processed_months', 0)}")
+    imprimir_relatorio_dominios(resultado)
+    imprimir_relatorio_mes_corrente(resultado)
+
+
+def imprimir_relatorio_dominios(resultado):
+    dominios = resultado.get('domains') or {}
+    if not dominios:
+        return
+    print("\n📋 Resultado por domínio:")
+    for dominio, rel in dominios.items():
+        ok = len(rel['processed'])
+        falhas = rel['failed']
+        status = '✅' if not falhas else '❌'
+        print(f"   {status} {dominio}: {ok} mês(es) preenchido(s), {len(falhas)} falha(s)")
+        for rotulo, erro in falhas.items():
+            print(f"      - {rotulo}: {erro}")
+
+
+def imprimir_relatorio_mes_corrente(resultado):
+    mtd = resultado.get('month_to_date')
+    if not mtd:
+        return
+    print(f"\n🗓️  Mês corrente {mtd['rotulo']} (dados até {mtd['ate']}): {mtd['celulas']} célula(s) provisória(s)")
+    for dominio, rel in mtd['dominios'].items():
+        for fonte, erro in rel['falhas'].items():
+            print(f"   ❌ {dominio} ({fonte.upper()}): {erro}")
 
 
 def opcao_2_preencher_mes(extractor: SEODataExtractor):
@@ -42,7 +82,7 @@ def opcao_2_preencher_mes(extractor: SEODataExtractor):
     inicio = datetime.date(ano, mes_num, 1)
     print(f"\n📅 Período: {inicio} a {fim_mes}")
 
-    dados_gsc = extractor.extrair_dados_search_console(inicio.strftime('%Y-%m-%d'), fim_mes.strftime('%Y-%m-%d'))
+    dados_gsc = extractor.extrair_totais_search_console(inicio.strftime('%Y-%m-%d'), fim_mes.strftime('%Y-%m-%d'))
     dados_ga4 = extractor.extrair_dados_ga4(inicio.strftime('%Y-%m-%d'), fim_mes.strftime('%Y-%m-%d'))
     extractor.atualizar_sheet113_vertical(dados_gsc, dados_ga4, rotulo)
 
@@ -50,15 +90,208 @@ def opcao_2_preencher_mes(extractor: SEODataExtractor):
 def opcao_3_testar_conexoes(extractor: SEODataExtractor):
     print("\n🧪 Testando conexões...")
     try:
-        # Jan 2025 semana 1 como quick check
-        gsc = extractor.extrair_dados_search_console('2025-01-01', '2025-01-07')
-        ga4 = extractor.extrair_dados_ga4('2025-01-01', '2025-01-07')
-        print(f"   ✅ GSC OK ({len(gsc)} registros) | GA4 OK ({len(ga4)} registros)")
+        # Jan 2025 semana 1 como quick check (uma consulta de uma linha por API)
+        teste = extractor.testar_conexoes('2025-01-01', '2025-01-07')
+        print(f"   ✅ GSC OK ({teste['gsc']} registros) | GA4 OK ({teste['ga4']} registros)")
     except Exception as e:
         print(f"   ❌ Falha nos testes: {e}")
 
 
-def main():
+def opcao_4_limpar_cache(extractor: SEODataExtractor):
+    mes = input("Mês a invalidar (ex: 2025-03, vazio = todos): ").strip()
+    alvo = input("Domínio ou propriedade GA4 (vazio = todos): ").strip()
+    extractor.invalidar_cache(alvo=alvo or None, mes=mes or None)
+
+
+def opcao_5_ranking(extractor: SEODataExtractor):
+    meses = input("Meses (ex: mar-25 abr-25; vazio = último mês encerrado): ").split()
+    imprimir_relatorio_ranking(extractor.gerar_ranking(meses or None))
+
+
+def imprimir_relatorio_ranking(resultado):
+    print(f"\n🏆 Ranking: {resultado.get('pares', 0)} par(es) domínio/mês, {resultado.get('linhas', 0)} linha(s)")
+    for par, erro in (resultado.get('failed') or {}).items():
+        print(f"   ❌ {par}: {erro}")
+
+
+def checar_configuracao(mostrar_ok=True) -> bool:
+    erros, avisos = validar_configuracao()
+    for aviso in avisos:
+        print(f"⚠️  {aviso}")
+    for erro in erros:
+        print(f"❌ {erro}")
+    if not erros and mostrar_ok:
+        print("✅ Configuração válida")
+    return not erros
+
+
+def executar_dry_run(args) -> int:
+    """Mostra o que a sincronização faria, sem consultar o GSC/GA4 nem gravar nada."""
+    if not checar_configuracao(mostrar_ok=False):
+        return EXIT_ERRO
+    try:
+        extractor = SEODataExtractor(somente_leitura=True)
+        if args.sync:
+            motivo, _, _ = extractor.motivo_sincronizacao(SyncState(args.state_file), args.force,
+                                                          args.month_to_date or None)
+            if motivo is None:
+                print("✅ --sync não faria nada: planilha sem alterações e nenhum mês novo encerrado.")
+                return EXIT_OK
+            print(f"🔄 --sync executaria ({motivo})")
+        plano = extractor.planejar_sincronizacao(mes_corrente=args.month_to_date or None)
+    except Exception as e:
+        print(f"❌ Erro ao planejar a sincronização: {e}")
+        return EXIT_ERRO
+
+    print(f"\n📋 {plano['units']} mês(es) pendente(s) em {len(plano['domains'])} domínio(s):")
+    for dominio, meses in plano['domains'].items():
+        print(f"   - {dominio}: {', '.join(meses)}")
+    if 'month_to_date' in plano:
+        print(f"🗓️  Mês corrente: dias novos a somar em {len(plano['month_to_date'])} domínio(s)")
+        for dominio, periodos in plano['month_to_date'].items():
+            dias = ', '.join(f"{fonte.upper()} {inicio} a {fim}" for fonte, (inicio, fim) in periodos.items())
+            print(f"   - {dominio}: {dias}")
+    print(f"📞 Consultas estimadas: {plano['gsc_calls']} ao Search Console, {plano['ga4_calls']} ao GA4 "
+          f"(meses em cache descontados)")
+    return EXIT_OK
+
+
+def perfilar_imports(limite=15) -> int:
+    """Mede a importação do programa com `python -X importtime` e lista os módulos mais lentos.
+    Retorna 1 se algum módulo pesado das APIs for carregado já na inicialização.
+    """
+    import subprocess
+    processo = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import api_extractor, sync_state'],
+                              capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    modulos = []
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith('import time:') or 'self [us]' in linha:
+            continue
+        _, acumulado, nome = linha.split('|')
+        modulos.append((int(acumulado), nome.strip()))
+    total = sum(us for us, nome in modulos if nome in ('api_extractor', 'sync_state'))
+    print(f"⏱️  Importação na inicialização: {total / 1000:.1f} ms")
+    for us, nome in sorted(modulos, reverse=True)[:limite]:
+        print(f"   {us / 1000:8.1f} ms  {nome}")
+    pesados = sorted({nome for _, nome in modulos if nome.startswith(MODULOS_PESADOS)})
+    if pesados:
+        print(f"❌ Módulos pesados carregados na inicialização: {', '.join(pesados)}")
+        return 1
+    return 0
+
+
+def executar_sync_headless(args) -> int:
+    """Sincronização incremental sem interação, para cron/systemd. Retorna o código de saída."""
+    if not checar_configuracao(mostrar_ok=False):
+        return EXIT_ERRO
+    try:
+        extractor = SEODataExtractor()
+        estado = SyncState(args.state_file)
+        resultado = extractor.sincronizar_incremental(estado, forcar=args.force, max_workers=args.workers,
+                                                      mes_corrente=args.month_to_date or None)
+    except Exception as e:
+        print(f"❌ Erro na sincronização: {e}")
+        return EXIT_ERRO
+
+    if 'error' in resultado:
+        return EXIT_ERRO
+    if not resultado.get('skipped'):
+        print(f"\n✅ Concluído. Meses processados: {resultado.get('processed_months', 0)}")
+        imprimir_relatorio_dominios(resultado)
+        imprimir_relatorio_mes_corrente(resultado)
+    falhas_mtd = (resultado.get('month_to_date') or {}).get('falhas')
+    return EXIT_FALHAS if resultado.get('failed_months') or falhas_mtd else EXIT_OK
+
+
+def executar_frota(args) -> int:
+    """Sincroniza todas as planilhas de FLEET_TARGETS em paralelo (um processo por planilha)."""
+    if not checar_configuracao(mostrar_ok=False):
+        return EXIT_ERRO
+    from fleet_sync import FLEET_TARGETS, validar_alvos, sincronizar_frota, imprimir_relatorio_frota
+    alvos, erros = validar_alvos(FLEET_TARGETS)
+    for erro in erros:
+        print(f"❌ {erro}")
+    if erros:
+        return EXIT_ERRO
+    try:
+        consolidado = sincronizar_frota(alvos, max_processos=args.fleet_processes, forcar=args.force,
+                                        mes_corrente=args.month_to_date or None, max_workers=args.workers)
+    except Exception as e:
+        print(f"❌ Erro na sincronização da frota: {e}")
+        return EXIT_ERRO
+
+    imprimir_relatorio_frota(consolidado)
+    por_status = consolidado['totais']['por_status']
+    if por_status['erro'] == len(alvos):
+        return EXIT_ERRO
+    return EXIT_FALHAS if por_status['erro'] or por_status['falhas'] else EXIT_OK
+
+
+def executar_ranking(args) -> int:
+    """Gera a aba de ranking (top-N consultas e páginas) sem menu."""
+    if not checar_configuracao(mostrar_ok=False):
+        return EXIT_ERRO
+    try:
+        resultado = SEODataExtractor().gerar_ranking(args.ranking or None, max_workers=args.workers)
+    except Exception as e:
+        print(f"❌ Erro ao gerar o ranking: {e}")
+        return EXIT_ERRO
+    imprimir_relatorio_ranking(resultado)
+    if 'error' in resultado:
+        return EXIT_ERRO
+    return EXIT_FALHAS if resultado.get('failed') else EXIT_OK
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="SEO Sites: preenche a aba SEO SITES com dados do Search Console e do GA4. "
+                    "Sem argumentos, abre o menu interativo."
+    )
+    parser.add_argument('--sync', action='store_true',
+                        help="sincronização incremental sem menu (cron/systemd); "
+                             f"saída {EXIT_OK}=ok, {EXIT_FALHAS}=meses com falha, {EXIT_ERRO}=erro")
+    parser.add_argument('--force', action='store_true',
+                        help="com --sync, varre a planilha mesmo sem alterações desde a última execução")
+    parser.add_argument('--state-file', default=SYNC_STATE_PATH,
+                        help=f"arquivo de estado da sincronização (padrão: {SYNC_STATE_PATH})")
+    parser.add_argument('--month-to-date', action='store_true',
+                        help="preenche também o mês corrente com valores provisórios, somando só os dias "
+                             "novos (padrão: MONTH_TO_DATE_ENABLED do config)")
+    parser.add_argument('--ranking', nargs='*', metavar='MES', default=None,
+                        help="grava o top-N de consultas e páginas (por cliques e impressões) de cada domínio "
+                             "na aba ABA_RANKING; meses como mar-25 (padrão: o último mês encerrado)")
+    parser.add_argument('--fleet', action='store_true',
+                        help="sincroniza todas as planilhas de FLEET_TARGETS em paralelo, com relatório "
+                             "consolidado (aceita --force, --month-to-date e --workers)")
+    parser.add_argument('--fleet-processes', type=int, default=None,
+                        help="com --fleet, planilhas sincronizadas ao mesmo tempo (padrão: FLEET_MAX_WORKERS)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="extrações em paralelo (padrão: SYNC_MAX_WORKERS do config)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="mostra os meses pendentes e as consultas estimadas, sem consultar GSC/GA4 "
+                             "nem gravar (com --sync, indica também se a execução seria pulada)")
+    parser.add_argument('--check-config', action='store_true',
+                        help="valida o config.py e as credenciais sem acessar as APIs")
+    parser.add_argument('--profile-imports', action='store_true',
+                        help="mede o tempo de importação na inicialização (python -X importtime)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.profile_imports:
+        sys.exit(perfilar_imports())
+    if args.check_config:
+        sys.exit(EXIT_OK if checar_configuracao() else EXIT_ERRO)
+    if args.dry_run:
+        sys.exit(executar_dry_run(args))
+    if args.fleet:
+        sys.exit(executar_frota(args))
+    if args.ranking is not None:
+        sys.exit(executar_ranking(args))
+    if args.sync:
+        sys.exit(executar_sync_headless(args))
+
     extractor = SEODataExtractor()
 
     while True:
@@ -66,9 +299,11 @@ def main():
         print("1 - Sincronizar meses pendentes na SEO SITES")
         print("2 - Preencher um mês específico na SEO SITES")
         print("3 - Testar conexões (GSC + GA4)")
-        print("4 - Sair")
+        print("4 - Limpar cache local (GSC + GA4)")
+        print("5 - Gerar ranking de consultas e páginas (top-N)")
+        print("6 - Sair")
 
-        opcao = input("\nEscolha (1-4): ").strip()
+        opcao = input("\nEscolha (1-6): ").strip()
 
         if opcao == '1':
             opcao_1_sync_pendentes(extractor)
@@ -77,10 +312,14 @@ def main():
         elif opcao == '3':
             opcao_3_testar_conexoes(extractor)
         elif opcao == '4':
+            opcao_4_limpar_cache(extractor)
+        elif opcao == '5':
+            opcao_5_ranking(extractor)
+        elif opcao == '6':
             print("👋 Saindo...")
             break
         else:
-            print("❌ Opção inválida. Escolha 1 a 4.")
+            print("❌ Opção inválida. Escolha 1 a 6.")
 
 
 if __name__ == "__main__":
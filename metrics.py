@@ -0,0 +1,207 @@
+"""Métricas da execução: chamadas às APIs, latências, novas tentativas, linhas e bytes.
+
+Contadores e histogramas ficam em memória (thread-safe, acumulados no processo) e, ao fim de
+cada sincronização, são exportados como um resumo JSON e/ou como um textfile do Prometheus
+(para o textfile collector do node_exporter). As duas gravações são atômicas (tmp + replace),
+então o coletor nunca lê um arquivo pela metade.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIXO = 'seo_sites'
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+DESCRICOES = {
+    'api_chamadas_total': 'Chamadas às APIs Google por API, operação e resultado',
+    'api_tentativas_repetidas_total': 'Novas tentativas após erros transitórios (429/5xx/timeouts)',
+    'api_latencia_segundos': 'Latência de cada chamada às APIs Google',
+    'api_bytes_total': 'Bytes transferidos (estimados pelo tamanho serializado)',
+    'api_lote_consultas_total': 'Consultas enviadas dentro de lotes HTTP (BatchHttpRequest)',
+    'linhas_total': 'Linhas recebidas das APIs e lidas da planilha',
+    'planilha_celulas_lidas_total': 'Células lidas da aba na sincronização',
+    'fase_segundos': 'Duração de cada fase da sincronização',
+    'meses_total': 'Pares (domínio, mês) processados por resultado',
+    'cache_layout_total': 'Consultas ao mapa de blocos da planilha (hit/miss)',
+    'armazem_linhas_total': 'Linhas gravadas no armazém colunar local (Parquet)',
+    'ultima_sincronizacao_timestamp_segundos': 'Momento (epoch) do fim da última sincronização',
+    'ultima_sincronizacao_duracao_segundos': 'Duração da última sincronização',
+}
+
+
+def tamanho_aproximado(valor):
+    """Bytes de uma resposta/corpo: protobuf (GA4), JSON (GSC, Sheets) ou grade de células."""
+    if valor is None:
+        return 0
+    pb = getattr(type(valor), 'pb', None)
+    if pb is not None:
+        try:
+            return pb(valor).ByteSize()
+        except Exception:
+            return 0
+    if isinstance(valor, list) and valor and isinstance(valor[0], list):
+        return sum(len(celula) for linha in valor for celula in linha if isinstance(celula, str))
+    if isinstance(valor, (dict, list)):
+        try:
+            return len(json.dumps(valor, ensure_ascii=False, default=str))
+        except (TypeError, ValueError):
+            return 0
+    return 0
+
+
+class Histograma:
+    __slots__ = ('limites', 'contagens', 'soma', 'total')
+
+    def __init__(self, limites=LIMITES_LATENCIA):
+        self.limites = limites
+        self.contagens = [0] * len(limites)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        for i, limite in enumerate(self.limites):
+            if valor <= limite:
+                self.contagens[i] += 1
+                break
+        self.soma += valor
+        self.total += 1
+
+    def acumulado(self):
+        """Contagens cumulativas por limite (formato `le` do Prometheus)."""
+        acumulado = []
+        corrente = 0
+        for contagem in self.contagens:
+            corrente += contagem
+            acumulado.append(corrente)
+        return acumulado
+
+
+class Metricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contadores = {}   # (nome, rótulos) -> valor
+        self._histogramas = {}  # (nome, rótulos) -> Histograma
+        self._medidores = {}    # (nome, rótulos) -> valor
+
+    @staticmethod
+    def _chave(nome, rotulos):
+        return nome, tuple(sorted((k, str(v)) for k, v in rotulos.items()))
+
+    def contar(self, nome, valor=1, **rotulos):
+        chave = self._chave(nome, rotulos)
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def observar(self, nome, valor, **rotulos):
+        chave = self._chave(nome, rotulos)
+        with self._lock:
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = Histograma()
+            histograma.observar(valor)
+
+    def definir(self, nome, valor, **rotulos):
+        with self._lock:
+            self._medidores[self._chave(nome, rotulos)] = valor
+
+    @contextmanager
+    def medir(self, fase):
+        """Registra a duração do bloco no histograma `fase_segundos`."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar('fase_segundos', time.perf_counter() - inicio, fase=fase)
+
+    def registrar_chamada(self, api, operacao, duracao, resultado, bytes_recebidos=0, bytes_enviados=0):
+        """Usado pelo agendador a cada tentativa de chamada às APIs."""
+        self.contar('api_chamadas_total', api=api, operacao=operacao, resultado=resultado)
+        self.observar('api_latencia_segundos', duracao, api=api, operacao=operacao)
+        if bytes_recebidos:
+            self.contar('api_bytes_total', bytes_recebidos, api=api, direcao='recebidos')
+        if bytes_enviados:
+            self.contar('api_bytes_total', bytes_enviados, api=api, direcao='enviados')
+
+    def resumo(self):
+        """Snapshot serializável: contadores, medidores e histogramas (contagem, soma, média)."""
+        with self._lock:
+            def serializar(itens, conversao):
+                return [{'nome': nome, 'rotulos': dict(rotulos), **conversao(valor)}
+                        for (nome, rotulos), valor in sorted(itens)]
+            return {
+                'gerado_em': time.time(),
+                'contadores': serializar(self._contadores.items(), lambda v: {'valor': v}),
+                'medidores': serializar(self._medidores.items(), lambda v: {'valor': v}),
+                'histogramas': serializar(self._histogramas.items(), lambda h: {
+                    'contagem': h.total, 'soma': round(h.soma, 6),
+                    'media': round(h.soma / h.total, 6) if h.total else 0.0,
+                }),
+            }
+
+    def texto_prometheus(self):
+        """Métricas no formato de exposição de texto do Prometheus."""
+        def rotulos_texto(rotulos, extra=()):
+            pares = list(rotulos) + list(extra)
+            if not pares:
+                return ''
+            return '{' + ','.join(f'{k}="{_escapar(v)}"' for k, v in pares) + '}'
+
+        linhas = []
+        with self._lock:
+            for tipo, itens in (('counter', self._contadores), ('gauge', self._medidores)):
+                for nome in sorted({n for n, _ in itens}):
+                    completo = f"{PREFIXO}_{nome}"
+                    linhas.append(f"# HELP {completo} {DESCRICOES.get(nome, nome)}")
+                    linhas.append(f"# TYPE {completo} {tipo}")
+                    for (n, rotulos), valor in sorted(itens.items()):
+                        if n == nome:
+                            linhas.append(f"{completo}{rotulos_texto(rotulos)} {valor}")
+            for nome in sorted({n for n, _ in self._histogramas}):
+                completo = f"{PREFIXO}_{nome}"
+                linhas.append(f"# HELP {completo} {DESCRICOES.get(nome, nome)}")
+                linhas.append(f"# TYPE {completo} histogram")
+                for (n, rotulos), h in sorted(self._histogramas.items()):
+                    if n != nome:
+                        continue
+                    for limite, acumulado in zip(h.limites, h.acumulado()):
+                        linhas.append(f"{completo}_bucket{rotulos_texto(rotulos, [('le', limite)])} {acumulado}")
+                    linhas.append(f"{completo}_bucket{rotulos_texto(rotulos, [('le', '+Inf')])} {h.total}")
+                    linhas.append(f"{completo}_sum{rotulos_texto(rotulos)} {h.soma}")
+                    linhas.append(f"{completo}_count{rotulos_texto(rotulos)} {h.total}")
+        return '\n'.join(linhas) + '\n'
+
+    def exportar(self, caminho_json=None, caminho_prometheus=None):
+        """Grava o resumo JSON e/ou o textfile do Prometheus (cada um de forma atômica)."""
+        if caminho_json:
+            _gravar_atomico(caminho_json, json.dumps(self.resumo(), indent=2, ensure_ascii=False))
+        if caminho_prometheus:
+            _gravar_atomico(caminho_prometheus, self.texto_prometheus())
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _gravar_atomico(caminho, conteudo):
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    tmp = f"{caminho}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(conteudo)
+    os.replace(tmp, caminho)
+
+
+_metricas = None
+_metricas_lock = threading.Lock()
+
+
+def obter_metricas():
+    """Métricas compartilhadas pelo processo."""
+    global _metricas
+    with _metricas_lock:
+        if _metricas is None:
+            _metricas = Metricas()
+        return _metricas
@@ -0,0 +1,119 @@
+"""Estado do modo mês corrente (month-to-date): totais parciais do mês em andamento.
+
+Para cada domínio e mês guarda, por fonte (GSC e GA4), o último dia já somado e os totais
+acumulados até ele; cada execução consulta só os dias novos e soma aos totais. Também guarda
+os valores provisórios gravados em cada célula da planilha: uma célula só é sobrescrita se
+ainda tiver o valor que nós gravamos (edições manuais são preservadas). Quando o mês encerra,
+as células provisórias são liberadas para a sincronização normal gravar os valores finais.
+"""
+import datetime
+import json
+import os
+import time
+
+from aggregation import metricas_gsc
+
+FONTES = {
+    'gsc': {'ate': None, 'impressions': 0, 'clicks': 0, 'pos_ponderada': 0.0},
+    'ga4': {'ate': None, 'sessions': 0},
+}
+
+
+def mesmo_valor(celula, valor):
+    """Compara o texto de uma célula com um valor numérico gravado (aceita vírgula decimal)."""
+    texto = str(celula).strip()
+    try:
+        return abs(float(texto.replace(',', '.')) - float(valor)) < 0.005
+    except (TypeError, ValueError):
+        return texto == str(valor)
+
+
+class MonthToDateState:
+    def __init__(self, caminho='mtd_state.json'):
+        self.caminho = caminho
+        self.alvo = None   # último dia (AAAA-MM-DD) considerado numa execução sem falhas
+        self.meses = {}    # domínio -> {rótulo: {'gsc': {...}, 'ga4': {...}, 'celulas': {coluna: valor}}}
+        self._carregar()
+
+    def _carregar(self):
+        if not os.path.exists(self.caminho):
+            return
+        try:
+            with open(self.caminho, encoding='utf-8') as f:
+                dados = json.load(f)
+            self.alvo = dados.get('alvo')
+            self.meses = dados.get('meses') or {}
+        except Exception as e:
+            print(f"⚠️  Estado do mês corrente ignorado ({self.caminho}): {e}")
+
+    def salvar(self):
+        dados = {'alvo': self.alvo, 'meses': self.meses, 'atualizado_em': time.time()}
+        tmp = f"{self.caminho}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.caminho)
+
+    def _entrada(self, domain, rotulo):
+        entrada = self.meses.setdefault(domain, {}).setdefault(rotulo, {'celulas': {}})
+        for fonte, padrao in FONTES.items():
+            entrada.setdefault(fonte, dict(padrao))
+        return entrada
+
+    def proximo_dia(self, domain, rotulo, fonte, inicio_mes):
+        """Primeiro dia ainda não somado da fonte (o início do mês na primeira execução)."""
+        ate = self.meses.get(domain, {}).get(rotulo, {}).get(fonte, {}).get('ate')
+        if ate is None:
+            return inicio_mes
+        return (datetime.date.fromisoformat(ate) + datetime.timedelta(days=1)).isoformat()
+
+    def acumular(self, domain, rotulo, fonte, ate, **somas):
+        """Soma os valores dos dias novos aos totais da fonte e avança o último dia somado."""
+        totais = self._entrada(domain, rotulo)[fonte]
+        for campo, valor in somas.items():
+            totais[campo] += valor
+        totais['ate'] = ate
+
+    def totais(self, domain, rotulo):
+        """{'gsc': (impressões, cliques, CTR %, posição) ou None, 'ga4': sessões ou None}, com None
+        para as fontes ainda sem nenhum dia somado.
+        """
+        entrada = self._entrada(domain, rotulo)
+        gsc, ga4 = entrada['gsc'], entrada['ga4']
+        return {
+            'gsc': metricas_gsc(gsc['impressions'], gsc['clicks'], gsc['pos_ponderada']) if gsc['ate'] else None,
+            'ga4': int(ga4['sessions']) if ga4['ate'] else None,
+        }
+
+    def provisorio(self, domain, rotulo, coluna, celula):
+        """True se a célula ainda tem o valor provisório que gravamos nela."""
+        gravado = self.meses.get(domain, {}).get(rotulo, {}).get('celulas', {}).get(str(coluna))
+        return gravado is not None and mesmo_valor(celula, gravado)
+
+    def celulas(self, domain, rotulo):
+        """{coluna (0-based): valor provisório gravado}."""
+        gravadas = self.meses.get(domain, {}).get(rotulo, {}).get('celulas', {})
+        return {int(coluna): valor for coluna, valor in gravadas.items()}
+
+    def registrar_celulas(self, domain, rotulo, valores):
+        self._entrada(domain, rotulo)['celulas'].update({str(coluna): valor for coluna, valor in valores.items()})
+
+    def meses_encerrados(self, rotulo_corrente):
+        """Pares (domínio, rótulo) com valores provisórios de meses que já terminaram."""
+        return [(domain, rotulo) for domain, meses in self.meses.items() for rotulo in meses
+                if rotulo != rotulo_corrente]
+
+    def remover(self, domain, rotulo):
+        meses = self.meses.get(domain, {})
+        meses.pop(rotulo, None)
+        if not meses:
+            self.meses.pop(domain, None)
+
+    def motivo_para_sincronizar(self, rotulo_corrente, inicio_mes, alvo):
+        """Motivo para uma execução agendada trabalhar no mês corrente, ou None. `alvo` é o
+        último dia com dados considerados estáveis (hoje menos a defasagem configurada).
+        """
+        if self.meses_encerrados(rotulo_corrente):
+            return "mês encerrado: valores provisórios a finalizar"
+        if alvo >= inicio_mes and alvo != self.alvo:
+            return f"mês corrente: dados disponíveis até {alvo}"
+        return None
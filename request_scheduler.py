@@ -0,0 +1,124 @@
+"""Agendador central das chamadas às APIs Google (Sheets, Search Console e GA4).
+
+Cada API tem seu próprio balde de tokens, dimensionado pela cota por minuto, de modo que
+as chamadas seguem no ritmo máximo permitido sem pausas fixas. Erros transitórios (429,
+5xx, timeouts e falhas de conexão) são repetidos com backoff exponencial com jitter; os
+demais são propagados na hora. Com `metricas`, cada tentativa registra latência, resultado e
+bytes transferidos.
+"""
+import random
+import socket
+import threading
+import time
+
+from metrics import tamanho_aproximado
+
+STATUS_REPETIVEIS = {408, 429, 500, 502, 503, 504}
+
+
+def status_http(erro):
+    """Status HTTP de um erro do googleapiclient, gspread ou google-api-core (None se não houver)."""
+    resp = getattr(erro, 'resp', None)  # googleapiclient.errors.HttpError
+    if resp is not None and getattr(resp, 'status', None):
+        return int(resp.status)
+    response = getattr(erro, 'response', None)  # gspread.exceptions.APIError
+    if response is not None and getattr(response, 'status_code', None):
+        return int(response.status_code)
+    code = getattr(erro, 'code', None)  # google.api_core.exceptions.GoogleAPICallError
+    if isinstance(code, int):
+        return code
+    return None
+
+
+def erro_repetivel(erro):
+    """True para erros transitórios: cota (429), 5xx, timeouts e falhas de conexão."""
+    if status_http(erro) in STATUS_REPETIVEIS:
+        return True
+    return isinstance(erro, (socket.timeout, TimeoutError, ConnectionError))
+
+
+class TokenBucket:
+    """Balde de tokens: até `por_minuto` chamadas por minuto, com rajada de até `capacidade`."""
+
+    def __init__(self, por_minuto, capacidade=None):
+        self.taxa = por_minuto / 60.0
+        self.capacidade = capacidade or max(1, por_minuto // 6)
+        self.tokens = float(self.capacidade)
+        self._atualizado = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self, n=1):
+        """Bloqueia só o tempo necessário até haver `n` tokens disponíveis. Um pedido maior que
+        a capacidade (ex: um lote HTTP) espera o balde encher e deixa o saldo negativo, que as
+        próximas chamadas pagam.
+        """
+        necessario = min(n, self.capacidade)
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self.tokens = min(self.capacidade, self.tokens + (agora - self._atualizado) * self.taxa)
+                self._atualizado = agora
+                if self.tokens >= necessario:
+                    self.tokens -= n
+                    return
+                espera = (necessario - self.tokens) / self.taxa
+            time.sleep(espera)
+
+
+class RequestScheduler:
+    def __init__(self, cotas_por_minuto=None, max_tentativas=3, atraso_base=1.0, atraso_maximo=60.0,
+                 metricas=None):
+        self.max_tentativas = max_tentativas
+        self.atraso_base = atraso_base
+        self.atraso_maximo = atraso_maximo
+        self.metricas = metricas
+        self._buckets = {api: TokenBucket(cota) for api, cota in (cotas_por_minuto or {}).items() if cota}
+
+    def executar(self, api, funcao, *args, custo=1, operacao=None, payload=None, **kwargs):
+        """Chama `funcao(*args, **kwargs)` respeitando a cota de `api` e repetindo erros transitórios.
+        `operacao` nomeia a chamada nas métricas (padrão: nome da função) e `payload` é o conteúdo
+        enviado, só para a métrica de bytes (padrão: o argumento `body`); não é repassado à função.
+        """
+        enviados = tamanho_aproximado(payload if payload is not None else kwargs.get('body'))
+        bucket = self._buckets.get(api)
+        operacao = operacao or getattr(funcao, '__name__', 'chamada')
+        tentativa = 0
+        while True:
+            if bucket is not None:
+                bucket.adquirir(custo)
+            inicio = time.perf_counter()
+            try:
+                resultado = funcao(*args, **kwargs)
+            except Exception as e:
+                if self.metricas is not None:
+                    self.metricas.registrar_chamada(api, operacao, time.perf_counter() - inicio,
+                                                    str(status_http(e) or type(e).__name__))
+                if tentativa >= self.max_tentativas or not erro_repetivel(e):
+                    raise
+                if self.metricas is not None:
+                    self.metricas.contar('api_tentativas_repetidas_total', api=api)
+                # Backoff exponencial com jitter total (evita que as threads repitam juntas)
+                espera = random.uniform(0, min(self.atraso_maximo, self.atraso_base * (2 ** tentativa)))
+                tentativa += 1
+                print(f"   ⏳ {api}: erro transitório ({status_http(e) or type(e).__name__}), "
+                      f"nova tentativa {tentativa}/{self.max_tentativas} em {espera:.1f}s")
+                time.sleep(espera)
+                continue
+            if self.metricas is not None:
+                self.metricas.registrar_chamada(api, operacao, time.perf_counter() - inicio, 'ok',
+                                                bytes_recebidos=tamanho_aproximado(resultado),
+                                                bytes_enviados=enviados)
+            return resultado
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def obter_scheduler(**kwargs):
+    """Agendador compartilhado pelo processo (as cotas valem para o processo todo)."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler(**kwargs)
+        return _scheduler
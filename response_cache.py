@@ -0,0 +1,153 @@
+"""Cache local (SQLite) das respostas do Search Console e do GA4.
+
+Cada entrada é identificada por (fonte, alvo, dimensões, início, fim), onde alvo é o
+domínio/site do Search Console ou a propriedade do GA4. Períodos já finalizados (terminados
+há mais de `dias_finalizacao` dias) são tratados como imutáveis e não expiram; períodos
+recentes expiram após `ttl_segundos`. Acima de `max_entradas`, as entradas acessadas há
+mais tempo são descartadas. Com `somente_leitura` (ex: --dry-run) o arquivo precisa existir
+e nada é gravado nele: nem a data de acesso das entradas, nem os arquivos auxiliares do WAL.
+"""
+import datetime
+import json
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    def __init__(self, caminho='cache_respostas.sqlite3', ttl_segundos=6 * 3600, dias_finalizacao=3,
+                 max_entradas=20000, somente_leitura=False):
+        self.caminho = caminho
+        self.ttl_segundos = ttl_segundos
+        self.dias_finalizacao = dias_finalizacao
+        self.max_entradas = max_entradas
+        self.somente_leitura = somente_leitura
+        self._lock = threading.Lock()
+        if somente_leitura:
+            # immutable: sem travas nem -wal/-shm (respostas gravadas por uma sincronização em
+            # andamento podem não aparecer)
+            self._conn = sqlite3.connect(f"file:{caminho}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+            return
+        self._conn = sqlite3.connect(caminho, check_same_thread=False, timeout=30)
+        # WAL sem fsync a cada transação: o cache pode ser reconstruído, a latência importa mais
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock, self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS respostas (
+                       fonte TEXT NOT NULL,
+                       alvo TEXT NOT NULL,
+                       dimensoes TEXT NOT NULL,
+                       inicio TEXT NOT NULL,
+                       fim TEXT NOT NULL,
+                       payload TEXT NOT NULL,
+                       finalizado INTEGER NOT NULL,
+                       gravado_em REAL NOT NULL,
+                       acessado_em REAL NOT NULL,
+                       PRIMARY KEY (fonte, alvo, dimensoes, inicio, fim)
+                   )"""
+            )
+        self._limpar()
+
+    def _finalizado(self, fim):
+        """Um período é imutável quando terminou há mais de `dias_finalizacao` dias."""
+        limite = datetime.date.today() - datetime.timedelta(days=self.dias_finalizacao)
+        return datetime.date.fromisoformat(fim) < limite
+
+    def obter(self, fonte, alvo, dimensoes, inicio, fim):
+        """Retorna o payload armazenado ou None se ausente/expirado."""
+        chave = (fonte, str(alvo), ','.join(dimensoes), inicio, fim)
+        agora = time.time()
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT payload, finalizado, gravado_em FROM respostas "
+                "WHERE fonte=? AND alvo=? AND dimensoes=? AND inicio=? AND fim=?", chave
+            ).fetchone()
+            if linha is None:
+                return None
+            payload, finalizado, gravado_em = linha
+            if not finalizado and agora - gravado_em > self.ttl_segundos:
+                return None
+            if self.somente_leitura:
+                return json.loads(payload)
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE respostas SET acessado_em=? "
+                    "WHERE fonte=? AND alvo=? AND dimensoes=? AND inicio=? AND fim=?", (agora,) + chave
+                )
+        return json.loads(payload)
+
+    def obter_varios(self, fonte, alvo, dimensoes, periodos):
+        """Como `obter` para vários períodos [(inicio, fim)] numa única transação.
+        Retorna {(inicio, fim): payload} só com os períodos presentes e válidos.
+        """
+        agora = time.time()
+        encontrados = {}
+        with self._lock:
+            for inicio, fim in periodos:
+                linha = self._conn.execute(
+                    "SELECT payload, finalizado, gravado_em FROM respostas "
+                    "WHERE fonte=? AND alvo=? AND dimensoes=? AND inicio=? AND fim=?",
+                    (fonte, str(alvo), ','.join(dimensoes), inicio, fim)
+                ).fetchone()
+                if linha is None:
+                    continue
+                payload, finalizado, gravado_em = linha
+                if not finalizado and agora - gravado_em > self.ttl_segundos:
+                    continue
+                encontrados[(inicio, fim)] = payload
+            if encontrados and not self.somente_leitura:
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE respostas SET acessado_em=? "
+                        "WHERE fonte=? AND alvo=? AND dimensoes=? AND inicio=? AND fim=?",
+                        [(agora, fonte, str(alvo), ','.join(dimensoes), inicio, fim) for inicio, fim in encontrados]
+                    )
+        return {periodo: json.loads(payload) for periodo, payload in encontrados.items()}
+
+    def gravar(self, fonte, alvo, dimensoes, inicio, fim, payload):
+        self.gravar_varios(fonte, alvo, dimensoes, [(inicio, fim, payload)])
+
+    def gravar_varios(self, fonte, alvo, dimensoes, entradas):
+        """Grava vários períodos [(inicio, fim, payload)] numa única transação."""
+        agora = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO respostas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(fonte, str(alvo), ','.join(dimensoes), inicio, fim, json.dumps(payload),
+                  int(self._finalizado(fim)), agora, agora) for inicio, fim, payload in entradas]
+            )
+
+    def invalidar(self, fonte=None, alvo=None, mes=None):
+        """Remove entradas filtrando por fonte ('gsc'/'ga4'), alvo e/ou mês ('2025-03').
+        Sem filtros, esvazia o cache. Retorna o número de entradas removidas.
+        """
+        condicoes = []
+        params = []
+        if fonte:
+            condicoes.append("fonte=?")
+            params.append(fonte)
+        if alvo:
+            condicoes.append("alvo=?")
+            params.append(str(alvo))
+        if mes:
+            # Qualquer período que toque o mês
+            condicoes.append("inicio<=? AND fim>=?")
+            params.extend([f"{mes}-31", f"{mes}-01"])
+        sql = "DELETE FROM respostas"
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).rowcount
+
+    def _limpar(self):
+        """Remove entradas recentes expiradas e aplica o limite de tamanho (LRU)."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM respostas WHERE finalizado=0 AND gravado_em<?",
+                               (time.time() - self.ttl_segundos,))
+            excesso = self._conn.execute("SELECT COUNT(*) FROM respostas").fetchone()[0] - self.max_entradas
+            if excesso > 0:
+                self._conn.execute(
+                    "DELETE FROM respostas WHERE rowid IN "
+                    "(SELECT rowid FROM respostas ORDER BY acessado_em LIMIT ?)", (excesso,)
+                )
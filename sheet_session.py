@@ -0,0 +1,172 @@
+"""Sessão de sincronização com a planilha: lê a aba uma vez e grava tudo de uma vez.
+
+Todas as células alteradas e linhas adicionadas durante a sincronização ficam em memória
+(e refletidas em `data`, para que as verificações de célula vazia continuem corretas) e são
+enviadas num único `values_batch_update` no `commit()`. Quando `limite_celulas` é atingido a
+sessão fica `cheia` e quem a usa deve chamar `commit()` (flush parcial) antes de continuar.
+As chamadas à API passam por `executar(funcao, *args, **kwargs)` (ex: o agendador de cotas).
+
+Leitura: por padrão a aba inteira (`get_all_values`, ou em blocos de `linhas_por_bloco` linhas
+para abas muito grandes). Com `leitura='coluna_a'` só a coluna A é lida e `data` vira uma
+grade esparsa: quem usa a sessão pede as demais células com `ler_intervalos` (uma única
+`batch_get`) e as células não lidas aparecem vazias. Antes da primeira linha adicionada, as
+linhas abaixo do fim da coluna A também são lidas, para que a nova linha não caia sobre elas.
+"""
+
+
+class SheetSyncSession:
+    def __init__(self, spreadsheet, worksheet, limite_celulas=None, value_input_option='USER_ENTERED',
+                 executar=None, leitura='completa', linhas_por_bloco=None):
+        self.spreadsheet = spreadsheet
+        self.worksheet = worksheet
+        self.limite_celulas = limite_celulas
+        self.value_input_option = value_input_option
+        self._executar = executar or (lambda funcao, *args, **kwargs: funcao(*args, **kwargs))
+        self._pendentes = {}  # (linha, coluna) 1-based -> valor
+        self._linhas_grade = getattr(worksheet, 'row_count', None)
+        self.escritas = 0
+        self._fim_conferido = leitura != 'coluna_a'
+        if leitura == 'coluna_a':
+            self.data = [[valor] for valor in self._executar(worksheet.col_values, 1)]
+        elif linhas_por_bloco and self._linhas_grade:
+            self.data = self._ler_em_blocos(linhas_por_bloco)
+        else:
+            self.data = self._executar(worksheet.get_all_values)
+        self.celulas_lidas = sum(len(linha) for linha in self.data)
+
+    @classmethod
+    def abrir(cls, spreadsheet, nome_aba, executar=None, **kwargs):
+        worksheet = executar(spreadsheet.worksheet, nome_aba) if executar else spreadsheet.worksheet(nome_aba)
+        return cls(spreadsheet, worksheet, executar=executar, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        return False
+
+    @property
+    def pendentes(self):
+        return len(self._pendentes)
+
+    @property
+    def cheia(self):
+        """True quando o número de células pendentes atingiu `limite_celulas`."""
+        return bool(self.limite_celulas) and len(self._pendentes) >= self.limite_celulas
+
+    def _ler_em_blocos(self, linhas_por_bloco):
+        """Equivalente a get_all_values, uma faixa de linhas por chamada."""
+        data = []
+        for inicio in range(1, self._linhas_grade + 1, linhas_por_bloco):
+            fim = min(inicio + linhas_por_bloco - 1, self._linhas_grade)
+            bloco = self._executar(self.worksheet.get_values, f"{inicio}:{fim}")
+            if bloco:
+                # Linhas vazias no fim de um bloco não vêm na resposta
+                data.extend([] for _ in range(inicio - 1 - len(data)))
+                data.extend(bloco)
+        return data
+
+    def ler_intervalos(self, intervalos):
+        """Lê numa única chamada (batch_get) os intervalos (linha_inicial, linha_final,
+        coluna_inicial, coluna_final), 1-based e inclusivos, e os copia para `data`;
+        coluna_final None lê as linhas inteiras. Células com escrita pendente são mantidas.
+        """
+        if not intervalos:
+            return
+        from gspread.utils import rowcol_to_a1
+
+        faixas = [f"{l1}:{l2}" if c2 is None else f"{rowcol_to_a1(l1, c1)}:{rowcol_to_a1(l2, c2)}"
+                  for l1, l2, c1, c2 in intervalos]
+        blocos = self._executar(self.worksheet.batch_get, faixas)
+        for (l1, _, c1, c2), valores in zip(intervalos, blocos):
+            c1 = 1 if c2 is None else c1
+            for k, linha in enumerate(valores):
+                for j, valor in enumerate(linha):
+                    if (l1 + k, c1 + j) not in self._pendentes:
+                        self._colocar(l1 + k, c1 + j, valor)
+                self.celulas_lidas += len(linha)
+
+    def _colocar(self, linha, coluna, valor):
+        while len(self.data) < linha:
+            self.data.append([])
+        atual = self.data[linha - 1]
+        while len(atual) < coluna:
+            atual.append('')
+        atual[coluna - 1] = str(valor)
+
+    def definir(self, linha, coluna, valor):
+        """Agenda a escrita de uma célula (linha/coluna 1-based)."""
+        self._colocar(linha, coluna, valor)
+        self._pendentes[(linha, coluna)] = valor
+
+    def _conferir_fim(self):
+        """Na leitura só da coluna A, lê (uma vez) as linhas entre o fim da coluna A e o fim da
+        grade: notas ou a coluna FTD podem ocupar linhas com a coluna A vazia.
+        """
+        if self._fim_conferido:
+            return
+        self._fim_conferido = True
+        inicio = len(self.data) + 1
+        if self._linhas_grade is None or inicio > self._linhas_grade:
+            return
+        abaixo = self._executar(self.worksheet.get_values, f"{inicio}:{self._linhas_grade}")
+        for k, linha in enumerate(abaixo):
+            for j, valor in enumerate(linha):
+                if (inicio + k, j + 1) not in self._pendentes:
+                    self._colocar(inicio + k, j + 1, valor)
+            self.celulas_lidas += len(linha)
+
+    def adicionar_linha(self, valores):
+        """Agenda uma nova linha ao final dos dados; retorna o número (1-based) da linha."""
+        self._conferir_fim()
+        linha = len(self.data) + 1
+        self.data.append([])
+        for coluna, valor in enumerate(valores, 1):
+            if valor not in ('', None):
+                self.definir(linha, coluna, valor)
+        return linha
+
+    def _intervalos(self):
+        """Agrupa células pendentes contíguas da mesma linha num único intervalo."""
+        intervalos = []
+        inicio = None
+        valores = []
+        anterior = None
+        for (linha, coluna) in sorted(self._pendentes):
+            if anterior is not None and linha == anterior[0] and coluna == anterior[1] + 1:
+                valores.append(self._pendentes[(linha, coluna)])
+            else:
+                if inicio is not None:
+                    intervalos.append((inicio, valores))
+                inicio = (linha, coluna)
+                valores = [self._pendentes[(linha, coluna)]]
+            anterior = (linha, coluna)
+        if inicio is not None:
+            intervalos.append((inicio, valores))
+        return intervalos
+
+    def commit(self):
+        """Grava todas as células pendentes numa única chamada à API."""
+        if not self._pendentes:
+            return
+        from gspread.utils import rowcol_to_a1, absolute_range_name
+
+        # Linhas novas além do tamanho da grade precisam existir antes da escrita
+        maior_linha = max(linha for linha, _ in self._pendentes)
+        if self._linhas_grade is not None and maior_linha > self._linhas_grade:
+            self._executar(self.worksheet.add_rows, maior_linha - self._linhas_grade)
+            self._linhas_grade = maior_linha
+
+        dados = []
+        for (linha, coluna), valores in self._intervalos():
+            a1 = rowcol_to_a1(linha, coluna)
+            if len(valores) > 1:
+                a1 = f"{a1}:{rowcol_to_a1(linha, coluna + len(valores) - 1)}"
+            dados.append({'range': absolute_range_name(self.worksheet.title, a1), 'values': [valores]})
+
+        self._executar(self.spreadsheet.values_batch_update,
+                       body={'valueInputOption': self.value_input_option, 'data': dados})
+        self.escritas += 1
+        self._pendentes.clear()
@@ -0,0 +1,140 @@
+"""Registro persistente do siteUrl do Search Console que funciona para cada domínio.
+
+Evita testar os candidatos (sc_site do config, sc-domain:, https://.../) a cada consulta:
+o site que respondeu é gravado em disco e usado direto nas execuções seguintes. Opcionalmente
+guarda também a lista de propriedades acessíveis (sites.list), consultada de novo só depois de
+`ttl_lista` segundos (outras execuções e processos reaproveitam a lista gravada).
+Vários processos (ex: a frota) podem usar o mesmo arquivo: cada gravação relê o arquivo sob
+uma trava exclusiva e só então aplica a alteração, sem perder o que os outros registraram.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+
+class SiteRegistry:
+    def __init__(self, caminho='sc_sites.json', ttl_lista=24 * 3600):
+        self.caminho = caminho
+        self.ttl_lista = ttl_lista
+        self._lock = threading.RLock()
+        self._sites = {}
+        self._acessiveis = None
+        self._lista_em = None  # quando a lista de acessíveis foi consultada (epoch)
+        self._lista_consultada = False
+        # Domínios sem nenhum site acessível nesta execução (não persistido)
+        self._sem_acesso = set()
+        self._carregar()
+
+    def _carregar(self):
+        if not os.path.exists(self.caminho):
+            return
+        try:
+            with open(self.caminho, encoding='utf-8') as f:
+                dados = json.load(f)
+            self._sites = dict(dados.get('sites', {}))
+            if dados.get('acessiveis') is not None:
+                self._acessiveis = list(dados['acessiveis'])
+                self._lista_em = dados.get('lista_em')
+        except Exception as e:
+            print(f"⚠️  Registro de sites do Search Console ignorado ({self.caminho}): {e}")
+
+    @contextlib.contextmanager
+    def _travar(self):
+        """Trava exclusiva entre processos (arquivo .lock ao lado do registro) durante a
+        releitura e a gravação; dentro do mesmo processo vale o `_lock`.
+        """
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.caminho}.lock", 'a') as trava:
+            fcntl.flock(trava, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(trava, fcntl.LOCK_UN)
+
+    def _salvar(self):
+        dados = {'sites': self._sites, 'acessiveis': self._acessiveis, 'lista_em': self._lista_em,
+                 'atualizado_em': time.time()}
+        tmp = f"{self.caminho}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.caminho)
+
+    def obter(self, domain):
+        with self._lock:
+            return self._sites.get(domain)
+
+    def registrar(self, domain, site):
+        with self._lock:
+            if self._sites.get(domain) == site:
+                return
+            with self._travar():
+                self._carregar()
+                self._sites[domain] = site
+                self._salvar()
+
+    def remover(self, domain):
+        with self._lock:
+            if domain not in self._sites:
+                return
+            with self._travar():
+                self._carregar()
+                self._sites.pop(domain, None)
+                self._salvar()
+
+    def marcar_sem_acesso(self, domain):
+        with self._lock:
+            self._sem_acesso.add(domain)
+
+    def sem_acesso(self, domain):
+        with self._lock:
+            return domain in self._sem_acesso
+
+    def carregar_lista(self, listar_sites):
+        """Preenche a lista de propriedades acessíveis com uma única chamada a `listar_sites`
+        (que deve devolver a resposta de sites.list). Só consulta uma vez por processo, e não
+        consulta se a lista gravada (por esta ou outra execução) tem menos de `ttl_lista` segundos.
+        """
+        with self._lock:
+            if self._lista_consultada:
+                return self._acessiveis
+            self._lista_consultada = True
+            with self._travar():
+                self._carregar()
+            if self._lista_em is not None and time.time() - self._lista_em < self.ttl_lista:
+                return self._acessiveis
+            resposta = listar_sites()
+            with self._travar():
+                self._carregar()
+                self._acessiveis = [
+                    entrada['siteUrl'] for entrada in resposta.get('siteEntry', [])
+                    if entrada.get('permissionLevel') != 'siteUnverifiedUser'
+                ]
+                self._lista_em = time.time()
+                self._salvar()
+            return self._acessiveis
+
+    def acessivel(self, site):
+        """True se o site consta na lista de propriedades acessíveis (sites.list)."""
+        with self._lock:
+            return site in (self._acessiveis or ())
+
+    def ordenar_candidatos(self, domain, candidatos):
+        """Coloca primeiro o site já registrado para o domínio e, depois, os candidatos que
+        constam na lista de propriedades acessíveis; os demais ficam como último recurso.
+        """
+        with self._lock:
+            conhecido = self._sites.get(domain)
+            acessiveis = set(self._acessiveis or [])
+        ordenados = [conhecido] if conhecido else []
+        ordenados += [c for c in candidatos if c in acessiveis and c not in ordenados]
+        ordenados += [c for c in candidatos if c not in ordenados]
+        return ordenados
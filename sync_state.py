@@ -0,0 +1,84 @@
+"""Estado da sincronização incremental (modo sem menu, para cron/systemd).
+
+Guarda a última revisão vista da planilha (modifiedTime do Drive, lido depois das nossas
+próprias escritas), o último mês encerrado já considerado e os pares (domínio, mês) já
+concluídos ou com falha, além dos meses encerrados já completos na planilha (que não
+precisam ser relidos enquanto ela não for alterada). Com isso uma execução agendada só trabalha quando a planilha foi
+alterada por alguém (ex: células apagadas), quando um mês acabou de encerrar ou quando há
+falhas a repetir.
+"""
+import json
+import os
+import time
+
+
+class SyncState:
+    def __init__(self, caminho='sync_state.json'):
+        self.caminho = caminho
+        self.revisao = None
+        self.ultimo_mes_fechado = None
+        self.concluidos = {}  # domínio -> [rótulos de mês]
+        self.falhas = {}      # domínio -> {rótulo: erro}
+        self.completos = {}   # domínio -> [rótulos com todas as métricas preenchidas]
+        self._carregar()
+
+    def _carregar(self):
+        if not os.path.exists(self.caminho):
+            return
+        try:
+            with open(self.caminho, encoding='utf-8') as f:
+                dados = json.load(f)
+            self.revisao = dados.get('revisao')
+            self.ultimo_mes_fechado = dados.get('ultimo_mes_fechado')
+            self.concluidos = {d: list(meses) for d, meses in (dados.get('concluidos') or {}).items()}
+            self.falhas = {d: dict(meses) for d, meses in (dados.get('falhas') or {}).items()}
+            self.completos = {d: list(meses) for d, meses in (dados.get('completos') or {}).items()}
+        except Exception as e:
+            print(f"⚠️  Estado da sincronização ignorado ({self.caminho}): {e}")
+
+    def salvar(self):
+        dados = {
+            'revisao': self.revisao,
+            'ultimo_mes_fechado': self.ultimo_mes_fechado,
+            'concluidos': self.concluidos,
+            'falhas': self.falhas,
+            'completos': self.completos,
+            'atualizado_em': time.time(),
+        }
+        tmp = f"{self.caminho}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.caminho)
+
+    def concluido(self, domain, rotulo):
+        return rotulo in self.concluidos.get(domain, ())
+
+    def motivo_para_sincronizar(self, revisao, ultimo_mes_fechado):
+        """Retorna o motivo pelo qual a execução precisa consultar as APIs, ou None."""
+        if self.revisao is None:
+            return "primeira execução"
+        if revisao != self.revisao:
+            return f"planilha alterada desde a última execução ({revisao})"
+        if ultimo_mes_fechado != self.ultimo_mes_fechado:
+            return f"mês encerrado: {ultimo_mes_fechado}"
+        if self.falhas:
+            total = sum(len(meses) for meses in self.falhas.values())
+            return f"{total} mês(es) com falha na execução anterior"
+        return None
+
+    def registrar_resultado(self, resultado):
+        """Atualiza os pares concluídos/com falha a partir do retorno de
+        `preencher_meses_pendentes_vertical`. Cada execução reavalia todos os meses pendentes,
+        então as falhas passam a ser exatamente as da última execução.
+        """
+        dominios = resultado.get('domains')
+        if dominios is None:
+            return
+        for domain, rel in dominios.items():
+            concluidos = self.concluidos.setdefault(domain, [])
+            for rotulo in rel['processed']:
+                if rotulo not in concluidos:
+                    concluidos.append(rotulo)
+        self.falhas = {domain: dict(rel['failed']) for domain, rel in dominios.items() if rel['failed']}
+        if 'completos' in resultado:
+            self.completos = resultado['completos']
@@ -0,0 +1,117 @@
+import random
+
+import pytest
+
+import aggregation
+from aggregation import (AgregadoPaginas, AgregadorGSC, AgregadorTotaisGSC, MetricasPagina, RankingGSC,
+                         metricas_gsc, rotulo_por_data, somar_campo, somas_gsc)
+
+
+def _linhas_gsc(quantidade, semente=7):
+    rng = random.Random(semente)
+    linhas = []
+    for k in range(quantidade):
+        impressions = rng.randint(0, 500)
+        linhas.append({'keys': [f"site.com/pagina-{k % 37}", f"consulta {k}"],
+                       'impressions': impressions, 'clicks': rng.randint(0, impressions),
+                       'position': round(rng.uniform(1, 40), 2)})
+    return linhas
+
+
+def _linhas_ga4(quantidade):
+    return [{'page_path': f"site.com/pagina-{k % 41}", 'sessions': str(k % 13)} for k in range(quantidade)]
+
+
+@pytest.fixture
+def sem_numpy(monkeypatch):
+    monkeypatch.setattr(aggregation, '_np', None)
+
+
+@pytest.fixture
+def com_numpy(monkeypatch):
+    np = pytest.importorskip('numpy')
+    monkeypatch.setattr(aggregation, '_np', np)
+
+
+def _resultados():
+    linhas = _linhas_gsc(1000)
+    por_pagina = AgregadorGSC(lambda row: row['keys'][0], normalizar=str.upper).adicionar_linhas(linhas)
+    paginas = AgregadoPaginas(contar_consultas=True).adicionar_linhas(linhas)
+    paginas.adicionar_sessoes(_linhas_ga4(500))
+    ranking = RankingGSC(10).adicionar_linhas({'keys': [f"consulta {k}"], **row}
+                                              for k, row in enumerate(linhas))
+    return {
+        'somas': somas_gsc(linhas),
+        'sessoes': somar_campo(_linhas_ga4(500), 'sessions'),
+        'totais': AgregadorTotaisGSC().adicionar_linhas(iter(linhas)).metricas(),
+        'por_pagina': por_pagina.resultado(),
+        'paginas': {url: {nome: getattr(m, nome) for nome in MetricasPagina.__slots__} for url, m in paginas.items()},
+        'fontes': [(paginas.tem_gsc(url), paginas.tem_ga4(url)) for url in paginas],
+        'paginas_totais': paginas.totais(),
+        'ranking': [ranking.resultado(criterio) for criterio in RankingGSC.CRITERIOS],
+    }
+
+
+def _aproximar(valor):
+    if isinstance(valor, float):
+        return pytest.approx(valor)
+    if isinstance(valor, dict):
+        return {chave: _aproximar(v) for chave, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return type(valor)(_aproximar(v) for v in valor)
+    return valor
+
+
+def test_numpy_e_python_puro_dao_os_mesmos_resultados(monkeypatch):
+    np = pytest.importorskip('numpy')
+    # Blocos pequenos para exercitar o acúmulo entre blocos
+    monkeypatch.setattr(aggregation, 'TAMANHO_BLOCO', 64)
+    monkeypatch.setattr(aggregation, '_np', None)
+    puro = _resultados()
+    monkeypatch.setattr(aggregation, '_np', np)
+    assert _resultados() == _aproximar(puro)
+
+
+def test_agregador_soma_chaves_que_normalizam_igual(sem_numpy):
+    linhas = [{'keys': ['a'], 'impressions': 10, 'clicks': 1, 'position': 2.0},
+              {'keys': ['A'], 'impressions': 30, 'clicks': 2, 'position': 4.0},
+              {'keys': ['b'], 'impressions': 0, 'clicks': 0, 'position': 9.0}]
+    resultado = AgregadorGSC(lambda row: row['keys'][0], normalizar=str.upper).adicionar_linhas(linhas).resultado()
+    assert resultado == {'A': (40, 3, 7.5, 3.5), 'B': (0, 0, 0.0, 0.0)}
+
+
+def test_totais_gsc(com_numpy):
+    linhas = [{'impressions': 100, 'clicks': 10, 'position': 1.0},
+              {'impressions': 300, 'clicks': 20, 'position': 5.0}]
+    assert AgregadorTotaisGSC().adicionar_linhas(linhas).metricas() == metricas_gsc(400, 30, 1600.0)
+    assert metricas_gsc(400, 30, 1600.0) == (400, 30, 7.5, 4.0)
+
+
+def test_ranking_mantem_os_n_maiores_e_desempata_pela_ordem(com_numpy):
+    linhas = [{'keys': [f"q{k}"], 'clicks': k % 5, 'impressions': k, 'position': 1.0} for k in range(20)]
+    ranking = RankingGSC(3).adicionar_linhas(linhas)
+    assert [item['chave'] for item in ranking.resultado('impressions')] == ['q19', 'q18', 'q17']
+    assert [item['chave'] for item in ranking.resultado('clicks')] == ['q4', 'q9', 'q14']
+    assert ranking.linhas == 20
+
+
+@pytest.mark.parametrize('n', [0, -1, None, 2.5])
+def test_ranking_rejeita_n_invalido(n):
+    with pytest.raises(ValueError):
+        RankingGSC(n)
+
+
+def test_somar_campo_aceita_texto_e_valores_invalidos(sem_numpy):
+    assert somar_campo([{'sessions': '3'}, {'sessions': 'x'}, {'sessions': None}, {}], 'sessions') == 3
+
+
+def test_rotulo_por_data_chama_rotular_uma_vez_por_mes():
+    chamadas = []
+
+    def rotular(ano, mes):
+        chamadas.append((ano, mes))
+        return f"{mes:02d}/{ano}"
+
+    rotulo = rotulo_por_data(rotular)
+    assert [rotulo(d) for d in ('2025-03-01', '2025-03-31', '2025-04-02')] == ['03/2025', '03/2025', '04/2025']
+    assert chamadas == [(2025, 3), (2025, 4)]
@@ -0,0 +1,48 @@
+import argparse
+
+import pytest
+
+import api_extractor
+import benchmark
+
+DOMINIOS = ['a.com', 'b.com', 'c.com']
+
+
+@pytest.fixture
+def montar():
+    args = argparse.Namespace(latencia_sheets_ms=0, latencia_ms=0, taxa_erro=0, semente=1, linhas=10)
+
+    def montar(dados):
+        extrator, _, planilha = benchmark._montar_extrator(args, {api_extractor.ABA_DADOS_ORIGEM: dados}, DOMINIOS)
+        return extrator, planilha.worksheet(api_extractor.ABA_DADOS_ORIGEM)
+    return montar
+
+
+def test_localiza_um_bloco_por_dominio(montar):
+    dados = benchmark.planilha_vertical(DOMINIOS, 4, fracao_preenchida=0.5)
+    extrator, _ = montar(dados)
+    estruturas = extrator._locate_all_table_structures(dados)
+    assert [st['domain'] for st in estruturas] == DOMINIOS
+    for k, st in enumerate(estruturas):
+        assert (st['header_row'], st['first_data_row'], st['last_data_row']) == (7 * k + 2, 7 * k + 3, 7 * k + 6)
+        assert (st['col_mes'], st['col_impr'], st['col_clicks'], st['col_ctr'], st['col_pos'], st['col_sessions']) \
+            == (0, 1, 2, 3, 4, 5)
+
+
+def test_mapa_em_cache_ate_a_planilha_mudar(montar):
+    dados = benchmark.planilha_vertical(DOMINIOS, 4)
+    extrator, _ = montar(dados)
+    primeira = extrator._locate_all_table_structures(dados)
+    assert extrator._locate_all_table_structures(dados) == primeira
+    dados.insert(5, ['', '', '', '', '', '', ''])
+    assert [st['last_data_row'] for st in extrator._locate_all_table_structures(dados)] == [7, 14, 21]
+
+
+def test_leitura_da_coluna_a_e_cabecalhos_equivale_a_completa(montar):
+    pytest.importorskip('gspread')  # endereços A1 da batch_get (sheet_session)
+    dados = benchmark.planilha_vertical(DOMINIOS, 12, fracao_preenchida=0.5)
+    completa, _ = montar(dados)
+    seletiva, aba = montar(dados)
+    _, estruturas = seletiva._localizar_blocos()
+    assert estruturas == completa._locate_all_table_structures(dados)
+    assert aba.celulas_lidas < sum(len(linha) for linha in dados) / 2
@@ -0,0 +1,71 @@
+import datetime
+import os
+import sqlite3
+
+import pytest
+
+from response_cache import ResponseCache
+
+ANTIGO = ('2020-01-01', '2020-01-31')
+
+
+def _recente():
+    hoje = datetime.date.today().isoformat()
+    return hoje, hoje
+
+
+@pytest.fixture
+def caminho(tmp_path):
+    return str(tmp_path / 'cache.sqlite3')
+
+
+def test_grava_e_le(caminho):
+    cache = ResponseCache(caminho)
+    cache.gravar('gsc', 'site.com', ['page'], *ANTIGO, [{'clicks': 1}])
+    assert cache.obter('gsc', 'site.com', ['page'], *ANTIGO) == [{'clicks': 1}]
+    assert cache.obter('gsc', 'site.com', ['query'], *ANTIGO) is None
+    assert cache.obter_varios('gsc', 'site.com', ['page'], [ANTIGO, _recente()]) == {ANTIGO: [{'clicks': 1}]}
+
+
+def test_periodo_recente_expira_e_finalizado_nao(caminho):
+    cache = ResponseCache(caminho, ttl_segundos=-1)
+    cache.gravar_varios('ga4', 123, ['date'], [(*ANTIGO, 'antigo'), (*_recente(), 'recente')])
+    assert cache.obter('ga4', 123, ['date'], *ANTIGO) == 'antigo'
+    assert cache.obter('ga4', 123, ['date'], *_recente()) is None
+
+
+def test_invalidar_por_fonte_e_mes(caminho):
+    cache = ResponseCache(caminho)
+    cache.gravar('gsc', 'a.com', ['page'], '2025-03-01', '2025-03-31', 1)
+    cache.gravar('gsc', 'a.com', ['page'], '2025-04-01', '2025-04-30', 2)
+    cache.gravar('ga4', '1', ['page'], '2025-03-01', '2025-03-31', 3)
+    assert cache.invalidar(fonte='gsc', mes='2025-03') == 1
+    assert cache.obter('gsc', 'a.com', ['page'], '2025-04-01', '2025-04-30') == 2
+    assert cache.invalidar() == 2
+
+
+def test_limite_descarta_os_menos_acessados(caminho):
+    cache = ResponseCache(caminho, max_entradas=2)
+    for mes, valor in (('01', 'a'), ('02', 'b'), ('03', 'c')):
+        cache.gravar('gsc', 'a.com', ['page'], f"2020-{mes}-01", f"2020-{mes}-28", valor)
+    cache.obter('gsc', 'a.com', ['page'], '2020-01-01', '2020-01-28')
+    cache._conn.close()
+    cache = ResponseCache(caminho, max_entradas=2)
+    assert cache.obter('gsc', 'a.com', ['page'], '2020-02-01', '2020-02-28') is None
+    assert cache.obter('gsc', 'a.com', ['page'], '2020-01-01', '2020-01-28') == 'a'
+
+
+def test_somente_leitura_nao_cria_nem_altera_arquivos(caminho, tmp_path):
+    with pytest.raises(sqlite3.OperationalError):
+        ResponseCache(caminho, somente_leitura=True)
+    assert os.listdir(tmp_path) == []
+
+    cache = ResponseCache(caminho)
+    cache.gravar('gsc', 'a.com', ['page'], *ANTIGO, 'x')
+    cache._conn.close()
+    arquivos = sorted(os.listdir(tmp_path))
+
+    leitura = ResponseCache(caminho, somente_leitura=True)
+    assert leitura.obter('gsc', 'a.com', ['page'], *ANTIGO) == 'x'
+    assert leitura.obter_varios('gsc', 'a.com', ['page'], [ANTIGO]) == {ANTIGO: 'x'}
+    assert sorted(os.listdir(tmp_path)) == arquivos
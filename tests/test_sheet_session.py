@@ -0,0 +1,120 @@
+import pytest
+
+from sheet_session import SheetSyncSession
+
+
+class WorksheetFalsa:
+    title = 'SEO SITES'
+
+    def __init__(self, dados, row_count=None):
+        self.dados = dados
+        self.row_count = row_count if row_count is not None else len(dados)
+        self.chamadas = []
+
+    def get_all_values(self):
+        self.chamadas.append('get_all_values')
+        return [list(linha) for linha in self.dados]
+
+    def get_values(self, faixa):
+        self.chamadas.append(('get_values', faixa))
+        inicio, fim = (int(x) for x in faixa.split(':'))
+        bloco = [list(linha) for linha in self.dados[inicio - 1:fim]]
+        while bloco and not bloco[-1]:
+            bloco.pop()
+        return bloco
+
+    def col_values(self, coluna):
+        self.chamadas.append(('col_values', coluna))
+        valores = [linha[coluna - 1] if len(linha) >= coluna else '' for linha in self.dados]
+        while valores and not valores[-1]:
+            valores.pop()
+        return valores
+
+    def batch_get(self, faixas):
+        self.chamadas.append(('batch_get', tuple(faixas)))
+        return [[['x', 'y']] for _ in faixas]
+
+    def add_rows(self, n):
+        self.chamadas.append(('add_rows', n))
+        self.row_count += n
+
+
+class PlanilhaFalsa:
+    def __init__(self):
+        self.corpos = []
+
+    def values_batch_update(self, body):
+        self.corpos.append(body)
+
+
+def _sessao(dados=(), **kwargs):
+    return SheetSyncSession(PlanilhaFalsa(), WorksheetFalsa([list(linha) for linha in dados]), **kwargs)
+
+
+def test_intervalos_agrupam_celulas_contiguas_da_mesma_linha():
+    session = _sessao()
+    for linha, coluna, valor in ((2, 3, 'c'), (2, 2, 'b'), (2, 5, 'e'), (3, 1, 'z'), (2, 4, 'd')):
+        session.definir(linha, coluna, valor)
+    assert session._intervalos() == [((2, 2), ['b', 'c', 'd', 'e']), ((3, 1), ['z'])]
+    assert session.data == [[], ['', 'b', 'c', 'd', 'e'], ['z']]
+
+
+def test_celulas_separadas_ou_em_linhas_diferentes_nao_se_juntam():
+    session = _sessao()
+    session.definir(1, 1, 'a')
+    session.definir(1, 3, 'c')
+    session.definir(2, 2, 'b')
+    assert session._intervalos() == [((1, 1), ['a']), ((1, 3), ['c']), ((2, 2), ['b'])]
+
+
+def test_cheia_e_adicionar_linha():
+    session = _sessao([['a', 'b']], limite_celulas=2)
+    assert session.adicionar_linha(['x', '', 'z']) == 2
+    assert session.pendentes == 2 and session.cheia
+    assert session.data[1] == ['x', '', 'z']
+
+
+def test_leitura_em_blocos_equivale_a_completa():
+    dados = [['a'], [], ['c', 'd'], [], [], ['f'], []]
+    completa = _sessao(dados)
+    em_blocos = _sessao(dados, linhas_por_bloco=2)
+    assert em_blocos.data == completa.data[:6]
+    assert [c for c in em_blocos.worksheet.chamadas if c[0] == 'get_values'] == [
+        ('get_values', '1:2'), ('get_values', '3:4'), ('get_values', '5:6'), ('get_values', '7:7')]
+
+
+def test_leitura_coluna_a_e_intervalos_preservam_escritas_pendentes():
+    pytest.importorskip('gspread')
+    session = _sessao([['dominio', 'q'], ['mar-25', '1', '2']], leitura='coluna_a')
+    assert session.data == [['dominio'], ['mar-25']]
+    session.definir(2, 3, 'pendente')
+    session.ler_intervalos([(2, 2, 2, 3), (1, 1, 1, None)])
+    assert session.worksheet.chamadas[-1] == ('batch_get', ('B2:C2', '1:1'))
+    assert session.data == [['x', 'y'], ['mar-25', 'x', 'pendente']]
+
+
+def test_commit_envia_uma_chamada_e_cria_linhas():
+    pytest.importorskip('gspread')
+    session = _sessao([['a']])
+    session.definir(1, 2, 10)
+    session.definir(1, 3, 20)
+    session.definir(3, 1, 'novo')
+    with session:
+        pass
+    assert session.worksheet.chamadas == ['get_all_values', ('add_rows', 2)]
+    assert session.spreadsheet.corpos == [{'valueInputOption': 'USER_ENTERED', 'data': [
+        {'range': "'SEO SITES'!B1:C1", 'values': [[10, 20]]},
+        {'range': "'SEO SITES'!A3", 'values': [['novo']]},
+    ]}]
+    assert session.pendentes == 0 and session.escritas == 1
+    session.commit()
+    assert session.escritas == 1
+
+
+def test_leitura_coluna_a_adiciona_linha_abaixo_das_linhas_usadas_em_outras_colunas():
+    dados = [['dominio'], ['mar-25', '1'], ['', '', 'nota'], [], ['', 'ftd']]
+    session = SheetSyncSession(PlanilhaFalsa(), WorksheetFalsa(dados, row_count=10), leitura='coluna_a')
+    assert len(session.data) == 2
+    assert session.adicionar_linha(['abr-25']) == 6
+    assert session.adicionar_linha(['mai-25']) == 7
+    assert [c for c in session.worksheet.chamadas if c[0] == 'get_values'] == [('get_values', '3:10')]
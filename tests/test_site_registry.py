@@ -0,0 +1,67 @@
+import multiprocessing
+
+from site_registry import SiteRegistry
+
+
+def _registrar(caminho, inicio):
+    registro = SiteRegistry(caminho)
+    for k in range(inicio, inicio + 20):
+        registro.registrar(f"d{k}.com", f"sc-domain:d{k}.com")
+
+
+def test_registra_remove_e_persiste(tmp_path):
+    caminho = str(tmp_path / 'sc_sites.json')
+    registro = SiteRegistry(caminho)
+    registro.registrar('a.com', 'sc-domain:a.com')
+    registro.registrar('b.com', 'https://b.com/')
+    registro.remover('b.com')
+    assert SiteRegistry(caminho).obter('a.com') == 'sc-domain:a.com'
+    assert SiteRegistry(caminho).obter('b.com') is None
+
+
+def test_instancias_desatualizadas_nao_apagam_registros_de_outras(tmp_path):
+    caminho = str(tmp_path / 'sc_sites.json')
+    primeira, segunda = SiteRegistry(caminho), SiteRegistry(caminho)
+    primeira.registrar('a.com', 'sc-domain:a.com')
+    segunda.registrar('b.com', 'sc-domain:b.com')
+    segunda.remover('c.com')
+    relido = SiteRegistry(caminho)
+    assert (relido.obter('a.com'), relido.obter('b.com')) == ('sc-domain:a.com', 'sc-domain:b.com')
+
+
+def test_processos_em_paralelo_nao_perdem_registros(tmp_path):
+    caminho = str(tmp_path / 'sc_sites.json')
+    processos = [multiprocessing.Process(target=_registrar, args=(caminho, 20 * k)) for k in range(4)]
+    for processo in processos:
+        processo.start()
+    for processo in processos:
+        processo.join()
+    relido = SiteRegistry(caminho)
+    assert [k for k in range(80) if relido.obter(f"d{k}.com") is None] == []
+
+
+def test_ordenar_candidatos_prefere_registrado_e_acessiveis(tmp_path):
+    registro = SiteRegistry(str(tmp_path / 'sc_sites.json'))
+    registro.carregar_lista(lambda: {'siteEntry': [
+        {'siteUrl': 'https://a.com/', 'permissionLevel': 'siteFullUser'},
+        {'siteUrl': 'sc-domain:a.com', 'permissionLevel': 'siteUnverifiedUser'}]})
+    candidatos = ['sc-domain:a.com', 'https://a.com/', 'sc-domain:outro.com']
+    assert registro.ordenar_candidatos('a.com', candidatos) == ['https://a.com/', 'sc-domain:a.com', 'sc-domain:outro.com']
+    registro.registrar('a.com', 'sc-domain:outro.com')
+    assert registro.ordenar_candidatos('a.com', candidatos)[0] == 'sc-domain:outro.com'
+
+
+def test_lista_de_sites_reaproveitada_dentro_do_ttl(tmp_path):
+    caminho = str(tmp_path / 'sc_sites.json')
+    chamadas = []
+
+    def listar():
+        chamadas.append(1)
+        return {'siteEntry': [{'siteUrl': 'sc-domain:a.com', 'permissionLevel': 'siteOwner'}]}
+
+    assert SiteRegistry(caminho).carregar_lista(listar) == ['sc-domain:a.com']
+    outra_execucao = SiteRegistry(caminho)
+    assert outra_execucao.carregar_lista(listar) == ['sc-domain:a.com']
+    assert outra_execucao.acessivel('sc-domain:a.com') and len(chamadas) == 1
+    SiteRegistry(caminho, ttl_lista=0).carregar_lista(listar)
+    assert len(chamadas) == 2
@@ -0,0 +1,67 @@
+from mtd_state import MonthToDateState, mesmo_valor
+from sync_state import SyncState
+
+
+def test_sync_state_ida_e_volta(tmp_path):
+    caminho = str(tmp_path / 'sync_state.json')
+    estado = SyncState(caminho)
+    assert estado.motivo_para_sincronizar('rev1', 'mar-25') == "primeira execução"
+
+    estado.revisao, estado.ultimo_mes_fechado = 'rev1', 'mar-25'
+    estado.registrar_resultado({
+        'domains': {'a.com': {'processed': ['jan-25', 'fev-25'], 'failed': {}},
+                    'b.com': {'processed': ['jan-25'], 'failed': {'fev-25': 'timeout'}}},
+        'completos': {'a.com': ['jan-25', 'fev-25']},
+    })
+    estado.salvar()
+
+    relido = SyncState(caminho)
+    assert relido.concluido('a.com', 'fev-25') and not relido.concluido('b.com', 'fev-25')
+    assert relido.falhas == {'b.com': {'fev-25': 'timeout'}}
+    assert relido.completos == {'a.com': ['jan-25', 'fev-25']}
+    assert relido.motivo_para_sincronizar('rev1', 'mar-25') == "1 mês(es) com falha na execução anterior"
+    assert relido.motivo_para_sincronizar('rev2', 'mar-25').startswith("planilha alterada")
+    assert relido.motivo_para_sincronizar('rev1', 'abr-25') == "mês encerrado: abr-25"
+
+    relido.registrar_resultado({'domains': {'b.com': {'processed': ['fev-25'], 'failed': {}}}})
+    assert relido.falhas == {} and relido.motivo_para_sincronizar('rev1', 'mar-25') is None
+    # Sem 'completos' no resultado (ex: sincronização parcial) os anteriores são mantidos
+    assert relido.completos == {'a.com': ['jan-25', 'fev-25']}
+
+
+def test_sync_state_ignora_arquivo_corrompido(tmp_path):
+    caminho = tmp_path / 'sync_state.json'
+    caminho.write_text('{', encoding='utf-8')
+    assert SyncState(str(caminho)).revisao is None
+
+
+def test_mtd_state_acumula_e_persiste(tmp_path):
+    caminho = str(tmp_path / 'mtd_state.json')
+    estado = MonthToDateState(caminho)
+    assert estado.proximo_dia('a.com', 'out-26', 'gsc', '2026-10-01') == '2026-10-01'
+    assert estado.totais('a.com', 'out-26') == {'gsc': None, 'ga4': None}
+
+    estado.acumular('a.com', 'out-26', 'gsc', '2026-10-05', impressions=100, clicks=10, pos_ponderada=300.0)
+    estado.acumular('a.com', 'out-26', 'gsc', '2026-10-07', impressions=100, clicks=5, pos_ponderada=100.0)
+    estado.acumular('a.com', 'out-26', 'ga4', '2026-10-07', sessions=42)
+    estado.registrar_celulas('a.com', 'out-26', {1: 200, 2: 15})
+    estado.alvo = '2026-10-07'
+    estado.salvar()
+
+    relido = MonthToDateState(caminho)
+    assert relido.proximo_dia('a.com', 'out-26', 'gsc', '2026-10-01') == '2026-10-08'
+    assert relido.totais('a.com', 'out-26') == {'gsc': (200, 15, 7.5, 2.0), 'ga4': 42}
+    assert relido.celulas('a.com', 'out-26') == {1: 200, 2: 15}
+    assert relido.provisorio('a.com', 'out-26', 1, '200') and not relido.provisorio('a.com', 'out-26', 1, '201')
+    assert relido.motivo_para_sincronizar('out-26', '2026-10-01', '2026-10-07') is None
+    assert relido.motivo_para_sincronizar('out-26', '2026-10-01', '2026-10-08').startswith("mês corrente")
+    assert relido.motivo_para_sincronizar('nov-26', '2026-11-01', '2026-11-01').startswith("mês encerrado")
+
+    relido.remover('a.com', 'out-26')
+    assert relido.meses == {}
+
+
+def test_mesmo_valor_aceita_virgula_decimal():
+    assert mesmo_valor('7,50', 7.5)
+    assert not mesmo_valor('7,6', 7.5)
+    assert mesmo_valor('abc', 'abc')